@@ -0,0 +1,184 @@
+import random
+
+try:
+    from lbnlp.process.matscholar import MatScholarProcess
+except ImportError:  # chemdataextractor is missing, use the pymatgen elements
+    MatScholarProcess = None
+
+if MatScholarProcess is not None:
+    ELEMENTS = MatScholarProcess.ELEMENTS[:103]
+    ELEMENT_NAMES = MatScholarProcess.ELEMENT_NAMES[:103]
+    UNITS = MatScholarProcess.SPLIT_UNITS
+else:
+    from pymatgen.core.periodic_table import Element
+
+    ELEMENTS = [Element.from_Z(z).symbol for z in range(1, 104)]
+    ELEMENT_NAMES = [Element.from_Z(z).long_name.lower() for z in range(1, 104)]
+    UNITS = ["K", "h", "V", "wt", "MHz", "GPa", "eV", "meV", "mAhg−1", "cm2V−1s−1",
+             "Scm−1", "nm", "mol", "mg", "Å", "Wm−1K−1", "ppm", "T"]
+
+# elements drawn for the synthetic formulas: up to Bi, without the noble
+# gases, and without O which is appended separately
+FORMULA_ELEMENTS = [el for el in ELEMENTS[:83] if el not in ("He", "Ne", "Ar", "Kr", "Xe", "O")]
+
+# chemical names with their formulas; they are also written to the stand-in
+# dictionaries of MaterialParser and Normalizer (see standins.py)
+MATERIAL_NAMES = {
+    "lithium iron phosphate": "LiFePO4",
+    "lithium cobalt oxide": "LiCoO2",
+    "zinc oxide": "ZnO",
+    "titanium dioxide": "TiO2",
+    "strontium titanate": "SrTiO3",
+    "barium titanate": "BaTiO3",
+    "gallium nitride": "GaN",
+    "silicon carbide": "SiC",
+    "cadmium telluride": "CdTe",
+    "molybdenum disulfide": "MoS2",
+    "bismuth telluride": "Bi2Te3",
+    "lead zirconate titanate": "PbZr0.5Ti0.5O3",
+}
+
+ACRONYMS = {"STO": "SrTiO3", "BTO": "BaTiO3", "LFP": "LiFePO4", "PZT": "PbZr0.5Ti0.5O3"}
+
+PROPERTIES = ["band gap", "thermal conductivity", "Seebeck coefficient", "capacity",
+              "dielectric constant", "carrier mobility", "Curie temperature",
+              "magnetization", "hardness", "ionic conductivity"]
+APPLICATIONS = ["solar cells", "cathode", "thermoelectric", "photocatalyst",
+                "lithium-ion batteries", "sensor", "supercapacitor", "LED"]
+DESCRIPTORS = ["thin film", "nanoparticles", "single crystal", "nanowires",
+               "amorphous", "polycrystalline", "monolayer"]
+STRUCTURES = ["perovskite", "spinel", "wurtzite", "rutile", "fluorite"]
+SYNTHESIS = ["sol-gel", "hydrothermal synthesis", "pulsed laser deposition",
+             "solid-state reaction", "ball milling"]
+CHARACTERIZATION = ["X-ray diffraction", "Raman spectroscopy", "TEM", "XPS",
+                    "photoluminescence"]
+VERBS = ["increases", "decreases", "was measured", "is enhanced", "was observed",
+         "remains stable", "was found to improve"]
+
+
+def random_formula(rng):
+    """
+    A random formula: plain (LiCoO2), fractional (Sr(Zr0.5Ti0.5)O3), with a
+    variable (LixCoO2) or with a dopant (Eu-doped SrTiO3).
+
+    :param rng: random.Random
+    :return: string
+    """
+    def count():
+        n = rng.choice([1, 1, 2, 2, 3, 4, 5, 7])
+        return "" if n == 1 else str(n)
+
+    elements = rng.sample(FORMULA_ELEMENTS, rng.randint(1, 4))
+    kind = rng.random()
+    if kind < 0.55:
+        return "".join(el + count() for el in elements) + rng.choice(["", "O" + count()])
+    if kind < 0.7 and len(elements) > 2:
+        x = rng.choice(["0.5", "0.2", "0.25", "0.1"])
+        y = "{:g}".format(1 - float(x))
+        return "{}({}{}{}{}){}3".format(elements[0], elements[1], x, elements[2], y,
+                                        rng.choice(["O", "S", "Se"]))
+    if kind < 0.85:
+        var = rng.choice(["x", "y", "δ"])
+        return "{}{}{}O{}".format(elements[0], var, "".join(elements[1:]), count())
+    return "{}-doped {}".format(rng.choice(ELEMENTS[56:71]),
+                                rng.choice(list(MATERIAL_NAMES.values())))
+
+
+def random_quantity(rng):
+    """A number with a unit, e.g. '3.2 eV' or '500K'"""
+    value = rng.choice(["{:d}".format(rng.randint(1, 1500)),
+                        "{:.2f}".format(rng.uniform(0, 100)),
+                        "{:.1f}".format(rng.uniform(0, 10))])
+    return value + rng.choice(["", " "]) + rng.choice(UNITS)
+
+
+def _phrase(text, tag):
+    tokens = text.split()
+    if not tag:
+        return [(token, "O") for token in tokens]
+    return [(token, ("B-" if i == 0 else "I-") + tag) for i, token in enumerate(tokens)]
+
+
+def random_sentence(rng):
+    """
+    A sentence as a list of (token, iob tag) pairs, tagged with the
+    MatScholar entity types (MAT, PRO, APL, DSC, SPL, SMT, CMT).
+
+    :param rng: random.Random
+    :return: list of tuples
+    """
+    def material():
+        kind = rng.random()
+        if kind < 0.6:
+            return _phrase(random_formula(rng), "MAT")
+        if kind < 0.8:
+            return _phrase(rng.choice(list(MATERIAL_NAMES)), "MAT")
+        if kind < 0.9:
+            return _phrase(rng.choice(list(ACRONYMS)), "MAT")
+        return _phrase(rng.choice(ELEMENT_NAMES), "MAT")
+
+    templates = [
+        lambda: (_phrase("The", None) + _phrase(rng.choice(PROPERTIES), "PRO") + _phrase("of", None)
+                 + material() + _phrase(rng.choice(VERBS) + " to " + random_quantity(rng), None)),
+        lambda: (material() + _phrase("was prepared by", None) + _phrase(rng.choice(SYNTHESIS), "SMT")
+                 + _phrase("at " + random_quantity(rng) + " for " + random_quantity(rng), None)),
+        lambda: (_phrase(rng.choice(DESCRIPTORS), "DSC") + material()
+                 + _phrase("with a", None) + _phrase(rng.choice(STRUCTURES), "SPL")
+                 + _phrase("structure were characterized by", None)
+                 + _phrase(rng.choice(CHARACTERIZATION), "CMT")),
+        lambda: (material() + _phrase("and", None) + material()
+                 + _phrase("are promising for", None) + _phrase(rng.choice(APPLICATIONS), "APL")),
+        lambda: (_phrase("Doping", None) + material() + _phrase("with", None)
+                 + _phrase(rng.choice(ELEMENT_NAMES), "MAT")
+                 + _phrase("(x = " + ", ".join("{:.2f}".format(rng.uniform(0, 1))
+                                               for _ in range(rng.randint(1, 3))) + ")", None)
+                 + _phrase(rng.choice(VERBS) + " the", None) + _phrase(rng.choice(PROPERTIES), "PRO")),
+    ]
+    return rng.choice(templates)() + [(".", "O")]
+
+
+def generate_documents(n_docs, seed=0, min_sentences=3, max_sentences=8):
+    """
+    Generates synthetic materials science abstracts, rich in formulas,
+    chemical names, numbers with units and element names.
+
+    :param n_docs: int; number of documents
+    :param seed: int; the same seed gives the same documents
+    :param min_sentences: int; min sentences per document
+    :param max_sentences: int; max sentences per document
+    :return: list of dicts {"text": string, "tagged": list of sentences, each a
+    list of (token, iob tag) tuples}
+    """
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(n_docs):
+        tagged = [random_sentence(rng)
+                  for _ in range(rng.randint(min_sentences, max_sentences))]
+        text = " ".join(" ".join(token for token, _ in sent) for sent in tagged)
+        docs.append({"text": text.replace(" .", "."), "tagged": tagged})
+    return docs
+
+
+def generate_formulas(n, seed=0):
+    """
+    :param n: int; number of formulas
+    :param seed: int
+    :return: list of strings, see random_formula
+    """
+    rng = random.Random(seed)
+    return [random_formula(rng) for _ in range(n)]
+
+
+def generate_material_mentions(n, seed=0):
+    """
+    Material mentions as found by the NER model: formulas, chemical names,
+    acronyms and element names.
+
+    :param n: int; number of mentions
+    :param seed: int
+    :return: list of strings
+    """
+    rng = random.Random(seed)
+    pools = [list(MATERIAL_NAMES), list(ACRONYMS), ELEMENT_NAMES]
+    return [random_formula(rng) if rng.random() < 0.6 else rng.choice(rng.choice(pools))
+            for _ in range(n)]
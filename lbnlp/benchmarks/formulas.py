@@ -0,0 +1,122 @@
+"""
+Per-formula cost of the formula parsing of MatScholarProcess and SimpleParser, against the
+pymatgen Composition implementations they replaced, which are kept here as the reference.
+"""
+import sys
+import argparse
+import collections
+
+from pymatgen.core.periodic_table import Element
+from pymatgen.core.composition import Composition, CompositionError
+
+from lbnlp.benchmarks import corpus
+from lbnlp.benchmarks.tokens import text_tokens, time_per_token
+from lbnlp.parse.formula import parse_formula
+from lbnlp.parse.simple import SimpleParser
+from lbnlp.process.matscholar import MatScholarProcess
+
+
+def reference_el_amt_dict(formula):
+    """parse_formula with pymatgen: Composition(formula).get_el_amt_dict(), None if it fails"""
+    try:
+        composition = Composition(formula)
+    except (CompositionError, ValueError):
+        return None
+    if not all(isinstance(key, Element) for key in composition.keys()):
+        return None
+    return composition.get_el_amt_dict()
+
+
+def reference_is_simple_formula(text):
+    """MatScholarProcess.is_simple_formula with pymatgen"""
+    mp = MatScholarProcess
+    if mp.VALENCE_INFO.search(text) is not None:
+        return False
+    elif any(char.isdigit() or char.islower() for char in text):
+        try:
+            if text in mp.DIATOMIC:
+                return True
+            composition = Composition(text)
+            if len(composition.keys()) < 2 or any([not mp.is_element(key) for key in composition.keys()]):
+                return False
+            return True
+        except (CompositionError, ValueError):
+            return False
+    else:
+        return False
+
+
+def reference_normalized_formula(text, max_denominator=1000):
+    """MatScholarProcess.normalized_formula with pymatgen"""
+    try:
+        formula_dict = Composition(text).get_el_amt_dict()
+        return MatScholarProcess.get_ordered_integer_formula(formula_dict, max_denominator)
+    except (CompositionError, ValueError):
+        return text
+
+
+def reference_simple_formula(text):
+    """MatScholarProcess.simple_formula with pymatgen"""
+    return reference_normalized_formula(text) if reference_is_simple_formula(text) else None
+
+
+def reference_matgen_parser(formula):
+    """SimpleParser.matgen_parser with pymatgen"""
+    try:
+        integer_formula, factor = Composition(formula).get_integer_formula_and_factor()
+        composition = Composition(integer_formula)
+        if any([not isinstance(key, Element) for key in composition.keys()]):
+            return False
+        return SimpleParser().alphabetize(composition.get_reduced_formula_and_factor()[0])
+    except Exception:
+        return False
+
+
+def run_formula_benchmarks(formulas, repeat=5):
+    """
+    Times each parser, before and after, over the same formulas.
+
+    :param formulas: list; strings, formulas and other tokens
+    :param repeat: int; timed passes over the formulas
+    :return: dict; {parser: {"before_ns", "after_ns", "speedup"}}, nanoseconds per formula
+    """
+    mp = MatScholarProcess.__new__(MatScholarProcess)  # no phraser needed for these checks
+    parser = SimpleParser()
+    checks = collections.OrderedDict([
+        ("el_amt_dict", (reference_el_amt_dict, parse_formula)),
+        ("simple_formula", (reference_simple_formula, mp.simple_formula)),
+        ("matgen_parser", (reference_matgen_parser, parser.matgen_parser)),
+    ])
+    results = collections.OrderedDict()
+    for name, (before, after) in checks.items():
+        before_ns = time_per_token(before, formulas, repeat)
+        after_ns = time_per_token(after, formulas, repeat)
+        results[name] = {"before_ns": before_ns, "after_ns": after_ns,
+                         "speedup": before_ns / after_ns if after_ns else 0.}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Per-formula cost of the formula parsers, before and after parsing without pymatgen")
+    parser.add_argument("--mentions", type=int, default=2000, help="number of synthetic material mentions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--text", default=None, help="file of real abstracts, whose tokens are used instead")
+    args = parser.parse_args(argv)
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            formulas = text_tokens(f)
+    else:
+        formulas = corpus.generate_material_mentions(args.mentions, seed=args.seed)
+
+    print("{} formulas".format(len(formulas)))
+    for name, result in run_formula_benchmarks(formulas, args.repeat).items():
+        print("{:<14} before {:>8.1f} ns/formula  after {:>8.1f} ns/formula  {:>6.2f}x".format(
+            name, result["before_ns"], result["after_ns"], result["speedup"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import collections
+
+from lbnlp.benchmarks import corpus, standins
+from lbnlp.timing import StageTimer
+
+
+class BenchmarkContext(object):
+    """
+    The synthetic corpus and the stand-in models shared by the benchmarks.
+    Stand-ins are written to workdir the first time a benchmark asks for them.
+    """
+
+    def __init__(self, n_docs, seed, workdir, timer):
+        self.seed = seed
+        self.workdir = workdir
+        self.timer = timer
+        self.docs = corpus.generate_documents(n_docs, seed=seed)
+        self.texts = [doc["text"] for doc in self.docs]
+        self.tagged = [doc["tagged"] for doc in self.docs]
+        self.sentences = [[token for token, _ in sent] for doc in self.tagged for sent in doc]
+        self.formulas = corpus.generate_formulas(n_docs * 5, seed=seed)
+        self.mentions = corpus.generate_material_mentions(n_docs * 5, seed=seed)
+        self._cache = {}
+
+    def _path(self, name):
+        path = os.path.join(self.workdir, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _cached(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def phraser_path(self):
+        def build():
+            lowered = [[token.lower() for token in sent] for sent in self.sentences]
+            return standins.write_phraser(self._path("phraser"), lowered)
+        return self._cached("phraser_path", build)
+
+    @property
+    def processor(self):
+        def build():
+            from lbnlp.process.matscholar import MatScholarProcess
+
+            return MatScholarProcess(phraser_path=self.phraser_path)
+        return self._cached("processor", build)
+
+    @property
+    def parser_data(self):
+        return self._cached("parser_data", lambda: standins.write_parser_data(self._path("rsc")))
+
+    @property
+    def normalizer_data(self):
+        return self._cached("normalizer_data",
+                            lambda: standins.write_normalizer_data(self._path("normalize")))
+
+    @property
+    def tokenized(self):
+        """The documents tokenized by the processor, list of sentences per doc"""
+        return self._cached("tokenized", lambda: [self.processor.tokenize(text) for text in self.texts])
+
+    @property
+    def relevance_model(self):
+        def build():
+            rng = random.Random(self.seed)
+            docs = [[token for sent in doc for token in sent] for doc in self.tokenized]
+            labels = [i % 2 if i < 2 else rng.randint(0, 1) for i in range(len(docs))]
+            return standins.write_relevance_model(self._path("relevance"), docs, labels)
+        return self._cached("relevance_model", build)
+
+    @property
+    def ner_model(self):
+        return self._cached("ner_model",
+                            lambda: standins.write_ner_model(self._path("ner"), self.sentences))
+
+
+def bench_tokenize(ctx):
+    processor = ctx.processor
+    return lambda: [processor.tokenize(text) for text in ctx.texts], len(ctx.texts)
+
+
+def bench_rule_tokenize(ctx):
+    from lbnlp.process.matscholar import MatScholarProcess
+
+    processor = MatScholarProcess(phraser_path=ctx.phraser_path, tokenizer="rule")
+    return lambda: [processor.tokenize(text) for text in ctx.texts], len(ctx.texts)
+
+
+def bench_sentence_cache(ctx):
+    from lbnlp.process.cache import SentenceCache, preprocess_sentences
+    from lbnlp.process.matscholar import MatScholarProcess
+
+    processor = MatScholarProcess(phraser_path=ctx.phraser_path, tokenizer="rule")
+    # abstracts usually end with the same copyright line
+    texts = [text + " © 2020 Elsevier B.V. All rights reserved." for text in ctx.texts]
+
+    def run():
+        cache = SentenceCache()
+        return [preprocess_sentences(processor, text, processor.process_many, cache)
+                for text in texts]
+    return run, len(texts)
+
+
+def bench_process(ctx):
+    # the generated tokens rather than ctx.tokenized, so it runs without chemdataextractor
+    processor = ctx.processor
+    return lambda: [processor.process(sent) for sent in ctx.sentences], sum(len(sent) for sent in ctx.sentences)
+
+
+def bench_process_many(ctx):
+    processor = ctx.processor
+    return lambda: processor.process_many(ctx.sentences), sum(len(sent) for sent in ctx.sentences)
+
+
+def bench_process_lexicon(ctx):
+    from lbnlp.process.lexicon import TokenLexicon
+    from lbnlp.process.matscholar import MatScholarProcess
+
+    # without the token cache, so every run classifies the tokens as a cold processor would
+    filename = os.path.join(ctx._path("lexicon"), "lexicon.json")
+    TokenLexicon.build(ctx.processor, (token for sent in ctx.sentences for token in sent)).save(filename)
+    processor = MatScholarProcess(phraser_path=ctx.phraser_path, token_cache_size=0, lexicon_path=filename)
+    return lambda: [processor.process(sent) for sent in ctx.sentences], sum(len(sent) for sent in ctx.sentences)
+
+
+def bench_split_token(ctx):
+    from lbnlp.benchmarks.tokens import text_tokens
+
+    processor = ctx.processor
+    tokens = text_tokens(ctx.texts)
+    return lambda: [processor._split_token(token) for token in tokens], len(tokens)
+
+
+def bench_make_phrases(ctx):
+    processor = ctx.processor
+    lowered = [[token.lower() for token in sent] for sent in ctx.sentences]
+    return lambda: [processor.make_phrases(sent) for sent in lowered], sum(len(sent) for sent in lowered)
+
+
+def bench_simple_parser(ctx):
+    from lbnlp.parse.simple import SimpleParser
+
+    parser = SimpleParser()
+    return lambda: [parser.parse(formula) for formula in ctx.formulas], len(ctx.formulas)
+
+
+def bench_material_parser(ctx):
+    from lbnlp.parse.material import MaterialParser
+
+    parser = MaterialParser(data_path=ctx.parser_data)
+    return lambda: [parser.get_chemical_structure(mention) for mention in ctx.mentions], len(ctx.mentions)
+
+
+def bench_normalize(ctx):
+    from lbnlp.normalize import Normalizer
+
+    normalizer = Normalizer(ctx.normalizer_data, ctx.parser_data)
+    return lambda: normalizer.normalize(ctx.texts, ctx.tagged), len(ctx.texts)
+
+
+def bench_relevance(ctx):
+    from lbnlp.relevance import RelevanceClassifier
+
+    clf_path, tfidf_path = ctx.relevance_model
+    clf = RelevanceClassifier(clf_path, tfidf_path, processor=ctx.processor, timer=ctx.timer)
+    return lambda: clf.classify_many(ctx.texts), len(ctx.texts)
+
+
+def bench_ner(ctx):
+    from lbnlp.ner.config import Configure
+    from lbnlp.ner.onnx_model import NERONNXModel
+
+    config = Configure(data_dir=ctx.ner_model)
+    model = NERONNXModel(config)
+    model.build()
+    model.timer = ctx.timer
+    return lambda: model.predict_many(ctx.sentences), len(ctx.sentences)
+
+
+# name -> setup(ctx) returning (run once, number of items handled by a run)
+BENCHMARKS = collections.OrderedDict([
+    ("tokenize", bench_tokenize),
+    ("rule_tokenize", bench_rule_tokenize),
+    ("sentence_cache", bench_sentence_cache),
+    ("process", bench_process),
+    ("process_many", bench_process_many),
+    ("process_lexicon", bench_process_lexicon),
+    ("split_token", bench_split_token),
+    ("make_phrases", bench_make_phrases),
+    ("simple_parser", bench_simple_parser),
+    ("material_parser", bench_material_parser),
+    ("normalize", bench_normalize),
+    ("relevance", bench_relevance),
+    ("ner", bench_ner),
+])
+
+
+def git_commit():
+    """
+    :return: tuple; (commit hash or None, True if the work tree has changes)
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=cwd,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+        status = subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                         cwd=cwd, stderr=subprocess.DEVNULL).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def run_benchmarks(n_docs=200, repeat=3, seed=0, names=None, workdir=None):
+    """
+    Times each benchmark on a synthetic corpus with stand-in models. Each one
+    runs once untimed, then repeat times. Benchmarks whose dependencies are
+    missing are reported as skipped.
+
+    :param n_docs: int; number of synthetic abstracts
+    :param repeat: int; timed runs per benchmark
+    :param seed: int; seed of the corpus, keep it fixed to compare runs
+    :param names: list; benchmarks to run, defaults to all of BENCHMARKS
+    :param workdir: string; where the stand-in models are written, a
+    temporary directory by default
+    :return: dict; the report, see main
+    """
+    names = list(BENCHMARKS) if names is None else names
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError("Unknown benchmarks {}, choose from {}".format(unknown, list(BENCHMARKS)))
+
+    tmpdir = tempfile.mkdtemp() if workdir is None else None
+    timer = StageTimer()
+    ctx = BenchmarkContext(n_docs, seed, workdir or tmpdir, timer)
+    commit, dirty = git_commit()
+    report = {"commit": commit, "dirty": dirty,
+              "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "params": {"docs": n_docs, "repeat": repeat, "seed": seed},
+              "corpus": {"docs": len(ctx.docs), "sentences": len(ctx.sentences),
+                         "tokens": sum(len(sent) for sent in ctx.sentences),
+                         "formulas": len(ctx.formulas), "mentions": len(ctx.mentions)},
+              "benchmarks": collections.OrderedDict()}
+    try:
+        for name in names:
+            try:
+                run, items = BENCHMARKS[name](ctx)
+                run()
+            except ImportError as e:
+                report["benchmarks"][name] = {"skipped": "missing dependency: {}".format(e)}
+                continue
+            timer.reset()
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                seconds.append(time.perf_counter() - start)
+            best = min(seconds)
+            report["benchmarks"][name] = {
+                "items": items, "seconds": seconds, "best": best,
+                "mean": sum(seconds) / len(seconds),
+                "items_per_sec": items / best if best else 0.,
+                "stages": timer.stats()}
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return report
+
+
+def compare_reports(baseline, report):
+    """
+    Speedup of each benchmark run in both reports.
+
+    :param baseline: dict; an earlier report
+    :param report: dict; a later report
+    :return: dict; {benchmark: items_per_sec in report / in baseline}
+    """
+    speedups = collections.OrderedDict()
+    for name, result in report["benchmarks"].items():
+        before = baseline["benchmarks"].get(name, {})
+        if "best" in result and before.get("items_per_sec"):
+            speedups[name] = result["items_per_sec"] / before["items_per_sec"]
+    return speedups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the lbnlp pipeline stages on synthetic materials science abstracts")
+    parser.add_argument("--docs", type=int, default=200, help="number of synthetic abstracts")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default=None,
+                        help="comma separated benchmarks, from: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--workdir", default=None, help="keep the stand-in models here")
+    parser.add_argument("--output", default=None, help="write the report as json")
+    parser.add_argument("--compare", default=None, help="json report of an earlier run")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else None
+    report = run_benchmarks(args.docs, args.repeat, args.seed, names, args.workdir)
+
+    for name, result in report["benchmarks"].items():
+        if "skipped" in result:
+            print("{:<16} skipped ({})".format(name, result["skipped"]))
+        else:
+            print("{:<16} {:>10.1f} items/s  best {:.3f}s".format(
+                name, result["items_per_sec"], result["best"]))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("speedup vs {}:".format(baseline.get("commit")))
+        for name, speedup in compare_reports(baseline, report).items():
+            print("{:<16} {:>6.2f}x".format(name, speedup))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import os
+import json
+
+import dill
+import numpy as np
+
+from lbnlp.benchmarks.corpus import MATERIAL_NAMES, ACRONYMS, PROPERTIES, \
+    APPLICATIONS, DESCRIPTORS, STRUCTURES, SYNTHESIS, CHARACTERIZATION
+
+# tags of the MatScholar NER model
+NER_TAGS = ["O"] + ["{}-{}".format(p, t) for t in ("MAT", "SPL", "DSC", "PRO", "APL", "SMT", "CMT")
+                    for p in "BI"]
+
+
+def identity(x):
+    """Analyzer of the stand-in tfidf: documents are already token lists"""
+    return x
+
+
+def write_phraser(dirname, sentences):
+    """
+    Trains a gensim phraser on the tokenized sentences, for MatScholarProcess.
+
+    :param dirname: string; output directory
+    :param sentences: list of lists of tokens
+    :return: string; path of phraser.pkl
+    """
+    from gensim.models.phrases import Phrases, Phraser
+
+    filename = os.path.join(dirname, "phraser.pkl")
+    Phraser(Phrases(sentences, min_count=2, threshold=1)).save(filename)
+    return filename
+
+
+def write_parser_data(dirname):
+    """
+    Writes the compound dictionaries read by MaterialParser(data_path=dirname).
+
+    :param dirname: string; output directory
+    :return: string; dirname
+    """
+    lines = ["{} – {}".format(name.capitalize(), formula) for name, formula in MATERIAL_NAMES.items()]
+    for filename in ("inorganic_compounds_dictionary", "pub_chem_dictionary"):
+        with open(os.path.join(dirname, filename), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return dirname
+
+
+def write_normalizer_data(dirname):
+    """
+    Writes the entity dictionaries and mat2formula.json read by
+    Normalizer(data_path=dirname, ...).
+
+    :param dirname: string; output directory
+    :return: string; dirname
+    """
+    entities = {"PRO": PROPERTIES, "APL": APPLICATIONS, "DSC": DESCRIPTORS,
+                "SPL": STRUCTURES, "SMT": SYNTHESIS, "CMT": CHARACTERIZATION}
+    for key, names in entities.items():
+        with open(os.path.join(dirname, "{}.json".format(key.lower())), "w") as f:
+            json.dump({name: {"most_common": name.lower()} for name in names}, f)
+    mat2formula = dict(MATERIAL_NAMES)
+    mat2formula.update(ACRONYMS)
+    with open(os.path.join(dirname, "mat2formula.json"), "w") as f:
+        json.dump(mat2formula, f)
+    return dirname
+
+
+def write_relevance_model(dirname, docs, labels):
+    """
+    Fits a tfidf and a logistic regression on processed documents and dill
+    dumps them like the files read by RelevanceClassifier.
+
+    :param dirname: string; output directory
+    :param docs: list; documents as lists of processed tokens
+    :param labels: list; 0 or 1 per document, both must be present
+    :return: tuple; (clf_path, tfidf_path)
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    tfidf = TfidfVectorizer(analyzer=identity, min_df=2)
+    clf = LogisticRegression().fit(tfidf.fit_transform(docs), labels)
+    clf_path = os.path.join(dirname, "relevance_model.p")
+    tfidf_path = os.path.join(dirname, "tfidf.p")
+    with open(clf_path, "wb") as f:
+        dill.dump(clf, f)
+    with open(tfidf_path, "wb") as f:
+        dill.dump(tfidf, f)
+    return clf_path, tfidf_path
+
+
+def random_ner_weights(nwords, nchars, ntags, dim_word=50, dim_char=20,
+                       hidden_size_char=20, hidden_size_lstm=50, seed=0):
+    """
+    Random weights with the layout of onnx_model.read_checkpoint_weights
+
+    :return: dict of name -> float32 np array
+    """
+    rng = np.random.RandomState(seed)
+    weights = {"word_embeddings": rng.randn(nwords, dim_word),
+               "char_embeddings": rng.randn(nchars, dim_char),
+               "proj_W": rng.randn(2 * hidden_size_lstm, ntags) * 0.1,
+               "proj_b": np.zeros(ntags),
+               "trans_params": rng.randn(ntags, ntags)}
+    input_sizes = {"char": (dim_char, hidden_size_char),
+                   "word": (dim_word + 2 * hidden_size_char, hidden_size_lstm)}
+    for name, (input_size, hidden) in input_sizes.items():
+        for direction in ("fw", "bw"):
+            prefix = "{}_{}_".format(name, direction)
+            weights[prefix + "kernel"] = rng.randn(input_size + hidden, 4 * hidden) * 0.1
+            weights[prefix + "bias"] = np.zeros(4 * hidden)
+    return {name: value.astype(np.float32) for name, value in weights.items()}
+
+
+def write_ner_model(dirname, sentences, **sizes):
+    """
+    Writes a NER model directory that Configure(data_dir=dirname) and
+    NERONNXModel can load: vocabs built from the sentences, trimmed
+    embeddings and model.onnx with random weights.
+
+    :param dirname: string; output directory
+    :param sentences: list of lists of tokens
+    :param sizes: passed to random_ner_weights
+    :return: string; dirname
+    """
+    from lbnlp.ner.data_utils import UNK, NUM
+    from lbnlp.ner.onnx_model import build_onnx_model
+    import onnx
+
+    words = sorted({token.lower() for sent in sentences for token in sent})
+    words = [UNK, NUM] + [word for word in words if word not in (UNK, NUM)]
+    chars = sorted({char for sent in sentences for token in sent for char in token})
+    for filename, vocab in (("words.txt", words), ("chars.txt", chars), ("tags.txt", NER_TAGS)):
+        with open(os.path.join(dirname, filename), "w", encoding="utf-8") as f:
+            f.write("\n".join(vocab))
+
+    weights = random_ner_weights(len(words), len(chars), len(NER_TAGS), **sizes)
+    np.savez_compressed(os.path.join(dirname, "glove.6B.200d.trimmed.npz"),
+                        embeddings=weights["word_embeddings"])
+    onnx.save(build_onnx_model(weights), os.path.join(dirname, "model.onnx"))
+    return dirname
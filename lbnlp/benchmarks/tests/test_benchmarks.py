@@ -0,0 +1,77 @@
+import json
+import unittest
+import importlib.util
+
+from lbnlp.benchmarks.corpus import generate_documents, generate_formulas
+from lbnlp.benchmarks.formulas import run_formula_benchmarks
+from lbnlp.benchmarks.run import run_benchmarks, compare_reports
+from lbnlp.benchmarks.tokens import text_tokens, run_token_benchmarks
+
+HAS_ONNXRUNTIME = all(importlib.util.find_spec(m) for m in ("onnx", "onnxruntime"))
+
+
+class CorpusTest(unittest.TestCase):
+
+    def test_same_seed_same_corpus(self):
+        self.assertEqual(generate_documents(5, seed=3), generate_documents(5, seed=3))
+        self.assertEqual(generate_formulas(20, seed=3), generate_formulas(20, seed=3))
+        self.assertNotEqual(generate_formulas(20, seed=3), generate_formulas(20, seed=4))
+
+    def test_tags_cover_text(self):
+        for doc in generate_documents(10):
+            words = []
+            for sent in doc["tagged"]:
+                words += [token for token, _ in sent[:-1]]
+                words[-1] += sent[-1][0]
+            self.assertEqual(doc["text"].split(), words)
+            tags = [tag for sent in doc["tagged"] for _, tag in sent]
+            self.assertTrue(any(tag == "B-MAT" for tag in tags))
+            for prev, tag in zip(["O"] + tags, tags):
+                if tag.startswith("I-"):
+                    self.assertIn(prev[2:], tag)
+
+
+class RunBenchmarksTest(unittest.TestCase):
+
+    def test_report(self):
+        names = ["simple_parser", "ner"] if HAS_ONNXRUNTIME else ["simple_parser"]
+        report = run_benchmarks(n_docs=5, repeat=2, names=names)
+        json.dumps(report)
+        self.assertEqual(list(report["benchmarks"]), names)
+        result = report["benchmarks"]["simple_parser"]
+        self.assertEqual(result["items"], report["corpus"]["formulas"])
+        self.assertEqual(len(result["seconds"]), 2)
+        self.assertGreater(result["items_per_sec"], 0)
+        if HAS_ONNXRUNTIME:
+            self.assertIn("session_run", report["benchmarks"]["ner"]["stages"])
+        self.assertAlmostEqual(compare_reports(report, report)["simple_parser"], 1)
+
+    def test_unknown_benchmark(self):
+        with self.assertRaises(ValueError):
+            run_benchmarks(n_docs=1, names=["nope"])
+
+
+class TokenBenchmarksTest(unittest.TestCase):
+
+    def test_report(self):
+        tokens = text_tokens(["Fe(II) doped ZnO at 300K.", "The gap, 3.3 eV;"])
+        self.assertEqual(tokens, ["Fe(II)", "doped", "ZnO", "at", "300K", ".", "The", "gap", ",", "3.3", "eV", ";"])
+        results = run_token_benchmarks(tokens, repeat=1)
+        self.assertEqual(list(results), ["split_token", "is_number", "membership", "remove_accent"])
+        for result in results.values():
+            self.assertGreater(result["before_ns"], 0)
+            self.assertGreater(result["after_ns"], 0)
+
+
+class FormulaBenchmarksTest(unittest.TestCase):
+
+    def test_run_formula_benchmarks(self):
+        results = run_formula_benchmarks(generate_formulas(20) + ["zinc oxide", "Fe(II)"], repeat=1)
+        self.assertEqual(list(results), ["el_amt_dict", "simple_formula", "matgen_parser"])
+        for result in results.values():
+            self.assertGreater(result["before_ns"], 0)
+            self.assertGreater(result["after_ns"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
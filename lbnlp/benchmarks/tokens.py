@@ -0,0 +1,132 @@
+"""
+Per-token cost of the MatScholarProcess token checks, against the regex, list and
+unidecode implementations they replaced. Runs without chemdataextractor or a phraser.
+"""
+import sys
+import time
+import argparse
+import collections
+
+import unidecode
+
+from lbnlp.benchmarks import corpus
+from lbnlp.process.matscholar import MatScholarProcess
+
+
+def reference_split_token(token, split_oxidation=True):
+    """MatScholarProcess._split_token before the prefilters, both regexes on every token"""
+    mp = MatScholarProcess
+    elem_with_valence = mp.ELEMENT_VALENCE_IN_PAR.match(token) if split_oxidation else None
+    nr_unit = mp.NR_AND_UNIT.match(token)
+    if nr_unit is not None and nr_unit.group(2) in mp.SPLIT_UNITS:
+        return [nr_unit.group(1), nr_unit.group(2)]
+    elif elem_with_valence is not None:
+        return [elem_with_valence.group(1), elem_with_valence.group(2)]
+    else:
+        return [token]
+
+
+def reference_is_number(token):
+    """MatScholarProcess.is_number before the prefilter"""
+    return MatScholarProcess.NR_BASIC.match(token.replace(',', '')) is not None
+
+
+def reference_remove_accent(token):
+    """MatScholarProcess.remove_accent before the ASCII and translation table fast paths"""
+    return unidecode.unidecode(token) if len(token) > 1 else token
+
+
+def reference_membership(token):
+    """The list membership tests of MatScholarProcess.process before frozensets"""
+    mp = MatScholarProcess
+    return (token in mp.PUNCT, token in mp.ELEMENTS_NAMES_UL, token in mp.ELEMENTS, token in mp.SPLIT_UNITS)
+
+
+def membership(token):
+    mp = MatScholarProcess
+    return (token in mp.PUNCT_SET, token in mp.ELEMENTS_NAMES_UL_SET, token in mp.ELEMENTS_SET,
+            token in mp.SPLIT_UNITS_SET)
+
+
+def text_tokens(texts):
+    """
+    Whitespace tokens of texts with trailing punctuation split off, close to what the
+    chemdataextractor tokenizer passes to _split_token.
+
+    :param texts: iterable; strings
+    :return: list; tokens
+    """
+    tokens = []
+    for text in texts:
+        for word in text.split():
+            stripped = word.rstrip(".,;:")
+            if stripped:
+                tokens.append(stripped)
+            tokens.extend(word[len(stripped):])
+    return tokens
+
+
+def time_per_token(func, tokens, repeat=5):
+    """
+    :param func: callable; called on each token
+    :param tokens: list; tokens
+    :param repeat: int; timed passes over the tokens
+    :return: float; best nanoseconds per token
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for token in tokens:
+            func(token)
+        best = min(best, time.perf_counter() - start)
+    return best / max(len(tokens), 1) * 1e9
+
+
+def run_token_benchmarks(tokens, repeat=5):
+    """
+    Times each check, before and after, over the same tokens.
+
+    :param tokens: list; tokens
+    :param repeat: int; timed passes over the tokens
+    :return: dict; {check: {"before_ns", "after_ns", "speedup"}}, nanoseconds per token
+    """
+    mp = MatScholarProcess.__new__(MatScholarProcess)  # no phraser needed for these checks
+    checks = collections.OrderedDict([
+        ("split_token", (reference_split_token, mp._split_token)),
+        ("is_number", (reference_is_number, mp.is_number)),
+        ("membership", (reference_membership, membership)),
+        ("remove_accent", (reference_remove_accent, mp.remove_accent)),
+    ])
+    results = collections.OrderedDict()
+    for name, (before, after) in checks.items():
+        before_ns = time_per_token(before, tokens, repeat)
+        after_ns = time_per_token(after, tokens, repeat)
+        results[name] = {"before_ns": before_ns, "after_ns": after_ns,
+                         "speedup": before_ns / after_ns if after_ns else 0.}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Per-token cost of the MatScholarProcess token checks, before and after the prefilters")
+    parser.add_argument("--docs", type=int, default=200, help="number of synthetic abstracts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--text", default=None, help="file of real abstracts, used instead of synthetic ones")
+    args = parser.parse_args(argv)
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            tokens = text_tokens(f)
+    else:
+        tokens = text_tokens(doc["text"] for doc in corpus.generate_documents(args.docs, seed=args.seed))
+
+    print("{} tokens".format(len(tokens)))
+    for name, result in run_token_benchmarks(tokens, args.repeat).items():
+        print("{:<13} before {:>8.1f} ns/token  after {:>8.1f} ns/token  {:>6.2f}x".format(
+            name, result["before_ns"], result["after_ns"], result["speedup"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
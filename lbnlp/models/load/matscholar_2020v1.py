@@ -23,7 +23,8 @@ def load(model_name, ignore_requirements=False):
 def load_ner_model(basepath):
     ner_path = os.path.join(basepath, "ner")
 
-    processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"))
+    processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"),
+                                  lexicon_path=os.path.join(basepath, "embeddings/lexicon.json"))
     normalizer = Normalizer(os.path.join(basepath, "normalize"), os.path.join(basepath, "rsc"))
     return NERClassifier(ner_path, normalizer, processor, enforce_local=True)
 
@@ -42,7 +43,8 @@ class NERClassifierConvenienceWrapper:
 
     """
     def __init__(self, ner_path, basepath):
-        self.processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"))
+        self.processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"),
+                                           lexicon_path=os.path.join(basepath, "embeddings/lexicon.json"))
         self.normalizer = Normalizer(os.path.join(basepath, "normalize"), os.path.join(basepath, "rsc"))
         self.clf = NERClassifier(ner_path, self.normalizer, self.processor, enforce_local=True)
 
@@ -20,5 +20,10 @@ def load(model_name, ignore_requirements=False):
 def load_relevance_model(basepath):
     clf_path = os.path.join(basepath, f"relevance_model.p")
     tfidf_path = os.path.join(basepath, f"tfidf.p")
-    processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"))
+    # written by python -m lbnlp.relevance or lbnlp.relevance.train, loads without unpickling sklearn
+    model_path = os.path.join(basepath, f"relevance_model.npz")
+    processor = MatScholarProcess(phraser_path=os.path.join(basepath, "embeddings/phraser.pkl"),
+                                  lexicon_path=os.path.join(basepath, "embeddings/lexicon.json"))
+    if os.path.exists(model_path):
+        return RelevanceClassifier(processor=processor, model_path=model_path)
     return RelevanceClassifier(clf_path, tfidf_path, processor)
\ No newline at end of file
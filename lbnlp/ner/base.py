@@ -1,9 +1,35 @@
 import os
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import tensorflow as tf
 
+from lbnlp.ner.data_utils import sample_sentences
+from lbnlp.ner.general_utils import average_weights
+
 tf.set_random_seed(1)
 
 
+def evaluate_snapshot(model_class, config, weights, test):
+    """Builds a model, loads the given weights and evaluates it on test
+
+    Runs in the evaluation process started by BaseModel.train when
+    config.async_eval is set, so all its arguments are pickled.
+
+    Returns:
+        metrics: (dict) see run_evaluate
+
+    """
+    model = model_class(config)
+    model.build()
+    model.set_weights(weights)
+    try:
+        return model.run_evaluate(test)
+    finally:
+        model.close_session()
+
+
 class BaseModel(object):
     """Generic class for general methods that are not specific to NER"""
 
@@ -17,14 +43,16 @@ class BaseModel(object):
         """
         self.config = config
         self.logger = config.logger
+        self.graph  = tf.Graph()
         self.sess   = None
         self.saver  = None
 
 
     def reinitialize_weights(self, scope_name):
         """Reinitializes the weights of a given layer"""
-        variables = tf.contrib.framework.get_variables(scope_name)
-        init = tf.variables_initializer(variables)
+        with self.graph.as_default():
+            variables = tf.contrib.framework.get_variables(scope_name)
+            init = tf.variables_initializer(variables)
         self.sess.run(init)
 
 
@@ -61,14 +89,23 @@ class BaseModel(object):
 
 
     def initialize_session(self):
-        """Defines self.sess and initialize the variables"""
+        """Defines self.sess and initialize the variables
+
+        The session is bound to this model's own graph, so several models can
+        live side by side in one process. Thread counts are read from
+        config.intra_op_parallelism_threads and
+        config.inter_op_parallelism_threads (0 lets tensorflow decide).
+
+        """
         self.logger.info("Initializing tf session")
-        tf.set_random_seed(1)
-        self.sess = tf.Session()
-        tf.set_random_seed(1)
-        self.sess.run(tf.global_variables_initializer())
-        tf.set_random_seed(1)
-        self.saver = tf.train.Saver()
+        session_config = tf.ConfigProto(
+            intra_op_parallelism_threads=self.config.intra_op_parallelism_threads,
+            inter_op_parallelism_threads=self.config.inter_op_parallelism_threads)
+        with self.graph.as_default():
+            tf.set_random_seed(1)
+            self.sess = tf.Session(graph=self.graph, config=session_config)
+            self.sess.run(tf.global_variables_initializer())
+            self.saver = tf.train.Saver()
 
 
     def restore_session(self, dir_model):
@@ -98,7 +135,6 @@ class BaseModel(object):
     def close_session(self):
         """Closes the session"""
         self.sess.close()
-        tf.reset_default_graph()
 
 
     def add_summary(self):
@@ -108,22 +144,78 @@ class BaseModel(object):
             dir_output: (string) where the results are written
 
         """
-        self.merged      = tf.summary.merge_all()
+        with self.graph.as_default():
+            self.merged  = tf.summary.merge_all()
         self.file_writer = tf.summary.FileWriter(self.config.dir_output,
                 self.sess.graph)
 
 
+    def get_weights(self):
+        """Returns the values of the trainable variables, by variable name"""
+        with self.graph.as_default():
+            variables = tf.trainable_variables()
+        return dict(zip([v.name for v in variables], self.sess.run(variables)))
+
+
+    def set_weights(self, weights):
+        """Loads values returned by get_weights into the trainable variables"""
+        with self.graph.as_default():
+            for variable in tf.trainable_variables():
+                variable.load(weights[variable.name], self.sess)
+
+
     def train(self, train, dev):
         """Performs training with early stopping and lr exponential decay
 
+        Early stopping is decided on a fixed random sample of
+        config.dev_sample_size dev sentences if it is set, and the best model
+        is then evaluated on the whole dev set at the end. With
+        config.async_eval the dev evaluation of each epoch runs on a snapshot
+        of the weights in a separate process while training continues. With
+        config.average_snapshots > 1 the average of the last snapshots is
+        kept if it scores better than the best epoch.
+
         Args:
             train: dataset that yields tuple of (sentences, tags)
             dev: dataset
 
+        """
+        self.add_summary() # tensorboard
+        dev_eval = (sample_sentences(dev, self.config.dev_sample_size)
+                    if self.config.dev_sample_size else dev)
+
+        if self.config.async_eval:
+            best_score, snapshots = self._train_async(train, dev_eval)
+        else:
+            best_score, snapshots = self._train_sync(train, dev_eval)
+
+        if len(snapshots) > 1:
+            self.set_weights(average_weights(snapshots))
+            metrics = self.run_evaluate(dev_eval)
+            self.logger.info("- average of the last {} epochs: f1 {:04.2f}".format(
+                len(snapshots), metrics["f1"]))
+            if metrics["f1"] >= best_score:
+                self.save_session()
+                self.logger.info("- new best score!")
+
+        if self.config.async_eval or self.config.dev_sample_size or len(snapshots) > 1:
+            # training went past the best weights or only a sample was seen
+            self.restore_session(self.config.dir_model)
+            if self.config.dev_sample_size:
+                self.evaluate(dev)
+
+
+    def _train_sync(self, train, dev):
+        """Trains, evaluating dev after every epoch
+
+        Returns:
+            best_score, and the weights of the last config.average_snapshots
+                epochs if it is more than 1
+
         """
         best_score = 0
         nepoch_no_imprv = 0 # for early stopping
-        self.add_summary() # tensorboard
+        snapshots = collections.deque(maxlen=self.config.average_snapshots)
 
         for epoch in range(self.config.nepochs):
             self.logger.info("Epoch {:} out of {:}".format(epoch + 1,
@@ -131,6 +223,8 @@ class BaseModel(object):
 
             score = self.run_epoch(train, dev, epoch)
             self.config.lr *= self.config.lr_decay # decay learning rate
+            if self.config.average_snapshots > 1:
+                snapshots.append(self.get_weights())
 
             # early stopping and saving best parameters
             if score >= best_score:
@@ -145,6 +239,76 @@ class BaseModel(object):
                             "improvement".format(nepoch_no_imprv))
                     break
 
+        return best_score, list(snapshots)
+
+
+    def _train_async(self, train, dev):
+        """Trains while a separate process evaluates snapshots of the weights
+
+        Evaluations finish about one epoch late, so early stopping may train
+        one epoch more than _train_sync. The best snapshot is saved with
+        save_session.
+
+        Returns:
+            best_score, and the weights of the last config.average_snapshots
+                epochs if it is more than 1
+
+        """
+        # the evaluation process needs the sentences, not a file iterator
+        dev = list(dev)
+        best = {"score": 0, "nepoch_no_imprv": 0}
+        snapshots = collections.deque(maxlen=max(1, self.config.average_snapshots))
+        pending = collections.deque()
+
+        def collect(future_epoch, weights, future):
+            metrics = future.result()
+            msg = " - ".join(["{} {:04.2f}".format(k, v)
+                    for k, v in metrics.items()])
+            self.logger.info("Epoch {} - {}".format(future_epoch + 1, msg))
+            if metrics["f1"] >= best["score"]:
+                best["score"], best["weights"] = metrics["f1"], weights
+                best["nepoch_no_imprv"] = 0
+                self.logger.info("- new best score!")
+            else:
+                best["nepoch_no_imprv"] += 1
+            return best["nepoch_no_imprv"] >= self.config.nepoch_no_imprv
+
+        # spawn, so the evaluation process builds its own tf runtime
+        executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for epoch in range(self.config.nepochs):
+                self.logger.info("Epoch {:} out of {:}".format(epoch + 1,
+                            self.config.nepochs))
+
+                self.train_epoch(train, epoch)
+                self.config.lr *= self.config.lr_decay # decay learning rate
+                weights = self.get_weights()
+                snapshots.append(weights)
+                pending.append((epoch, weights, executor.submit(
+                    evaluate_snapshot, type(self), self.config, weights, dev)))
+
+                stop = False
+                while pending and pending[0][2].done():
+                    stop = collect(*pending.popleft()) or stop
+                if stop:
+                    self.logger.info("- early stopping {} epochs without "\
+                            "improvement".format(best["nepoch_no_imprv"]))
+                    break
+
+            while pending:
+                collect(*pending.popleft())
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown()
+
+        if "weights" in best:
+            self.set_weights(best["weights"])
+            self.save_session()
+        snapshots = snapshots if self.config.average_snapshots > 1 else []
+        return best["score"], list(snapshots)
+
 
     def evaluate(self, test):
         """Evaluate model on test set
@@ -169,9 +333,11 @@ class BaseModel(object):
         """
         self.logger.info("Getting f1 for all tags")
         tags = ['MAT', 'PRO', 'DSC', 'SPL', 'APL', 'SMT', 'CMT', 'PVL', 'PUT']
+        # predict the test set once, then read every tag's f1 from it
+        per_tag = self.run_evaluate_all(test)["per_tag"]
         all_metrics = []
         for tag in tags:
-            metrics = self.evaluate_all(test, tag)
+            metrics = {"label": tag, "f1": per_tag.get(tag, {"f1": 0})["f1"]}
             msg = " - ".join(["{} {}".format(k, v)
                 for k, v in metrics.items()])
             self.logger.info(msg)
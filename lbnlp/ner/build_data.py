@@ -0,0 +1,69 @@
+import argparse
+
+from lbnlp.ner.data_utils import convert_trimmed_glove_vectors, compile_vocab, \
+    CoNLLDataset, write_conll_shards, load_vocab, export_trimmed_glove_vectors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Offline conversions of the NER model data files")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    convert = subparsers.add_parser(
+        "convert-embeddings",
+        help="write a trimmed .npz as a memory-mappable float32 .npy")
+    convert.add_argument("filename", help="trimmed embeddings .npz")
+    convert.add_argument("--output", default=None,
+                         help="output .npy, defaults to the .npz path with a "
+                              ".npy extension")
+
+    trim = subparsers.add_parser(
+        "trim-embeddings",
+        help="keep the vectors of the vocab words from a text, word2vec .bin, "
+             "gensim .kv/.model or .magnitude file")
+    trim.add_argument("filename_words", help="vocab file, e.g. words.txt")
+    trim.add_argument("filename_vectors", help="word vectors")
+    trim.add_argument("output", help="trimmed embeddings, .npy to memory-map them")
+    trim.add_argument("--dim", type=int, required=True, help="dimension of the vectors")
+
+    vocab = subparsers.add_parser(
+        "compile-vocab",
+        help="compile a large vocab text file (words.txt) for fast loading, "
+             "written next to it with a .vocab extension; small vocabs "
+             "(chars.txt, tags.txt) gain nothing and are read into a dict")
+    vocab.add_argument("filenames", nargs="+", help="vocab text files")
+
+    shards = subparsers.add_parser(
+        "build-shards",
+        help="preprocess a CoNLL file into memory-mappable shards read by "
+             "ShardedDataset")
+    shards.add_argument("data_dir", help="model directory with the vocabs")
+    shards.add_argument("filename", help="CoNLL file")
+    shards.add_argument("dir_shards", help="output directory")
+    shards.add_argument("--shard-size", type=int, default=100000,
+                        help="max sentences per shard")
+
+    args = parser.parse_args(argv)
+    if args.command == "convert-embeddings":
+        print(convert_trimmed_glove_vectors(args.filename, args.output))
+    elif args.command == "trim-embeddings":
+        export_trimmed_glove_vectors(load_vocab(args.filename_words),
+                                     args.filename_vectors, args.output, args.dim)
+        print(args.output)
+    elif args.command == "compile-vocab":
+        for filename in args.filenames:
+            print(compile_vocab(filename))
+    elif args.command == "build-shards":
+        from lbnlp.ner.config import Configure
+
+        config = Configure(data_dir=args.data_dir)
+        dataset = CoNLLDataset(args.filename, config.processing_word,
+                               config.processing_tag)
+        index = write_conll_shards(dataset, args.dir_shards, args.shard_size)
+        print("{} sentences in {} shards".format(index["sentences"],
+                                                 len(index["shards"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 import os
 import warnings
 
-import tensorflow as tf
-
-
 from lbnlp.ner.serving import NERModel, NERServingModel
+from lbnlp.ner.onnx_model import NERONNXModel
 from lbnlp.ner.config import Configure
 from lbnlp.process.matscholar import MatScholarProcess
+from lbnlp.process.cache import preprocess_sentences
 from lbnlp.normalize import Normalizer
+from lbnlp.timing import NULL_TIMER
 
 warnings.filterwarnings("ignore")
 
@@ -17,27 +17,54 @@ class NERClassifier:
     A class for sequence tagging with named entity recognition.
     """
 
-    def __init__(self, data_path, normalizer=None, processor=None, enforce_local=False):
+    BACKENDS = ("tf", "onnx")
+
+    def __init__(self, data_path, normalizer=None, processor=None, enforce_local=False,
+                 intra_op_parallelism_threads=0, inter_op_parallelism_threads=0, backend="tf",
+                 timer=None, sentence_cache=None):
         """
         Constructor method for NERClassifier.
+
+        Each classifier owns its model's graph and session, so several classifiers can be
+        used side by side in one process.
+
+        :param backend: string; "tf" runs the model.weights checkpoint with tensorflow (or TF Serving
+        if TF_SERVING_URL is set), "onnx" runs model.onnx with ONNX Runtime on CPU
+        :param intra_op_parallelism_threads: int; threads used inside a single tf op (0 lets tf decide)
+        :param inter_op_parallelism_threads: int; threads used to run independent tf ops (0 lets tf decide)
+        :param timer: lbnlp.timing.StageTimer; if given, records the time spent in each stage
+        (tokenize, process, word_ids, pad, session_run or serving_request, viterbi, normalize)
+        :param sentence_cache: lbnlp.process.cache.SentenceCache; if given, sentences seen before
+        (in any document) are not tokenized and processed again
         """
 
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend {}, choose from {}".format(backend, self.BACKENDS))
+        self.backend = backend
+
         # Configure
         self.config = Configure(data_dir=data_path)
         self.config.dim_word = 250
         self.config.dim_char = 50
+        self.config.intra_op_parallelism_threads = intra_op_parallelism_threads
+        self.config.inter_op_parallelism_threads = inter_op_parallelism_threads
 
         # Check to see if we have a tf serving api running the model
         self.api_url = os.environ.get('TF_SERVING_URL')
         # Load the model
-        tf.reset_default_graph()
-        if not enforce_local and self.api_url:
+        if backend == "onnx":
+            self.model = NERONNXModel(self.config)
+            self.model.build()
+        elif not enforce_local and self.api_url:
             self.model = NERServingModel(self.config, api_url=self.api_url)
         else:
             # Make a local NER model if we don't have a remote server (This is significantly slower)
             self.model = NERModel(self.config)
             self.model.build()
             self.model.restore_session(self.config.dir_final_model)
+        self.timer = timer if timer else NULL_TIMER
+        self.model.timer = self.timer
+        self.sentence_cache = sentence_cache
         # Load the normalizer/processor
         self.normalizer = Normalizer() if not normalizer else normalizer
         self.processor = MatScholarProcess() if not processor else processor
@@ -66,13 +93,7 @@ class NERClassifier:
         """
 
         processed_sents, processed_sents_num = self._preprocess(doc)
-        tagged_doc = []
-        for sent, sent_num in zip(processed_sents, processed_sents_num):
-            tags = self.model.predict(sent)
-            tagged_doc.append([(token, tag) if token != '<nUm>' else (token_num, tag)
-                               for token, token_num, tag in zip(sent, sent_num, tags)])
-
-        return tagged_doc
+        return self._tag_processed(processed_sents, processed_sents_num)
 
     def concatenate_entities(self, tagged_doc):
         """
@@ -114,12 +135,7 @@ class NERClassifier:
         tagged_docs = []
         for doc in docs:
             processed_sents, processed_sents_num = self._preprocess(doc)
-            tagged_doc = []
-            for sent, sent_num in zip(processed_sents, processed_sents_num):
-                tags = self.model.predict(sent)
-                tagged_doc.append([(token, tag) if token != '<nUm>' else (token_num, tag)
-                                   for token, token_num, tag in zip(sent, sent_num, tags)])
-            tagged_docs.append(tagged_doc)
+            tagged_docs.append(self._tag_processed(processed_sents, processed_sents_num))
 
         return tagged_docs
 
@@ -157,7 +173,8 @@ class NERClassifier:
         :return: list; a list of documents with normalized entities
         """
         tagged_docs = self.tag_docs(docs)
-        return self.normalizer.normalize(docs, tagged_docs)
+        with self.timer.stage("normalize", items=len(docs)):
+            return self.normalizer.normalize(docs, tagged_docs)
 
     def _preprocess(self, text):
         """
@@ -167,17 +184,38 @@ class NERClassifier:
         :return: tuple; (processed_sents, processed_sents_num)
         """
 
-        sents = self.processor.tokenize(text)
-        processed_sents = []
-        processed_sents_num = []
-        for sent in sents:
-            processed, _ = self.processor.process(sent)
-            processed_num, _ = self.processor.process(sent, convert_num=False)
-            processed_sents.append(processed)
-            processed_sents_num.append(processed_num)
+        def process_sentences(sents):
+            processed = self.processor.process_many(sents)
+            processed_num = self.processor.process_many(sents, convert_num=False)
+            return [(p, p_num) for (p, _), (p_num, _) in zip(processed, processed_num)]
+
+        sents = preprocess_sentences(self.processor, text, process_sentences, self.sentence_cache, "ner",
+                                     self.timer)
+        processed_sents = [processed for _, (processed, _) in sents]
+        processed_sents_num = [processed_num for _, (_, processed_num) in sents]
         return processed_sents, processed_sents_num
 
+    def _tag_processed(self, processed_sents, processed_sents_num, tags=None):
+        """
+        Tags the preprocessed sentences of one document in a single batch.
+
+        :param processed_sents: list; processed sentences, numbers converted to <nUm>
+        :param processed_sents_num: list; the same sentences with the numbers kept
+        :param tags: list; precomputed tags for each sentence, predicted here if None
+        :return: list; tagged sentences, each a list of (token, tag) tuples
+        """
+
+        if tags is None:
+            tags = self.model.predict_many(processed_sents)
+        tagged_doc = []
+        for sent, sent_num, sent_tags in zip(processed_sents, processed_sents_num, tags):
+            tagged_doc.append([(token, tag) if token != '<nUm>' else (token_num, tag)
+                               for token, token_num, tag in zip(sent, sent_num, sent_tags)])
+        return tagged_doc
+
     def save_model(self, save_dir):
+        if self.model.sess is not None:
+            self.model.close_session()
         self.model.build()
         self.model.restore_session(self.config.dir_final_model)
         self.model.save_prediction_model(save_dir)
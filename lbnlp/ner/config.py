@@ -1,4 +1,5 @@
 import os
+import logging
 
 from .general_utils import get_logger
 from .data_utils import get_trimmed_glove_vectors, load_vocab, \
@@ -30,6 +31,23 @@ class Config():
         if load:
             self.load()
 
+    def __getstate__(self):
+        """Drops what load() rebuilds (vocabs, processing functions,
+        embeddings) and the logger, so configs can be sent to other processes"""
+        state = self.__dict__.copy()
+        for name in ("logger", "vocab_words", "vocab_tags", "vocab_chars",
+                     "processing_word", "processing_tag", "embeddings"):
+            state.pop(name, None)
+        state["_loaded"] = "vocab_words" in self.__dict__
+        return state
+
+    def __setstate__(self, state):
+        loaded = state.pop("_loaded", False)
+        self.__dict__.update(state)
+        self.logger = logging.getLogger("logger")
+        if loaded:
+            self.load()
+
     def load(self):
         """Loads vocabulary, processing functions and embeddings
 
@@ -57,7 +75,8 @@ class Config():
                                                   allow_unk=False)  # keep allow_unk = False
 
         # 3. get pre-trained embeddings
-        self.embeddings = (get_trimmed_glove_vectors(self.filename_trimmed)
+        self.embeddings = (get_trimmed_glove_vectors(self.filename_trimmed,
+                                                     mmap=self.mmap_embeddings)
                            if self.use_pretrained else None)
 
     # general config
@@ -70,11 +89,22 @@ class Config():
     dim_word = 200  # was 300, changed to 200
     dim_char = 20
 
+    # exported ONNX graph (created from dir_final_model with onnx_model.py)
+    filename_onnx = dir_output + "model.onnx"
+
     # glove files
     filename_glove = 'data/my_data/w2v_final.txt'  # 'data/my_data/w2v_3mil.txt' #data/my_data/w2v.txt'
     # trimmed embeddings (created from glove_filename with build_data.py)
     filename_trimmed = "data/glove.6B.{}d.trimmed.npz".format(dim_word)
     use_pretrained = True
+    # memory-map the .npy copy of the trimmed embeddings if there is one, so
+    # worker processes share it (see data_utils.convert_trimmed_glove_vectors)
+    mmap_embeddings = True
+    # look the memory-mapped embeddings up in numpy and feed them to the graph
+    # instead of copying them into it. For inference only: such a graph has no
+    # words/_word_embeddings variable, so it can neither be trained nor
+    # exported with save_prediction_model
+    feed_word_embeddings = False
 
     # dataset
     filename_dev = 'data/my_data/prop_dev.txt'  # lstm_dev_final.txt #'data/my_data/polymer_data/lstm_test.txt'
@@ -101,6 +131,19 @@ class Config():
     clip = -1  # if negative, no clipping
     nepoch_no_imprv = 4
 
+    # dev evaluation during training (see BaseModel.train)
+    async_eval = False  # evaluate snapshots in a separate process
+    dev_sample_size = None  # if not None, early stop on a dev sample
+    average_snapshots = 0  # if > 1, also try the average of the last epochs
+
+    # training input pipeline (see pipeline.BatchPipeline), with
+    # prefetch_batches = 0 batches are padded synchronously as before
+    prefetch_batches = 0
+    input_workers = 0  # 0 pads in one background thread
+    input_processes = False  # pad in worker processes instead of threads
+    shuffle_batches = False
+    bucket_batches = False  # batch sentences of similar lengths together
+
     # model hyperparameters
     hidden_size_char = 50  # lstm on chars
     hidden_size_lstm = 250  # lstm on word embeddings #changed to 200, was 300
@@ -109,6 +152,10 @@ class Config():
     use_crf = True  # if crf, training is 1.7x slower on CPU
     use_chars = True  # if char embedding, training is 3.5x slower on CPU
 
+    # session threading, 0 lets tensorflow pick the number of threads
+    intra_op_parallelism_threads = 0
+    inter_op_parallelism_threads = 0
+
 
 
 class Configure(Config):
@@ -127,6 +174,7 @@ class Configure(Config):
 
         # Model saving/loading
         self.dir_final_model = os.path.join(self.dir_data, "model.weights/")
+        self.filename_onnx = os.path.join(self.dir_data, "model.onnx")
 
         # vocabulary
         self.filename_words = os.path.join(self.dir_data, "words.txt")
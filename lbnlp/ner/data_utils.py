@@ -1,7 +1,14 @@
 import os
+import json
+import logging
+import itertools
 
 import numpy as np
 
+from lbnlp.ner.vocab import CompactVocab, COMPACT_VOCAB_MIN_WORDS, compiled_vocab_filename, \
+    write_compiled_vocab
+from lbnlp.ner.word_vectors import read_word_vectors
+
 np.random.seed(1)
 
 
@@ -10,6 +17,9 @@ UNK = "$UNK$"
 NUM = "$NUM$"
 NONE = "O"
 
+# index file of the shards written by write_conll_shards
+SHARDS_INDEX = "index.json"
+
 
 # special error message
 class MyIOError(Exception):
@@ -85,15 +95,150 @@ class CoNLLDataset(object):
 
 
     def __len__(self):
-        """Iterates once over the corpus to set and store length"""
+        """Counts the sentences once, without processing them, and stores it"""
         if self.length is None:
             self.length = 0
-            for _ in self:
-                self.length += 1
+            in_sentence = False
+            with open(self.filename) as f:
+                for line in f:
+                    line = line.strip()
+                    if len(line) == 0 or line.startswith("-DOCSTART-"):
+                        if in_sentence:
+                            self.length += 1
+                            in_sentence = False
+                    else:
+                        in_sentence = True
+            if self.max_iter is not None:
+                self.length = min(self.length, self.max_iter)
 
         return self.length
 
 
+class ShardedDataset(object):
+    """Iterates over a CoNLL dataset preprocessed by write_conll_shards
+
+    Sentences are stored as flat id arrays in .npy shards which are
+    memory-mapped, so nothing is parsed or looked up again, and the length
+    is known from the index without reading the data.
+
+    __iter__ yields (words, tags) exactly like a CoNLLDataset built with the
+    processing functions used to write the shards, so it works with
+    minibatches. padded_minibatches yields batches already padded into
+    arrays, see pad_batch.
+
+    Example:
+        ```python
+        write_conll_shards(CoNLLDataset(filename, config.processing_word,
+                                        config.processing_tag), dir_shards)
+        data = ShardedDataset(dir_shards)
+        for batch in data.padded_minibatches(config.batch_size):
+            fd = model.get_padded_feed_dict(batch, dropout=1.0)
+        ```
+
+    """
+    def __init__(self, dir_shards, max_iter=None):
+        """
+        Args:
+            dir_shards: directory written by write_conll_shards
+            max_iter: (optional) max number of sentences to yield
+
+        """
+        self.dir_shards = dir_shards
+        self.max_iter = max_iter
+        try:
+            with open(os.path.join(dir_shards, SHARDS_INDEX)) as f:
+                self.index = json.load(f)
+        except IOError:
+            raise MyIOError(os.path.join(dir_shards, SHARDS_INDEX))
+        self.use_chars = self.index["use_chars"]
+        self.length = self.index["sentences"]
+        if max_iter is not None:
+            self.length = min(self.length, max_iter)
+
+    def __len__(self):
+        return self.length
+
+    def _shards(self):
+        """Yields (number of sentences to use, dict of memory-mapped arrays)"""
+        remaining = self.length
+        for shard in self.index["shards"]:
+            if remaining <= 0:
+                break
+            arrays = {name: np.load(os.path.join(self.dir_shards,
+                                                 "{}.{}.npy".format(shard["name"], name)),
+                                    mmap_mode="r")
+                      for name in shard["arrays"]}
+            n = min(shard["sentences"], remaining)
+            remaining -= n
+            yield n, arrays
+
+    def __iter__(self):
+        for n, arrays in self._shards():
+            sentence_offsets = arrays["sentence_offsets"].tolist()
+            word_ids = arrays["word_ids"].tolist()
+            tags = arrays["tags"].tolist()
+            if self.use_chars:
+                char_ids = arrays["char_ids"].tolist()
+                word_offsets = arrays["word_offsets"].tolist()
+            for i in range(n):
+                start, end = sentence_offsets[i], sentence_offsets[i + 1]
+                if self.use_chars:
+                    words = [(char_ids[word_offsets[j]:word_offsets[j + 1]], word_ids[j])
+                             for j in range(start, end)]
+                else:
+                    words = word_ids[start:end]
+                yield words, tags[start:end]
+
+    def padded_minibatches(self, minibatch_size):
+        """Yields the dataset in order as padded batches
+
+        Args:
+            minibatch_size: (int)
+
+        Yields:
+            dict of padded arrays, see pad_batch
+
+        """
+        pieces, size = [], 0
+        for n, arrays in self._shards():
+            start = 0
+            while start < n:
+                stop = min(start + minibatch_size - size, n)
+                pieces.append(_pad_shard_sentences(arrays, start, stop,
+                                                   self.use_chars))
+                size += stop - start
+                start = stop
+                if size == minibatch_size:
+                    yield _concatenate_batches(pieces)
+                    pieces, size = [], 0
+        if pieces:
+            yield _concatenate_batches(pieces)
+
+
+def sample_sentences(dataset, size, seed=1):
+    """Draws a fixed random sample of sentences in one pass (reservoir)
+
+    Args:
+        dataset: dataset that yields tuple of (sentences, tags)
+        size: (int) number of sentences to keep
+        seed: (int) the same seed gives the same sample
+
+    Returns:
+        list of (sentences, tags), in dataset order
+
+    """
+    rng = np.random.RandomState(seed)
+    sample = []
+    for i, sentence in enumerate(dataset):
+        if i < size:
+            sample.append((i, sentence))
+        else:
+            j = rng.randint(0, i + 1)
+            if j < size:
+                sample[j] = (i, sentence)
+    return [sentence for _, sentence in sorted(sample, key=lambda x: x[0])]
+
+
 def get_vocabs(datasets):
     """Build vocabulary from an iterable of datasets objects
 
@@ -146,8 +291,9 @@ def get_glove_vocab(filename):
     vocab = set()
     with open(filename) as f:
         for line in f:
-            word = line.strip().split()[0]   #split was on ' ' but modified to handle tabs
-            vocab.add(word)
+            words = line.split(None, 1)   #split was on ' ' but modified to handle tabs
+            if words:
+                vocab.add(words[0])
     print("- done. {} tokens".format(len(vocab)))
     return vocab
 
@@ -175,16 +321,34 @@ def write_vocab(vocab, filename):
     print("- done. {} tokens".format(len(vocab)))
 
 
-def load_vocab(filename):
+def load_vocab(filename, compiled=True):
     """Loads vocab from a file
 
+    If a compiled copy of the file (see compile_vocab) exists and is not
+    older than the text file, it is opened instead of parsing the text, and
+    this is logged. Vocabs of fewer than COMPACT_VOCAB_MIN_WORDS words
+    (chars, tags) are read from it into a dict, which looks words up faster
+    than CompactVocab.
+
     Args:
         filename: (string) the format of the file must be one word per line.
+        compiled: (bool) if True, use the compiled copy when there is one
 
     Returns:
-        d: dict[word] = index
+        d: dict[word] = index, or a CompactVocab with the same interface
 
     """
+    compiled_filename = compiled_vocab_filename(filename)
+    if compiled and os.path.exists(compiled_filename) and (
+            not os.path.exists(filename) or
+            os.path.getmtime(compiled_filename) >= os.path.getmtime(filename)):
+        logging.getLogger("logger").info(
+            "Loading compiled vocab {} instead of {}".format(compiled_filename, filename))
+        vocab = CompactVocab(compiled_filename)
+        if len(vocab) < COMPACT_VOCAB_MIN_WORDS:
+            return dict(vocab.items())
+        return vocab
+
     try:
         d = dict()
         with open(filename) as f:
@@ -197,40 +361,66 @@ def load_vocab(filename):
     return d
 
 
+def compile_vocab(filename, compiled_filename=None):
+    """Converts a vocab text file into the binary format of CompactVocab
+
+    Args:
+        filename: (string) vocab file, one word per line
+        compiled_filename: (string) path of the compiled file, defaults to
+            the text file path with a .vocab extension
+
+    Returns:
+        compiled_filename
+
+    """
+    if compiled_filename is None:
+        compiled_filename = compiled_vocab_filename(filename)
+    write_compiled_vocab(load_vocab(filename, compiled=False), compiled_filename)
+    return compiled_filename
+
+
 def export_trimmed_glove_vectors(vocab, glove_filename, trimmed_filename, dim):
     """Saves glove vectors in numpy array
 
+    Only the vectors of vocab words are parsed, see
+    word_vectors.read_word_vectors for the supported input formats. If
+    trimmed_filename ends with .npy the matrix is saved uncompressed as
+    float32, ready to be memory-mapped by get_trimmed_glove_vectors.
+
     Args:
         vocab: dictionary vocab[word] = index
-        glove_filename: a path to a glove file
-        trimmed_filename: a path where to store a matrix in npy
+        glove_filename: a path to a glove file (or word2vec .bin, gensim
+            .kv / .model, .magnitude)
+        trimmed_filename: a path where to store a matrix in npz or npy
         dim: (int) dimension of embeddings
 
     """
-    embeddings = np.zeros([len(vocab), dim])
-    print(dim)
-    with open(glove_filename) as f:
-        for line in f:
-            line = line.strip().split()   #was previously spliut on ' ', now can handle tabs
-            word = line[0]
-            embedding = [float(x) for x in line[1:]]
-            if word in vocab:
-                word_idx = vocab[word]
-                embeddings[word_idx] = np.asarray(embedding)
+    embeddings = read_word_vectors(glove_filename, vocab, dim)
 
-    np.savez_compressed(trimmed_filename, embeddings=embeddings)
+    if trimmed_filename.endswith(".npy"):
+        np.save(trimmed_filename, embeddings)
+    else:
+        np.savez_compressed(trimmed_filename, embeddings=embeddings)
 
 
-def get_trimmed_glove_vectors(filename):
+def get_trimmed_glove_vectors(filename, mmap=True):
     """
+    If an uncompressed .npy copy of the embeddings sits next to the .npz
+    (see convert_trimmed_glove_vectors), it is memory-mapped read-only
+    instead, so processes loading the same file share one copy in memory.
+
     Args:
-        filename: path to the npz file
+        filename: path to the npz (or npy) file
+        mmap: (bool) if True, memory-map the .npy file when there is one
 
     Returns:
-        matrix of embeddings (np array)
+        matrix of embeddings (np array, or np.memmap if memory-mapped)
 
     """
+    npy_filename = os.path.splitext(filename)[0] + ".npy"
     try:
+        if os.path.exists(npy_filename):
+            return np.load(npy_filename, mmap_mode="r" if mmap else None)
         with np.load(filename) as data:
             return data["embeddings"]
 
@@ -238,6 +428,32 @@ def get_trimmed_glove_vectors(filename):
         raise MyIOError(filename)
 
 
+def convert_trimmed_glove_vectors(filename, npy_filename=None):
+    """Writes the embeddings of a trimmed .npz as an uncompressed float32 .npy
+
+    The .npy can be memory-mapped by get_trimmed_glove_vectors. Values are
+    stored as float32, the dtype the model uses them in.
+
+    Args:
+        filename: path to the npz file
+        npy_filename: path of the npy file to write, defaults to the npz
+            path with a .npy extension
+
+    Returns:
+        npy_filename
+
+    """
+    if npy_filename is None:
+        npy_filename = os.path.splitext(filename)[0] + ".npy"
+    try:
+        with np.load(filename) as data:
+            embeddings = data["embeddings"].astype(np.float32)
+    except IOError:
+        raise MyIOError(filename)
+    np.save(npy_filename, embeddings)
+    return npy_filename
+
+
 def get_processing_word(vocab_words=None, vocab_chars=None,
                     lowercase=False, chars=False, allow_unk=True):
     """Return lambda function that transform a word (string) into list,
@@ -258,8 +474,9 @@ def get_processing_word(vocab_words=None, vocab_chars=None,
             char_ids = []
             for char in word:
                 # ignore chars out of vocabulary
-                if char in vocab_chars:
-                    char_ids += [vocab_chars[char]]
+                char_id = vocab_chars.get(char)
+                if char_id is not None:
+                    char_ids += [char_id]
 
         # 1. preprocess word
         if lowercase:
@@ -269,8 +486,9 @@ def get_processing_word(vocab_words=None, vocab_chars=None,
 
         # 2. get id of word
         if vocab_words is not None:
-            if word in vocab_words:
-                word = vocab_words[word]
+            word_id = vocab_words.get(word)
+            if word_id is not None:
+                word = word_id
             else:
                 if allow_unk:
                     word = vocab_words[UNK]
@@ -342,6 +560,149 @@ def pad_sequences(sequences, pad_tok, nlevels=1):
     return sequence_padded, sequence_length
 
 
+def pad_batch(words, labels=None, use_chars=False):
+    """Pads a batch of sentences into the arrays fed to the model
+
+    Args:
+        words: list of sentences. A sentence is a list of ids of a list of
+            words. A word is a list of ids
+        labels: (optional) list of ids
+        use_chars: (bool) if True, words are (char ids, word ids) pairs
+
+    Returns:
+        dict with "word_ids" and "sequence_lengths", "char_ids" and
+            "word_lengths" if use_chars, "labels" if labels are given
+
+    """
+    batch = {}
+    if use_chars:
+        char_ids, word_ids = zip(*words)
+        batch["word_ids"], batch["sequence_lengths"] = pad_sequences(word_ids, 0)
+        batch["char_ids"], batch["word_lengths"] = pad_sequences(char_ids, pad_tok=0,
+                                                                 nlevels=2)
+    else:
+        batch["word_ids"], batch["sequence_lengths"] = pad_sequences(words, 0)
+
+    if labels is not None:
+        batch["labels"], _ = pad_sequences(labels, 0)
+
+    return batch
+
+
+def _pad_flat(values, offsets, pad_tok=0):
+    """Pads the slices values[offsets[i]:offsets[i + 1]] into a 2d array"""
+    lengths = np.diff(offsets)
+    max_length = lengths.max() if len(lengths) else 0
+    positions = offsets[:-1, None] + np.arange(max_length)[None, :]
+    valid = np.arange(max_length)[None, :] < lengths[:, None]
+    padded = np.full(valid.shape, pad_tok, dtype=values.dtype)
+    padded[valid] = values[positions[valid]]
+    return padded, lengths
+
+
+def _pad_shard_sentences(arrays, start, stop, use_chars):
+    """pad_batch for the sentences start:stop of a shard, with numpy"""
+    sentence_offsets = np.asarray(arrays["sentence_offsets"][start:stop + 1])
+    batch = {}
+    batch["word_ids"], batch["sequence_lengths"] = _pad_flat(
+        arrays["word_ids"], sentence_offsets)
+    batch["labels"], _ = _pad_flat(arrays["tags"], sentence_offsets)
+
+    if use_chars:
+        word_offsets = np.asarray(arrays["word_offsets"])
+        first, last = sentence_offsets[0], sentence_offsets[-1]
+        # chars of every token of the batch, then tokens back into sentences
+        chars, word_lengths = _pad_flat(arrays["char_ids"], word_offsets[first:last + 1])
+        sequence_lengths = batch["sequence_lengths"]
+        max_length = batch["word_ids"].shape[1]
+        valid = np.arange(max_length)[None, :] < sequence_lengths[:, None]
+        batch["char_ids"] = np.zeros(valid.shape + chars.shape[1:], dtype=chars.dtype)
+        batch["char_ids"][valid] = chars
+        batch["word_lengths"] = np.zeros(valid.shape, dtype=word_lengths.dtype)
+        batch["word_lengths"][valid] = word_lengths
+
+    return batch
+
+
+def _concatenate_batches(batches):
+    """Concatenates padded batches along the batch axis, padding with 0"""
+    if len(batches) == 1:
+        return batches[0]
+    batch = {}
+    for name in batches[0]:
+        arrays = [b[name] for b in batches]
+        shape = np.max([a.shape for a in arrays], axis=0)
+        batch[name] = np.concatenate([
+            np.pad(a, [(0, 0)] + [(0, int(d - s)) for s, d in zip(a.shape[1:], shape[1:])])
+            for a in arrays])
+    return batch
+
+
+def write_conll_shards(dataset, dir_shards, shard_size=100000):
+    """Preprocesses a dataset once into memory-mappable .npy shards
+
+    Each shard holds the flat word ids and tag ids of its sentences with
+    their offsets (and flat char ids with per word offsets if the words
+    have chars). An index.json lists the shards and the sentence count.
+
+    Args:
+        dataset: dataset that yields tuple of (sentences, tags) of ids, e.g.
+            a CoNLLDataset with processing_word and processing_tag
+        dir_shards: directory to write the shards to
+        shard_size: (int) max number of sentences per shard
+
+    Returns:
+        the index (dict) written to index.json
+
+    """
+    if not os.path.exists(dir_shards):
+        os.makedirs(dir_shards)
+
+    index = {"version": 1, "use_chars": False, "sentences": 0, "tokens": 0,
+             "shards": []}
+
+    def write_shard(sentences):
+        name = "shard_{:05d}".format(len(index["shards"]))
+        lengths = [len(tags) for _, tags in sentences]
+        arrays = {
+            "sentence_offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            "tags": np.array([t for _, tags in sentences for t in tags], dtype=np.int32),
+        }
+        if index["use_chars"]:
+            words = [w for sentence, _ in sentences for w in sentence]
+            arrays["word_ids"] = np.array([w for _, w in words], dtype=np.int32)
+            arrays["char_ids"] = np.array([c for chars, _ in words for c in chars],
+                                          dtype=np.int32)
+            arrays["word_offsets"] = np.concatenate(
+                [[0], np.cumsum([len(chars) for chars, _ in words])]).astype(np.int64)
+        else:
+            arrays["word_ids"] = np.array([w for sentence, _ in sentences for w in sentence],
+                                          dtype=np.int32)
+        for array_name, array in arrays.items():
+            np.save(os.path.join(dir_shards, "{}.{}.npy".format(name, array_name)), array)
+
+        index["shards"].append({"name": name, "sentences": len(sentences),
+                                "tokens": int(sum(lengths)),
+                                "arrays": sorted(arrays)})
+        index["sentences"] += len(sentences)
+        index["tokens"] += int(sum(lengths))
+
+    sentences = []
+    for words, tags in dataset:
+        if not index["sentences"] and not sentences:
+            index["use_chars"] = type(words[0]) == tuple
+        sentences.append((words, tags))
+        if len(sentences) == shard_size:
+            write_shard(sentences)
+            sentences = []
+    if sentences:
+        write_shard(sentences)
+
+    with open(os.path.join(dir_shards, SHARDS_INDEX), "w") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
 def minibatches(data, minibatch_size):
     """
     Args:
@@ -383,12 +744,14 @@ def get_chunk_type(tok, idx_to_tag):
     return tag_class, tag_type
 
 
-def get_chunks(seq, tags):
+def get_chunks(seq, tags, idx_to_tag=None):
     """Given a sequence of tags, group entities and their position
 
     Args:
         seq: [4, 4, 0, 0, ...] sequence of labels
         tags: dict["O"] = 4
+        idx_to_tag: (optional) the inverse of tags, pass it when calling
+            get_chunks in a loop so it is not rebuilt for every sequence
 
     Returns:
         list of (chunk_type, chunk_start, chunk_end)
@@ -400,7 +763,8 @@ def get_chunks(seq, tags):
 
     """
     default = tags[NONE]
-    idx_to_tag = {idx: tag for tag, idx in tags.items()}
+    if idx_to_tag is None:
+        idx_to_tag = {idx: tag for tag, idx in tags.items()}
     chunks = []
     chunk_type, chunk_start = None, None
     for i, tok in enumerate(seq):
@@ -429,3 +793,168 @@ def get_chunks(seq, tags):
         chunks.append(chunk)
 
     return chunks
+
+
+def get_chunk_lookups(tags):
+    """Precomputes per tag id arrays used by get_chunks_batch
+
+    Args:
+        tags: dict["O"] = 4
+
+    Returns:
+        tuple (is_chunk, is_begin, chunk_type, type_names): boolean arrays
+            telling if a tag id is part of a chunk (not "O") and if it is a
+            "B" tag, an int array mapping a tag id to the index of its
+            type in type_names, and the list of type names
+
+    """
+    ntags = max(tags.values()) + 1
+    is_chunk = np.zeros(ntags, dtype=bool)
+    is_begin = np.zeros(ntags, dtype=bool)
+    chunk_type = np.zeros(ntags, dtype=np.int64)
+    type_names = []
+    for tag, idx in tags.items():
+        if tag == NONE:
+            continue
+        tag_class, tag_type = tag.split('-')[0], tag.split('-')[-1]
+        if tag_type not in type_names:
+            type_names.append(tag_type)
+        is_chunk[idx] = True
+        is_begin[idx] = tag_class == "B"
+        chunk_type[idx] = type_names.index(tag_type)
+    return is_chunk, is_begin, chunk_type, type_names
+
+
+def pad_tag_sequences(seqs, pad_tok):
+    """Pads a list of tag id sequences into one int array
+
+    Args:
+        seqs: list of sequences of ids
+        pad_tok: id to pad with
+
+    Returns:
+        tuple ([B, T] int array, [B] int array of sequence lengths)
+
+    """
+    sequence_lengths = np.array([len(seq) for seq in seqs], dtype=np.int64)
+    max_length = sequence_lengths.max() if len(seqs) else 0
+    valid = np.arange(max_length)[None, :] < sequence_lengths[:, None]
+    tag_ids = np.full(valid.shape, pad_tok, dtype=np.int64)
+    tag_ids[valid] = np.fromiter(itertools.chain.from_iterable(seqs),
+                                 dtype=np.int64, count=int(sequence_lengths.sum()))
+    return tag_ids, sequence_lengths
+
+
+def get_chunk_spans(tag_ids, sequence_lengths, lookups):
+    """Finds the chunks of a whole batch of tag sequences with numpy
+
+    Same chunking rules as get_chunks: a chunk starts at a non "O" tag that
+    follows an "O", a tag of another type or is a "B" tag, and runs until
+    the next "O", the next chunk start or the end of the sequence.
+
+    Args:
+        tag_ids: [B, T] int array of padded tag id sequences
+        sequence_lengths: [B] int array, tags past the length are ignored
+        lookups: output of get_chunk_lookups
+
+    Returns:
+        tuple of int arrays (sentence, chunk_type, start, end), one entry
+            per chunk, ordered by sentence then start
+
+    """
+    is_chunk, is_begin, chunk_type, _ = lookups
+    tag_ids = np.asarray(tag_ids, dtype=np.int64)
+    batch_size, max_length = tag_ids.shape
+    valid = np.arange(max_length)[None, :] < np.asarray(sequence_lengths)[:, None]
+
+    in_chunk = is_chunk[tag_ids] & valid
+    types = chunk_type[tag_ids]
+    starts = in_chunk & is_begin[tag_ids]
+    if max_length == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    starts[:, 0] |= in_chunk[:, 0]
+    starts[:, 1:] |= in_chunk[:, 1:] & (~in_chunk[:, :-1] | (types[:, 1:] != types[:, :-1]))
+
+    # a chunk ends at the first later position that is not inside a chunk or
+    # starts a new one; an extra column ends every row
+    boundaries = np.ones((batch_size, max_length + 1), dtype=bool)
+    boundaries[:, :max_length] = starts | ~in_chunk
+    boundaries = np.flatnonzero(boundaries)
+
+    sentence, start = np.nonzero(starts)
+    flat_start = sentence * (max_length + 1) + start
+    flat_end = boundaries[np.searchsorted(boundaries, flat_start, side="right")]
+    end = flat_end - sentence * (max_length + 1)
+
+    return sentence, types[sentence, start], start, end
+
+
+def get_chunks_batch(seqs, tags, lookups=None):
+    """Given a batch of sequences of tags, group entities and their position
+
+    Vectorized equivalent of [get_chunks(seq, tags) for seq in seqs].
+
+    Args:
+        seqs: list of sequences of labels, or a padded [B, T] array
+        tags: dict["O"] = 4
+        lookups: (optional) output of get_chunk_lookups(tags), pass it
+            when calling get_chunks_batch in a loop
+
+    Returns:
+        list, one per sequence, of lists of (chunk_type, chunk_start,
+            chunk_end)
+
+    """
+    if lookups is None:
+        lookups = get_chunk_lookups(tags)
+    chunks = [[] for _ in range(len(seqs))]
+    if len(chunks) == 0:
+        return chunks
+
+    if isinstance(seqs, np.ndarray) and seqs.ndim == 2:
+        tag_ids = seqs
+        sequence_lengths = np.full(len(seqs), seqs.shape[1])
+    else:
+        tag_ids, sequence_lengths = pad_tag_sequences(seqs, tags[NONE])
+
+    type_names = lookups[3]
+    sentence, chunk_type, start, end = get_chunk_spans(tag_ids, sequence_lengths,
+                                                       lookups)
+    for i, t, b, e in zip(sentence.tolist(), chunk_type.tolist(),
+                          start.tolist(), end.tolist()):
+        chunks[i].append((type_names[t], b, e))
+    return chunks
+
+
+def viterbi_decode(score, transition_params):
+    """Decode the highest scoring sequence of tags outside of tensorflow
+
+    Same algorithm as tf.contrib.crf.viterbi_decode, in plain numpy.
+
+    Args:
+        score: A [seq_len, num_tags] matrix of unary potentials.
+        transition_params: A [num_tags, num_tags] matrix of binary potentials.
+
+    Returns:
+        viterbi: A [seq_len] list of integers containing the highest scoring
+            tag indices.
+        viterbi_score: A float containing the score for the Viterbi sequence.
+
+    """
+    trellis = np.zeros_like(score)
+    backpointers = np.zeros_like(score, dtype=np.int32)
+    trellis[0] = score[0]
+
+    for t in range(1, score.shape[0]):
+        v = np.expand_dims(trellis[t - 1], 1) + transition_params
+        trellis[t] = score[t] + np.max(v, 0)
+        backpointers[t] = np.argmax(v, 0)
+
+    viterbi = [np.argmax(trellis[-1])]
+    for bp in reversed(backpointers[1:]):
+        viterbi.append(bp[viterbi[-1]])
+    viterbi.reverse()
+
+    viterbi_score = np.max(trellis[-1])
+    return viterbi, viterbi_score
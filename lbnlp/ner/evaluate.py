@@ -0,0 +1,211 @@
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from lbnlp.ner.data_utils import (NONE, minibatches, get_chunk_lookups,
+                                  get_chunk_spans, pad_tag_sequences)
+
+
+def _prf(correct_preds, total_preds, total_correct):
+    p = correct_preds / total_preds if correct_preds > 0 else 0
+    r = correct_preds / total_correct if correct_preds > 0 else 0
+    f1 = 2 * p * r / (p + r) if correct_preds > 0 else 0
+    return p, r, f1
+
+
+def chunk_scores(labels, labels_pred, vocab_tags):
+    """Computes token accuracy and chunk precision/recall/F1 in one pass
+
+    Args:
+        labels: list of gold tag id sequences
+        labels_pred: list of predicted tag id sequences, same lengths
+        vocab_tags: dict[tag] = idx
+
+    Returns:
+        dict with "acc", "precision", "recall", "f1" (micro averaged over
+            chunks), "macro_f1" and "per_tag": {tag: {"precision", "recall",
+            "f1", "support"}} for every chunk type seen in labels or
+            predictions. Scores are in percent.
+
+    """
+    lookups = get_chunk_lookups(vocab_tags)
+    type_names = lookups[3]
+    ntypes = max(len(type_names), 1)
+    correct = preds = gold = np.zeros(ntypes, dtype=np.int64)
+    ncorrect_toks, ntoks = 0, 0
+    if len(labels):
+        lab_ids, lengths = pad_tag_sequences(labels, vocab_tags[NONE])
+        lab_pred_ids, _ = pad_tag_sequences(labels_pred, vocab_tags[NONE])
+        valid = np.arange(lab_ids.shape[1])[None, :] < lengths[:, None]
+        ncorrect_toks = int(((lab_ids == lab_pred_ids) & valid).sum())
+        ntoks = int(lengths.sum())
+
+        # one int per (sentence, type, start, end) so chunks match by value
+        width = lab_ids.shape[1] + 1
+
+        def chunk_keys(tag_ids):
+            sentence, chunk_type, start, end = get_chunk_spans(tag_ids, lengths, lookups)
+            keys = ((sentence * ntypes + chunk_type) * width + start) * width + end
+            return keys, chunk_type
+
+        lab_keys, lab_types = chunk_keys(lab_ids)
+        pred_keys, pred_types = chunk_keys(lab_pred_ids)
+        _, correct_idx, _ = np.intersect1d(lab_keys, pred_keys, assume_unique=True,
+                                           return_indices=True)
+        correct = np.bincount(lab_types[correct_idx], minlength=ntypes)
+        preds = np.bincount(pred_types, minlength=ntypes)
+        gold = np.bincount(lab_types, minlength=ntypes)
+
+    per_tag = {}
+    for i, tag in sorted(enumerate(type_names), key=lambda x: x[1]):
+        if gold[i] or preds[i]:
+            p, r, f1 = _prf(int(correct[i]), int(preds[i]), int(gold[i]))
+            per_tag[tag] = {"precision": 100 * p, "recall": 100 * r,
+                            "f1": 100 * f1, "support": int(gold[i])}
+
+    p, r, f1 = _prf(int(correct.sum()), int(preds.sum()), int(gold.sum()))
+    macro_f1 = (np.mean([s["f1"] for s in per_tag.values()])
+                if per_tag else 0)
+
+    return {"acc": 100 * ncorrect_toks / ntoks if ntoks else 0,
+            "precision": 100 * p, "recall": 100 * r, "f1": 100 * f1,
+            "macro_f1": float(macro_f1), "per_tag": per_tag}
+
+
+def evaluate_model(model, test, batch_size=None, warmup=True):
+    """Runs the model once over a test set, timing it and scoring its tags
+
+    Works with anything that has predict_batch and config.vocab_tags:
+    NERModel, NERONNXModel or NERServingModel (TF Serving endpoint).
+
+    Args:
+        model: the model to evaluate
+        test: dataset that yields tuple of (sentences, tags)
+        batch_size: (int) sentences per predict_batch call, defaults to
+            model.config.batch_size
+        warmup: (bool) if True, run the first batch once untimed so lazy
+            initialization does not count against the speed
+
+    Returns:
+        the chunk_scores dict plus "sentences", "tokens", "seconds" (spent
+            in predict_batch), "sentences_per_sec", "tokens_per_sec" and
+            "latency_ms": {"p50", "p90", "p99", "max"} per batch
+
+    """
+    batch_size = batch_size or model.config.batch_size
+    labels, labels_pred, latencies = [], [], []
+    ntokens = 0
+    for words, labs in minibatches(test, batch_size):
+        if warmup:
+            model.predict_batch(words)
+            warmup = False
+        start = time.perf_counter()
+        preds, sequence_lengths = model.predict_batch(words)
+        latencies.append(time.perf_counter() - start)
+
+        for lab, lab_pred, length in zip(labs, preds, sequence_lengths):
+            labels.append(list(lab[:length]))
+            labels_pred.append(list(lab_pred[:length]))
+            ntokens += int(length)
+
+    metrics = chunk_scores(labels, labels_pred, model.config.vocab_tags)
+    seconds = float(np.sum(latencies)) if latencies else 0.
+    metrics.update({
+        "sentences": len(labels),
+        "tokens": ntokens,
+        "seconds": seconds,
+        "sentences_per_sec": len(labels) / seconds if seconds else 0.,
+        "tokens_per_sec": ntokens / seconds if seconds else 0.,
+        "latency_ms": {
+            name: 1000 * float(np.percentile(latencies, q)) if latencies else 0.
+            for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+    })
+    return metrics
+
+
+def check_thresholds(metrics, min_f1=None, min_macro_f1=None,
+                     min_sentences_per_sec=None, max_p99_ms=None):
+    """Compares an evaluate_model report against release gates
+
+    Returns:
+        list of failure messages, empty if every given threshold is met
+
+    """
+    checks = [("f1", metrics["f1"], min_f1, False),
+              ("macro_f1", metrics["macro_f1"], min_macro_f1, False),
+              ("sentences_per_sec", metrics["sentences_per_sec"],
+               min_sentences_per_sec, False),
+              ("latency_ms.p99", metrics["latency_ms"]["p99"], max_p99_ms, True)]
+    failures = []
+    for name, value, threshold, is_max in checks:
+        if threshold is None:
+            continue
+        if (value > threshold) if is_max else (value < threshold):
+            failures.append("{} {:.2f} is {} the threshold {:.2f}".format(
+                name, value, "above" if is_max else "below", threshold))
+    return failures
+
+
+def _load_model(data_dir, backend, api_url=None):
+    from lbnlp.ner.config import Configure
+
+    config = Configure(data_dir=data_dir)
+    config.dim_word = 250
+    config.dim_char = 50
+    if backend == "onnx":
+        from lbnlp.ner.onnx_model import NERONNXModel
+        model = NERONNXModel(config)
+        model.build()
+    elif backend == "serving":
+        from lbnlp.ner.serving import NERServingModel
+        model = NERServingModel(config, api_url=api_url)
+    else:
+        from lbnlp.ner.serving import NERModel
+        model = NERModel(config)
+        model.build()
+        model.restore_session(config.dir_final_model)
+    return model
+
+
+def main(argv=None):
+    from lbnlp.ner.data_utils import CoNLLDataset
+
+    parser = argparse.ArgumentParser(
+        description="Score and time a NER model on a CoNLL test set in one pass")
+    parser.add_argument("data_dir", help="model directory (vocabs, weights)")
+    parser.add_argument("test_file", help="CoNLL file, one 'word tag' per line")
+    parser.add_argument("--backend", choices=("tf", "onnx", "serving"), default="tf")
+    parser.add_argument("--api-url", default=None,
+                        help="TF Serving predict url for --backend serving")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--min-f1", type=float, default=None)
+    parser.add_argument("--min-macro-f1", type=float, default=None)
+    parser.add_argument("--min-sentences-per-sec", type=float, default=None)
+    parser.add_argument("--max-p99-ms", type=float, default=None)
+    parser.add_argument("--output", default=None, help="write the report as json")
+    args = parser.parse_args(argv)
+
+    model = _load_model(args.data_dir, args.backend, args.api_url)
+    test = CoNLLDataset(args.test_file, model.config.processing_word,
+                        model.config.processing_tag)
+    metrics = evaluate_model(model, test, batch_size=args.batch_size)
+
+    report = json.dumps(metrics, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+    failures = check_thresholds(metrics, args.min_f1, args.min_macro_f1,
+                                args.min_sentences_per_sec, args.max_p99_ms)
+    for failure in failures:
+        print("FAILED: " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
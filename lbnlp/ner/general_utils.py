@@ -26,6 +26,20 @@ def get_logger(filename):
     return logger
 
 
+def average_weights(snapshots):
+    """Averages weights returned by BaseModel.get_weights, variable by variable
+
+    Args:
+        snapshots: list of dicts {variable name: np array}
+
+    Returns:
+        dict {variable name: np array}
+
+    """
+    return {name: np.mean([snapshot[name] for snapshot in snapshots], axis=0)
+            for name in snapshots[0]}
+
+
 class Progbar(object):
     """Progbar class copied from keras (https://github.com/fchollet/keras/)
 
@@ -0,0 +1,310 @@
+import os
+import argparse
+
+import numpy as np
+
+from lbnlp.ner.data_utils import (pad_batch, viterbi_decode,
+                                  get_trimmed_glove_vectors)
+from lbnlp.ner.tagger import Tagger
+
+
+# opset 13 and IR version 7 are understood by every onnxruntime release since 1.6
+ONNX_OPSET = 13
+ONNX_IR_VERSION = 7
+
+# tf.contrib.rnn.LSTMCell adds this to the forget gate at run time
+LSTM_FORGET_BIAS = 1.0
+
+# names of the variables in the model.weights checkpoint written by NERModel
+CHECKPOINT_VARIABLES = {
+    "word_embeddings": "words/_word_embeddings",
+    "char_embeddings": "chars/_char_embeddings",
+    "char_fw_kernel": "chars/bidirectional_rnn/fw/lstm_cell/kernel",
+    "char_fw_bias": "chars/bidirectional_rnn/fw/lstm_cell/bias",
+    "char_bw_kernel": "chars/bidirectional_rnn/bw/lstm_cell/kernel",
+    "char_bw_bias": "chars/bidirectional_rnn/bw/lstm_cell/bias",
+    "word_fw_kernel": "bi-lstm/bidirectional_rnn/fw/lstm_cell/kernel",
+    "word_fw_bias": "bi-lstm/bidirectional_rnn/fw/lstm_cell/bias",
+    "word_bw_kernel": "bi-lstm/bidirectional_rnn/bw/lstm_cell/kernel",
+    "word_bw_bias": "bi-lstm/bidirectional_rnn/bw/lstm_cell/bias",
+    "proj_W": "proj/W",
+    "proj_b": "proj/b",
+    "trans_params": "transitions",
+}
+
+
+def read_checkpoint_weights(dir_model, embeddings=None):
+    """Reads the weights of a trained NERModel from its checkpoint
+
+    Args:
+        dir_model: (string) checkpoint prefix, e.g. config.dir_final_model
+        embeddings: (np array) word embeddings to use if the checkpoint has
+            none, i.e. the model was trained with memory-mapped embeddings
+
+    Returns:
+        dict of name -> np array, keyed as in CHECKPOINT_VARIABLES. The char
+            entries are missing if the model was trained without chars.
+
+    """
+    import tensorflow as tf
+
+    reader = tf.train.NewCheckpointReader(dir_model)
+    weights = {}
+    for name, var_name in CHECKPOINT_VARIABLES.items():
+        if reader.has_tensor(var_name):
+            weights[name] = reader.get_tensor(var_name)
+        elif name == "word_embeddings" and embeddings is not None:
+            weights[name] = np.asarray(embeddings, dtype=np.float32)
+        elif not name.startswith("char"):
+            raise KeyError("Variable {} not found in checkpoint {}".format(
+                var_name, dir_model))
+    return weights
+
+
+def _lstm_weights(fw_kernel, fw_bias, bw_kernel, bw_bias):
+    """Converts two tf LSTMCell kernels into ONNX bidirectional LSTM inputs
+
+    tf stores one [input + hidden, 4 * hidden] kernel with the gates in
+    (i, j, f, o) order and adds LSTM_FORGET_BIAS to f at run time. ONNX wants
+    separate input and recurrent weights with the gates in (i, o, f, c)
+    order, and a bias for each.
+    """
+    W, R, B = [], [], []
+    for kernel, bias in ((fw_kernel, fw_bias), (bw_kernel, bw_bias)):
+        hidden = kernel.shape[1] // 4
+        n_input = kernel.shape[0] - hidden
+        i, j, f, o = np.split(kernel, 4, axis=1)
+        b_i, b_j, b_f, b_o = np.split(bias, 4)
+        gates = np.concatenate([i, o, f, j], axis=1)
+        W.append(gates[:n_input].T)
+        R.append(gates[n_input:].T)
+        B.append(np.concatenate([b_i, b_o, b_f + LSTM_FORGET_BIAS, b_j,
+                                 np.zeros(4 * hidden, dtype=bias.dtype)]))
+    return (np.stack(W).astype(np.float32), np.stack(R).astype(np.float32),
+            np.stack(B).astype(np.float32), hidden)
+
+
+def build_onnx_model(weights):
+    """Builds the ONNX graph of the BiLSTM-CRF forward pass
+
+    Inputs are the same as the tf placeholders used for prediction
+    (word_ids, sequence_lengths and, with chars, char_ids and word_lengths,
+    all int32); outputs are logits and trans_params. Dropout is left out as
+    it is the identity at prediction time.
+
+    Args:
+        weights: dict as returned by read_checkpoint_weights
+
+    Returns:
+        onnx.ModelProto
+
+    """
+    from onnx import helper, numpy_helper, TensorProto
+
+    use_chars = "char_embeddings" in weights
+    nodes, initializers = [], []
+
+    def const(name, array):
+        initializers.append(numpy_helper.from_array(np.asarray(array), name))
+        return name
+
+    def node(op, inputs, outputs, **attrs):
+        nodes.append(helper.make_node(op, inputs, outputs, **attrs))
+        return outputs[0]
+
+    const("word_embeddings_matrix", weights["word_embeddings"].astype(np.float32))
+    embedded = node("Gather", ["word_embeddings_matrix", "word_ids"],
+                    ["word_embeddings"], axis=0)
+    inputs = [helper.make_tensor_value_info("word_ids", TensorProto.INT32, ["batch", "time"]),
+              helper.make_tensor_value_info("sequence_lengths", TensorProto.INT32, ["batch"])]
+
+    if use_chars:
+        inputs += [helper.make_tensor_value_info("char_ids", TensorProto.INT32,
+                                                 ["batch", "time", "chars"]),
+                   helper.make_tensor_value_info("word_lengths", TensorProto.INT32,
+                                                 ["batch", "time"])]
+        W, R, B, hidden_char = _lstm_weights(
+            weights["char_fw_kernel"], weights["char_fw_bias"],
+            weights["char_bw_kernel"], weights["char_bw_bias"])
+        dim_char = weights["char_embeddings"].shape[1]
+
+        const("char_embeddings_matrix", weights["char_embeddings"].astype(np.float32))
+        node("Gather", ["char_embeddings_matrix", "char_ids"], ["char_embeddings"], axis=0)
+        # [batch, time, chars, dim] -> [chars, batch * time, dim]
+        node("Transpose", ["char_embeddings"], ["char_embeddings_t"], perm=[2, 0, 1, 3])
+        const("char_seq_shape", np.array([0, -1, dim_char], dtype=np.int64))
+        node("Reshape", ["char_embeddings_t", "char_seq_shape"], ["char_seq"])
+        const("flat_shape", np.array([-1], dtype=np.int64))
+        node("Reshape", ["word_lengths", "flat_shape"], ["word_lengths_flat"])
+
+        const("char_lstm_W", W)
+        const("char_lstm_R", R)
+        const("char_lstm_B", B)
+        node("LSTM", ["char_seq", "char_lstm_W", "char_lstm_R", "char_lstm_B",
+                      "word_lengths_flat"],
+             ["", "char_lstm_h"], direction="bidirectional", hidden_size=hidden_char)
+
+        # final states [2, batch * time, hidden] -> [batch, time, 2 * hidden]
+        node("Transpose", ["char_lstm_h"], ["char_lstm_h_t"], perm=[1, 0, 2])
+        node("Shape", ["word_ids"], ["batch_time"])
+        const("char_out_dim", np.array([2 * hidden_char], dtype=np.int64))
+        node("Concat", ["batch_time", "char_out_dim"], ["char_out_shape"], axis=0)
+        node("Reshape", ["char_lstm_h_t", "char_out_shape"], ["char_output"])
+        embedded = node("Concat", ["word_embeddings", "char_output"],
+                        ["token_embeddings"], axis=-1)
+
+    W, R, B, hidden = _lstm_weights(
+        weights["word_fw_kernel"], weights["word_fw_bias"],
+        weights["word_bw_kernel"], weights["word_bw_bias"])
+    const("word_lstm_W", W)
+    const("word_lstm_R", R)
+    const("word_lstm_B", B)
+
+    # [batch, time, dim] -> [time, batch, dim]
+    node("Transpose", [embedded], ["word_seq"], perm=[1, 0, 2])
+    node("LSTM", ["word_seq", "word_lstm_W", "word_lstm_R", "word_lstm_B",
+                  "sequence_lengths"],
+         ["word_lstm_y"], direction="bidirectional", hidden_size=hidden)
+    # [time, 2, batch, hidden] -> [batch, time, 2 * hidden]
+    node("Transpose", ["word_lstm_y"], ["word_lstm_y_t"], perm=[2, 0, 1, 3])
+    const("word_out_shape", np.array([0, 0, 2 * hidden], dtype=np.int64))
+    node("Reshape", ["word_lstm_y_t", "word_out_shape"], ["word_output"])
+
+    const("proj_W", weights["proj_W"].astype(np.float32))
+    const("proj_b", weights["proj_b"].astype(np.float32))
+    node("MatMul", ["word_output", "proj_W"], ["proj"])
+    node("Add", ["proj", "proj_b"], ["logits"])
+
+    const("transitions", weights["trans_params"].astype(np.float32))
+    node("Identity", ["transitions"], ["trans_params"])
+
+    ntags = weights["proj_W"].shape[1]
+    outputs = [helper.make_tensor_value_info("logits", TensorProto.FLOAT,
+                                             ["batch", "time", ntags]),
+               helper.make_tensor_value_info("trans_params", TensorProto.FLOAT,
+                                             [ntags, ntags])]
+    graph = helper.make_graph(nodes, "bilstm_crf_ner", inputs, outputs, initializers)
+    return helper.make_model(graph, producer_name="lbnlp",
+                             opset_imports=[helper.make_opsetid("", ONNX_OPSET)],
+                             ir_version=ONNX_IR_VERSION)
+
+
+def export_onnx_model(dir_model, filename, embeddings=None):
+    """Converts a model.weights checkpoint into an ONNX file
+
+    Needs tensorflow (to read the checkpoint) and onnx, but not onnxruntime.
+
+    Args:
+        dir_model: (string) checkpoint prefix, e.g. config.dir_final_model
+        filename: (string) path of the .onnx file to write
+        embeddings: (np array) word embeddings for checkpoints saved without
+            them, see read_checkpoint_weights
+
+    """
+    import onnx
+
+    model = build_onnx_model(read_checkpoint_weights(dir_model, embeddings))
+    onnx.checker.check_model(model)
+    onnx.save(model, filename)
+
+
+class NERONNXModel(Tagger):
+    """Runs an exported BiLSTM-CRF NER model with ONNX Runtime on CPU
+
+    Same prediction interface as NERModel (predict, predict_many,
+    predict_batch) without tensorflow. The tf session thread settings of the
+    config are used for the onnxruntime session.
+    """
+
+    def __init__(self, config, filename=None):
+        """
+        Args:
+            config: (Config instance) vocabs and processing functions
+            filename: (string) path to the .onnx file, defaults to
+                config.filename_onnx
+
+        """
+        self.config = config
+        self.logger = config.logger
+        self.filename = filename if filename else config.filename_onnx
+        self.sess = None
+        self.idx_to_tag = {idx: tag for tag, idx in
+                           self.config.vocab_tags.items()}
+
+    def build(self):
+        """Loads the ONNX graph into an onnxruntime session"""
+        import onnxruntime
+
+        if not os.path.exists(self.filename):
+            raise IOError("ONNX model {} not found. Create it from the checkpoint with "
+                          "lbnlp.ner.onnx_model.export_onnx_model.".format(self.filename))
+
+        self.logger.info("Loading ONNX model...")
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.config.intra_op_parallelism_threads
+        options.inter_op_num_threads = self.config.inter_op_parallelism_threads
+        self.sess = onnxruntime.InferenceSession(
+            self.filename, sess_options=options,
+            providers=["CPUExecutionProvider"])
+
+    def close_session(self):
+        self.sess = None
+
+    def get_feed_dict(self, words):
+        """Given some data, pad it and build the onnxruntime inputs
+
+        Args:
+            words: list of sentences. A sentence is a list of ids of a list of
+                words. A word is a list of ids
+
+        Returns:
+            dict {input name: np array}, sequence_lengths
+
+        """
+        batch = pad_batch(words, use_chars=self.config.use_chars)
+        feed = {name: np.asarray(batch[name], dtype=np.int32) for name in batch}
+
+        return feed, batch["sequence_lengths"]
+
+    def predict_logits(self, words):
+        """Returns logits [batch, time, ntags] and trans_params for a batch"""
+        with self.timer.stage("pad", items=len(words)):
+            fd, sequence_lengths = self.get_feed_dict(words)
+        with self.timer.stage("session_run", items=len(words)):
+            logits, trans_params = self.sess.run(["logits", "trans_params"], fd)
+        return logits, trans_params, sequence_lengths
+
+    def predict_batch(self, words):
+        """
+        Args:
+            words: list of sentences
+
+        Returns:
+            labels_pred: list of labels for each sentence
+            sequence_length
+
+        """
+        logits, trans_params, sequence_lengths = self.predict_logits(words)
+
+        viterbi_sequences = []
+        with self.timer.stage("viterbi", items=len(words)):
+            for logit, sequence_length in zip(logits, sequence_lengths):
+                logit = logit[:sequence_length]  # keep only the valid steps
+                viterbi_seq, viterbi_score = viterbi_decode(logit, trans_params)
+                viterbi_sequences += [viterbi_seq]
+
+        return viterbi_sequences, sequence_lengths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a NER model.weights checkpoint to ONNX")
+    parser.add_argument("dir_model", help="checkpoint prefix, e.g. ner/model.weights/")
+    parser.add_argument("filename", help="output .onnx file")
+    parser.add_argument("--embeddings", default=None,
+                        help="trimmed embeddings (.npz or .npy) for checkpoints "
+                             "saved without word embeddings")
+    args = parser.parse_args()
+    embeddings = (get_trimmed_glove_vectors(args.embeddings)
+                  if args.embeddings else None)
+    export_onnx_model(args.dir_model, args.filename, embeddings)
@@ -0,0 +1,143 @@
+import itertools
+import collections
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from lbnlp.ner.data_utils import pad_batch
+
+
+class BatchPipeline(object):
+    """Training input pipeline that pads batches ahead of the train step
+
+    The dataset is read once and kept in memory. Every epoch the sentences
+    are (optionally) shuffled and bucketed by length, cut into batches, and
+    each batch is padded (see data_utils.pad_batch) by a pool of worker
+    threads or processes while the model trains on the previous ones. At
+    most `prefetch` padded batches are queued ahead of the consumer.
+
+    Example:
+        ```python
+        pipeline = BatchPipeline(train, config.batch_size, config.use_chars,
+                                 shuffle=True, bucket=True, workers=4,
+                                 prefetch=8)
+        for epoch in range(nepochs):
+            for batch in pipeline:
+                fd = model.get_padded_feed_dict(batch, lr, dropout)
+        ```
+
+    """
+
+    # sentences sorted by length together when bucketing, in batches
+    bucket_window = 50
+
+    def __init__(self, dataset, batch_size, use_chars, shuffle=False,
+                 bucket=False, workers=0, use_processes=False, prefetch=2,
+                 seed=None):
+        """
+        Args:
+            dataset: dataset that yields tuple of (sentences, tags) of ids
+            batch_size: (int) sentences per batch
+            use_chars: (bool) if True, words are (char ids, word id) pairs
+            shuffle: (bool) shuffle the sentences every epoch
+            bucket: (bool) batch sentences of similar length together, so
+                less padding is computed. Batches are still shuffled if
+                shuffle is True.
+            workers: (int) number of padding workers, 0 pads in a single
+                background thread
+            use_processes: (bool) pad in worker processes instead of
+                threads, for when padding is limited by the GIL
+            prefetch: (int) max number of batches padded ahead, 0 pads each
+                batch when it is requested, in the calling thread
+            seed: (int) seed of the shuffling
+
+        """
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.use_chars = use_chars
+        self.shuffle = shuffle
+        self.bucket = bucket
+        self.workers = workers
+        self.use_processes = use_processes
+        self.prefetch = prefetch
+        self.rng = np.random.RandomState(seed)
+        self._sentences = None
+
+    @classmethod
+    def from_config(cls, dataset, config):
+        """Builds the pipeline from the input pipeline settings of a Config"""
+        return cls(dataset, config.batch_size, config.use_chars,
+                   shuffle=config.shuffle_batches,
+                   bucket=config.bucket_batches,
+                   workers=config.input_workers,
+                   use_processes=config.input_processes,
+                   prefetch=config.prefetch_batches)
+
+    @property
+    def sentences(self):
+        """(words, tags) of every sentence, read from the dataset once"""
+        if self._sentences is None:
+            self._sentences = []
+            for words, tags in self.dataset:
+                if type(words[0]) == tuple:
+                    words = tuple(zip(*words))
+                self._sentences.append((words, tags))
+        return self._sentences
+
+    def __len__(self):
+        return (len(self.sentences) + self.batch_size - 1) // self.batch_size
+
+    def batch_indices(self):
+        """Returns the sentence indices of each batch of the next epoch"""
+        n = len(self.sentences)
+        order = self.rng.permutation(n) if self.shuffle else np.arange(n)
+
+        if self.bucket:
+            lengths = np.array([len(tags) for _, tags in self.sentences])
+            window = self.batch_size * self.bucket_window
+            order = np.concatenate(
+                [chunk[np.argsort(lengths[chunk], kind="stable")]
+                 for chunk in np.array_split(order, max(1, -(-n // window)))])
+
+        batches = [order[i:i + self.batch_size]
+                   for i in range(0, n, self.batch_size)]
+        if self.bucket and self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+        return batches
+
+    def _batch_args(self, indices):
+        words, tags = zip(*[self.sentences[i] for i in indices])
+        return list(words), list(tags), self.use_chars
+
+    def _executor(self):
+        if self.use_processes:
+            # spawn, so workers do not inherit the tf runtime of the parent
+            return ProcessPoolExecutor(
+                max_workers=max(1, self.workers),
+                mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=max(1, self.workers))
+
+    def __iter__(self):
+        batches = self.batch_indices()
+        if self.prefetch <= 0:
+            for indices in batches:
+                yield pad_batch(*self._batch_args(indices))
+            return
+
+        executor = self._executor()
+        pending = collections.deque()
+        try:
+            batches = iter(batches)
+            for indices in itertools.islice(batches, self.prefetch):
+                pending.append(executor.submit(pad_batch, *self._batch_args(indices)))
+            while pending:
+                batch = pending.popleft().result()
+                indices = next(batches, None)
+                if indices is not None:
+                    pending.append(executor.submit(pad_batch, *self._batch_args(indices)))
+                yield batch
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
@@ -0,0 +1,296 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _DocRequest(object):
+    """Book-keeping for one submitted document"""
+
+    def __init__(self, processed_sents, processed_sents_num):
+        self.processed_sents = processed_sents
+        self.processed_sents_num = processed_sents_num
+        self.tags = [[] for _ in processed_sents]
+        self.remaining = sum(1 for sent in processed_sents if sent)
+        self.future = Future()
+
+
+class BatchingNERServer(object):
+    """Serves concurrent tag_doc calls from one NERClassifier with micro-batching
+
+    Callers preprocess their own document (tokenization, processing, id
+    lookup) in their own thread and queue its sentences. A single worker
+    thread collects queued sentences, from any number of callers, into one
+    batch until either max_batch_size sentences are waiting or max_delay
+    seconds have passed since the first one arrived. It then runs one
+    forward pass for the whole batch and resolves each caller's future once
+    all of its sentences are tagged.
+
+    Example:
+        ```python
+        server = BatchingNERServer(clf, max_batch_size=64, max_delay=0.005)
+        with server:
+            tagged_doc = server.tag_doc("The band gap of ZnO is 3.3 eV.")
+        ```
+
+    """
+
+    def __init__(self, classifier, max_batch_size=64, max_delay=0.005):
+        """
+        Args:
+            classifier: (NERClassifier) a loaded classifier
+            max_batch_size: (int) max number of sentences in one forward pass
+            max_delay: (float) max seconds the first sentence of a batch
+                waits for more sentences before the batch is run
+
+        """
+        self.classifier = classifier
+        self.model = classifier.model
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+        # orders submit against stop, so that no sentence is queued after
+        # the sentinel that ends the worker
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        """Starts the batching worker thread"""
+        with self._lock:
+            if self._thread is None:
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run,
+                                                name="BatchingNERServer",
+                                                daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the worker thread once the sentences already queued are done
+
+        Documents submitted from then on are refused with a RuntimeError,
+        and any request still queued after the worker ended fails with one.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopped.set()
+            self._queue.put(None)
+        thread.join()
+        with self._lock:
+            self._thread = None
+        error = RuntimeError("BatchingNERServer was stopped")
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and not item[0].future.done():
+                item[0].future.set_exception(error)
+
+    def submit(self, doc):
+        """Queues a document for tagging
+
+        Args:
+            doc: (str) a document
+
+        Returns:
+            future: (concurrent.futures.Future) resolves to the tagged
+                document in the same format as NERClassifier.tag_doc
+
+        """
+        self._check_running()
+        processed_sents, processed_sents_num = self.classifier._preprocess(doc)
+        request = _DocRequest(processed_sents, processed_sents_num)
+        if request.remaining == 0:
+            request.future.set_result(self._tagged(request))
+            return request.future
+
+        items = [(request, i, self.model.sentence_to_ids(sent))
+                 for i, sent in enumerate(processed_sents) if sent]
+        with self._lock:
+            # all sentences of a document are queued before a stop
+            self._check_running()
+            for item in items:
+                self._queue.put(item)
+        return request.future
+
+    def _check_running(self):
+        if self._stopped.is_set():
+            raise RuntimeError("BatchingNERServer has been stopped")
+        if self._thread is None:
+            raise RuntimeError("BatchingNERServer has not been started")
+
+    def tag_doc(self, doc, timeout=None):
+        """Tags one document, blocking until its batch has been run
+
+        Args:
+            doc: (str) a document
+            timeout: (float) max seconds to wait for the result
+
+        Returns:
+            List of sentences, each a list of (token, tag) tuples.
+
+        """
+        return self.submit(doc).result(timeout=timeout)
+
+    def tag_docs(self, docs, timeout=None):
+        """Tags several documents, letting their sentences share batches"""
+        futures = [self.submit(doc) for doc in docs]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _tagged(self, request):
+        return self.classifier._tag_processed(request.processed_sents,
+                                              request.processed_sents_num,
+                                              tags=request.tags)
+
+    def _next_batch(self):
+        """Blocks for the first item, then gathers more until full or late"""
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # put the sentinel back so the loop ends after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                if self._stopped.is_set():
+                    return
+                continue
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            pred_ids, sequence_lengths = self.model.predict_batch(
+                [words for _, _, words in batch])
+        except Exception as e:
+            for request in {id(r): r for r, _, _ in batch}.values():
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        for (request, i, _), ids, length in zip(batch, pred_ids,
+                                                sequence_lengths):
+            if request.future.done():
+                continue
+            request.tags[i] = [self.model.idx_to_tag[idx]
+                               for idx in list(ids)[:length]]
+            request.remaining -= 1
+            if request.remaining == 0:
+                try:
+                    request.future.set_result(self._tagged(request))
+                except Exception as e:
+                    request.future.set_exception(e)
+
+
+def make_http_server(server, host="127.0.0.1", port=8080):
+    """Builds a threaded stdlib HTTP front end around a BatchingNERServer
+
+    Endpoints:
+        POST /tag with {"text": "..."} returns {"tags": tagged_doc}
+        POST /tag with {"texts": [...]} returns {"tags": [tagged_doc, ...]}
+        GET /health returns {"status": "ok"}
+
+    Args:
+        server: (BatchingNERServer) a started server
+        host: (str) address to bind
+        port: (int) port to bind
+
+    Returns:
+        http.server.ThreadingHTTPServer, call serve_forever() to run it
+
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok"})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/tag":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+                if "texts" in request:
+                    tags = server.tag_docs(request["texts"])
+                else:
+                    tags = server.tag_doc(request["text"])
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._reply(500, {"error": str(e)})
+                return
+            self._reply(200, {"tags": tags})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+if __name__ == "__main__":
+    from lbnlp.models.load.matscholar_2020v1 import load
+
+    parser = argparse.ArgumentParser(
+        description="Serve the matscholar_2020v1 NER model over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-delay", type=float, default=0.005,
+                        help="max seconds a sentence waits for its batch")
+    args = parser.parse_args()
+
+    ner_server = BatchingNERServer(load("ner"),
+                                   max_batch_size=args.max_batch_size,
+                                   max_delay=args.max_delay)
+    with ner_server:
+        httpd = make_http_server(ner_server, args.host, args.port)
+        print("Serving NER on http://{}:{}/tag".format(args.host, args.port))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
@@ -6,20 +6,30 @@ import numpy as np
 import tensorflow as tf
 
 
-from lbnlp.ner.data_utils import minibatches, pad_sequences, get_chunks
+from lbnlp.ner.data_utils import minibatches, pad_sequences, pad_batch
+from lbnlp.ner.evaluate import evaluate_model
+from lbnlp.ner.pipeline import BatchPipeline
 from lbnlp.ner.general_utils import Progbar
 from lbnlp.ner.base import BaseModel
+from lbnlp.ner.tagger import Tagger
 
 
 np.random.seed(1)
 tf.set_random_seed(1)
 
 
-class NERModel(BaseModel):
-    """Specialized class of Model for NER"""
+class NERModel(BaseModel, Tagger):
+    """Specialized class of Model for NER
+
+    Every instance builds into its own tf.Graph and tf.Session, so several
+    models can be loaded in one process and predict_batch can be called
+    from several threads at once.
+    """
 
     def __init__(self, config):
         super(NERModel, self).__init__(config)
+        self.feed_word_embeddings = False
+        self.train_pipeline = None
         self.idx_to_tag = {idx: tag for tag, idx in
                            self.config.vocab_tags.items()}
 
@@ -65,28 +75,39 @@ class NERModel(BaseModel):
             dict {placeholder: value}
 
         """
-        # perform padding of the given data
-        if self.config.use_chars:
-            char_ids, word_ids = zip(*words)
-            word_ids, sequence_lengths = pad_sequences(word_ids, 0)
-            char_ids, word_lengths = pad_sequences(char_ids, pad_tok=0,
-                                                   nlevels=2)
-        else:
-            word_ids, sequence_lengths = pad_sequences(words, 0)
+        batch = pad_batch(words, labels, self.config.use_chars)
+        feed = self.get_padded_feed_dict(batch, lr, dropout)
 
-        # build feed dictionary
+        return feed, batch["sequence_lengths"]
+
+    def get_padded_feed_dict(self, batch, lr=None, dropout=None):
+        """Builds a feed dictionary from an already padded batch
+
+        Args:
+            batch: dict of padded arrays, see data_utils.pad_batch and
+                ShardedDataset.padded_minibatches
+            lr: (float) learning rate
+            dropout: (float) keep prob
+
+        Returns:
+            dict {placeholder: value}
+
+        """
         feed = {
-            self.word_ids: word_ids,
-            self.sequence_lengths: sequence_lengths
+            self.word_ids: batch["word_ids"],
+            self.sequence_lengths: batch["sequence_lengths"]
         }
 
         if self.config.use_chars:
-            feed[self.char_ids] = char_ids
-            feed[self.word_lengths] = word_lengths
+            feed[self.char_ids] = batch["char_ids"]
+            feed[self.word_lengths] = batch["word_lengths"]
 
-        if labels is not None:
-            labels, _ = pad_sequences(labels, 0)
-            feed[self.labels] = labels
+        if self.feed_word_embeddings:
+            feed[self.word_embeddings_lookup] = self.config.embeddings[
+                np.asarray(batch["word_ids"])]
+
+        if "labels" in batch:
+            feed[self.labels] = batch["labels"]
 
         if lr is not None:
             feed[self.lr] = lr
@@ -94,7 +115,7 @@ class NERModel(BaseModel):
         if dropout is not None:
             feed[self.dropout] = dropout
 
-        return feed, sequence_lengths
+        return feed
 
     def add_word_embeddings_op(self):
         """Defines self.word_embeddings
@@ -103,9 +124,27 @@ class NERModel(BaseModel):
         with pre-trained word vectors, the word embeddings is just a look-up
         and we don't train the vectors. Otherwise, a random matrix with
         the correct shape is initialized.
+
+        With config.feed_word_embeddings, memory-mapped pre-trained vectors
+        are not copied into the graph at all: the look-up is done in numpy by
+        get_feed_dict and fed to a placeholder, so every process reads the
+        same shared pages. Such a graph has no words/_word_embeddings
+        variable, so it is only used for inference: train and
+        save_prediction_model refuse it.
         """
+        self.feed_word_embeddings = (
+            self.config.feed_word_embeddings
+            and isinstance(self.config.embeddings, np.memmap)
+            and not self.config.train_embeddings)
+
         with tf.variable_scope("words"):
-            if self.config.embeddings is None:
+            if self.feed_word_embeddings:
+                word_embeddings = tf.placeholder(
+                    tf.float32,
+                    shape=[None, None, self.config.embeddings.shape[1]],
+                    name="word_embeddings")
+                self.word_embeddings_lookup = word_embeddings
+            elif self.config.embeddings is None:
                 self.logger.info("WARNING: randomly initializing word vectors")
                 _word_embeddings = tf.get_variable(
                     name="_word_embeddings",
@@ -118,9 +157,10 @@ class NERModel(BaseModel):
                     dtype=tf.float32,
                     trainable=self.config.train_embeddings)
 
-            word_embeddings = tf.nn.embedding_lookup(_word_embeddings,
-                                                     self.word_ids,
-                                                     name="word_embeddings")
+            if not self.feed_word_embeddings:
+                word_embeddings = tf.nn.embedding_lookup(_word_embeddings,
+                                                         self.word_ids,
+                                                         name="word_embeddings")
 
         with tf.variable_scope("chars"):
             if self.config.use_chars:
@@ -222,18 +262,34 @@ class NERModel(BaseModel):
         tf.summary.scalar("loss", self.loss)
 
     def build(self):
-        # NER specific functions
-        self.add_placeholders()
-        self.add_word_embeddings_op()
-        self.add_logits_op()
-        self.add_pred_op()
-        self.add_loss_op()
-
-        # Generic functions that add training op and initialize session
-        self.add_train_op(self.config.lr_method, self.lr, self.loss,
-                          self.config.clip)
+        """Builds the model in a fresh graph owned by this instance
+
+        Each call starts from a new tf.Graph, so building never touches the
+        global default graph or the graphs of other models in the process.
+        """
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.set_random_seed(1)
+
+            # NER specific functions
+            self.add_placeholders()
+            self.add_word_embeddings_op()
+            self.add_logits_op()
+            self.add_pred_op()
+            self.add_loss_op()
+
+            # Generic functions that add training op and initialize session
+            self.add_train_op(self.config.lr_method, self.lr, self.loss,
+                              self.config.clip)
         self.initialize_session()  # now self.sess is defined and vars are init
 
+    def train(self, train, dev):
+        """See BaseModel.train, the word embeddings must be in the graph"""
+        if self.feed_word_embeddings:
+            raise ValueError("A model built with config.feed_word_embeddings has no word "
+                             "embeddings variable to checkpoint, build it without to train")
+        return super(NERModel, self).train(train, dev)
+
     def predict_batch(self, words):
         """
         Args:
@@ -244,28 +300,37 @@ class NERModel(BaseModel):
             sequence_length
 
         """
-        fd, sequence_lengths = self.get_feed_dict(words, dropout=1.0)
+        with self.timer.stage("pad", items=len(words)):
+            fd, sequence_lengths = self.get_feed_dict(words, dropout=1.0)
 
         if self.config.use_crf:
             # get tag scores and transition params of CRF
             viterbi_sequences = []
-            logits, trans_params = self.sess.run(
-                [self.logits, self.trans_params], feed_dict=fd)
+            with self.timer.stage("session_run", items=len(words)):
+                logits, trans_params = self.sess.run(
+                    [self.logits, self.trans_params], feed_dict=fd)
 
             # iterate over the sentences because no batching in vitervi_decode
-            for logit, sequence_length in zip(logits, sequence_lengths):
-                logit = logit[:sequence_length]  # keep only the valid steps
-                viterbi_seq, viterbi_score = tf.contrib.crf.viterbi_decode(
-                    logit, trans_params)
-                viterbi_sequences += [viterbi_seq]
+            with self.timer.stage("viterbi", items=len(words)):
+                for logit, sequence_length in zip(logits, sequence_lengths):
+                    logit = logit[:sequence_length]  # keep only the valid steps
+                    viterbi_seq, viterbi_score = tf.contrib.crf.viterbi_decode(
+                        logit, trans_params)
+                    viterbi_sequences += [viterbi_seq]
 
             return viterbi_sequences, sequence_lengths
 
         else:
-            labels_pred = self.sess.run(self.labels_pred, feed_dict=fd)
+            with self.timer.stage("session_run", items=len(words)):
+                labels_pred = self.sess.run(self.labels_pred, feed_dict=fd)
 
             return labels_pred, sequence_lengths
 
+    def uses_input_pipeline(self):
+        """True if the config asks for a shuffling or prefetching pipeline"""
+        return bool(self.config.prefetch_batches or self.config.shuffle_batches
+                    or self.config.bucket_batches)
+
     def run_epoch(self, train, dev, epoch):
         """Performs one complete pass over the train set and evaluate on dev
 
@@ -277,17 +342,46 @@ class NERModel(BaseModel):
         Returns:
             f1: (python float), score to select model on, higher is better
 
+        """
+        self.train_epoch(train, epoch)
+
+        metrics = self.run_evaluate(dev)
+        msg = " - ".join(["{} {:04.2f}".format(k, v)
+                          for k, v in metrics.items()])
+        self.logger.info(msg)
+
+        return metrics["f1"]
+
+    def train_epoch(self, train, epoch):
+        """Performs one complete pass over the train set
+
+        Args:
+            train: dataset that yields tuple of sentences, tags
+            epoch: (int) index of the current epoch
+
         """
         # progbar stuff for logging
         batch_size = self.config.batch_size
         nbatches = (len(train) + batch_size - 1) // batch_size
         prog = Progbar(target=nbatches)
 
-        # iterate over dataset
-        for i, (words, labels) in enumerate(minibatches(train, batch_size)):
-            fd, _ = self.get_feed_dict(words, labels, self.config.lr,
-                                       self.config.dropout)
+        # iterate over dataset, preprocessed shards come already padded
+        if self.uses_input_pipeline():
+            if self.train_pipeline is None or self.train_pipeline.dataset is not train:
+                self.train_pipeline = BatchPipeline.from_config(train, self.config)
+            feeds = (self.get_padded_feed_dict(batch, self.config.lr,
+                                               self.config.dropout)
+                     for batch in self.train_pipeline)
+        elif hasattr(train, "padded_minibatches"):
+            feeds = (self.get_padded_feed_dict(batch, self.config.lr,
+                                               self.config.dropout)
+                     for batch in train.padded_minibatches(batch_size))
+        else:
+            feeds = (self.get_feed_dict(words, labels, self.config.lr,
+                                        self.config.dropout)[0]
+                     for words, labels in minibatches(train, batch_size))
 
+        for i, fd in enumerate(feeds):
             _, train_loss, summary = self.sess.run(
                 [self.train_op, self.loss, self.merged], feed_dict=fd)
 
@@ -297,13 +391,6 @@ class NERModel(BaseModel):
             if i % 10 == 0:
                 self.file_writer.add_summary(summary, epoch * nbatches + i)
 
-        metrics = self.run_evaluate(dev)
-        msg = " - ".join(["{} {:04.2f}".format(k, v)
-                          for k, v in metrics.items()])
-        self.logger.info(msg)
-
-        return metrics["f1"]
-
     def run_evaluate(self, test):
         """Evaluates performance on test set
 
@@ -314,31 +401,21 @@ class NERModel(BaseModel):
             metrics: (dict) metrics["acc"] = 98.4, ...
 
         """
-        accs = []
-        correct_preds, total_correct, total_preds = 0., 0., 0.
-        for words, labels in minibatches(test, self.config.batch_size):
-            labels_pred, sequence_lengths = self.predict_batch(words)
-
-            for lab, lab_pred, length in zip(labels, labels_pred,
-                                             sequence_lengths):
-                lab = lab[:length]
-                lab_pred = lab_pred[:length]
-                accs += [a == b for (a, b) in zip(lab, lab_pred)]
+        metrics = self.run_evaluate_all(test)
+        return {"acc": metrics["acc"], "f1": metrics["f1"]}
 
-                lab_chunks = set(get_chunks(lab, self.config.vocab_tags))
-                lab_pred_chunks = set(get_chunks(lab_pred,
-                                                 self.config.vocab_tags))
+    def run_evaluate_all(self, test):
+        """Predicts the test set once and computes every metric from it
 
-                correct_preds += len(lab_chunks & lab_pred_chunks)
-                total_preds += len(lab_pred_chunks)
-                total_correct += len(lab_chunks)
+        Args:
+            test: dataset that yields tuple of (sentences, tags)
 
-        p = correct_preds / total_preds if correct_preds > 0 else 0
-        r = correct_preds / total_correct if correct_preds > 0 else 0
-        f1 = 2 * p * r / (p + r) if correct_preds > 0 else 0
-        acc = np.mean(accs)
+        Returns:
+            metrics: (dict) see lbnlp.ner.evaluate.evaluate_model, with
+                accuracy, micro/macro and per-tag F1 and speed
 
-        return {"acc": 100 * acc, "f1": 100 * f1}
+        """
+        return evaluate_model(self, test, self.config.batch_size, warmup=False)
 
     def evaluate_all(self, test, tag):
         """Evaluates f1 for each tag on test set
@@ -351,53 +428,8 @@ class NERModel(BaseModel):
             metrics: (dict) metrics["acc"] = 98.4, ...
 
         """
-        accs = []
-        correct_preds, total_correct, total_preds = 0., 0., 0.
-        for words, labels in minibatches(test, self.config.batch_size):
-            labels_pred, sequence_lengths = self.predict_batch(words)
-
-            for lab, lab_pred, length in zip(labels, labels_pred,
-                                             sequence_lengths):
-                lab = lab[:length]
-                lab_pred = lab_pred[:length]
-                accs += [a == b for (a, b) in zip(lab, lab_pred)]
-
-                lab_chunks = set(get_chunks(lab, self.config.vocab_tags))
-                lab_pred_chunks = set(get_chunks(lab_pred,
-                                                 self.config.vocab_tags))
-
-                lab_chunks = set(
-                    [(l, b, e) for l, b, e in lab_chunks if l == tag])
-                lab_pred_chunks = set(
-                    [(l, b, e) for l, b, e in lab_pred_chunks if l == tag])
-
-                correct_preds += len(lab_chunks & lab_pred_chunks)
-                total_preds += len(lab_pred_chunks)
-                total_correct += len(lab_chunks)
-
-        p = correct_preds / total_preds if correct_preds > 0 else 0
-        r = correct_preds / total_correct if correct_preds > 0 else 0
-        f1 = 2 * p * r / (p + r) if correct_preds > 0 else 0
-
-        return {"label": tag, "f1": 100 * f1}
-
-    def predict(self, words_raw):
-        """Returns list of tags
-
-        Args:
-            words_raw: list of words (string), just one sentence (no batch)
-
-        Returns:
-            preds: list of tags (string), one for each word in the sentence
-
-        """
-        words = [self.config.processing_word(w) for w in words_raw]
-        if type(words[0]) == tuple:
-            words = zip(*words)
-        pred_ids, _ = self.predict_batch([words])
-        preds = [self.idx_to_tag[idx] for idx in list(pred_ids[0])]
-
-        return preds
+        per_tag = self.run_evaluate_all(test)["per_tag"]
+        return {"label": tag, "f1": per_tag.get(tag, {"f1": 0})["f1"]}
 
 
 class NERServingModel(NERModel):
@@ -462,19 +494,22 @@ class NERServingModel(NERModel):
             sequence_length
 
         """
-        fd, sequence_lengths = self.get_feed_dict(words, dropout=1.0)
+        with self.timer.stage("pad", items=len(words)):
+            fd, sequence_lengths = self.get_feed_dict(words, dropout=1.0)
 
         if self.config.use_crf:
             # get tag scores and transition params of CRF
             viterbi_sequences = []
-            logits, trans_params = self._api_call_predict(fd)
+            with self.timer.stage("serving_request", items=len(words)):
+                logits, trans_params = self._api_call_predict(fd)
 
             # iterate over the sentences because no batching in vitervi_decode
-            for logit, sequence_length in zip(logits, sequence_lengths):
-                logit = logit[:sequence_length]  # keep only the valid steps
-                viterbi_seq, viterbi_score = tf.contrib.crf.viterbi_decode(
-                    logit, trans_params)
-                viterbi_sequences += [viterbi_seq]
+            with self.timer.stage("viterbi", items=len(words)):
+                for logit, sequence_length in zip(logits, sequence_lengths):
+                    logit = logit[:sequence_length]  # keep only the valid steps
+                    viterbi_seq, viterbi_score = tf.contrib.crf.viterbi_decode(
+                        logit, trans_params)
+                    viterbi_sequences += [viterbi_seq]
 
             return viterbi_sequences, sequence_lengths
 
@@ -503,6 +538,9 @@ class NERServingModel(NERModel):
     def save_prediction_model(self, save_dir):
         """Makes a tf saved_model copy of the current NER model
 
+        The word embeddings must be in the graph, since the signature
+        only takes word ids.
+
         Args:
             save_dir: Directory to save the model
 
@@ -510,13 +548,17 @@ class NERServingModel(NERModel):
             self
 
         """
-
-        tf.saved_model.simple_save(
-            self.sess,
-            save_dir,
-            {"word_ids": self.word_ids,
-             "sequence_lengths": self.sequence_lengths, "dropout": self.dropout,
-             "word_lengths": self.word_lengths, "char_ids": self.char_ids},
-            {"logits": self.logits, "trans_params": self.trans_params}
-        )
+        if self.feed_word_embeddings:
+            raise ValueError("A model built with config.feed_word_embeddings needs the word "
+                             "embeddings fed with each request, build it without to export it")
+
+        with self.graph.as_default():
+            tf.saved_model.simple_save(
+                self.sess,
+                save_dir,
+                {"word_ids": self.word_ids,
+                 "sequence_lengths": self.sequence_lengths, "dropout": self.dropout,
+                 "word_lengths": self.word_lengths, "char_ids": self.char_ids},
+                {"logits": self.logits, "trans_params": self.trans_params}
+            )
         return self
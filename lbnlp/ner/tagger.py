@@ -0,0 +1,71 @@
+from lbnlp.timing import NULL_TIMER
+
+
+class Tagger(object):
+    """Prediction helpers shared by the NER model backends
+
+    Subclasses define predict_batch(words) returning (labels_pred,
+    sequence_lengths) and set self.config and self.idx_to_tag. Nothing here
+    depends on tensorflow. Stages are timed with self.timer, see
+    lbnlp.timing.StageTimer.
+    """
+
+    timer = NULL_TIMER
+
+    def predict(self, words_raw):
+        """Returns list of tags
+
+        Args:
+            words_raw: list of words (string), just one sentence (no batch)
+
+        Returns:
+            preds: list of tags (string), one for each word in the sentence
+
+        """
+        with self.timer.stage("word_ids", items=len(words_raw)):
+            words = self.sentence_to_ids(words_raw)
+        pred_ids, _ = self.predict_batch([words])
+        preds = [self.idx_to_tag[idx] for idx in list(pred_ids[0])]
+
+        return preds
+
+    def predict_many(self, sentences_raw):
+        """Returns list of tags for each sentence, tagging them in one batch
+
+        Args:
+            sentences_raw: list of sentences, each a list of words (string)
+
+        Returns:
+            preds: list of lists of tags (string), one list per sentence.
+                Empty sentences get an empty list of tags.
+
+        """
+        preds = [[] for _ in sentences_raw]
+        idxs = [i for i, words_raw in enumerate(sentences_raw) if words_raw]
+        if not idxs:
+            return preds
+
+        with self.timer.stage("word_ids") as stage:
+            words = [self.sentence_to_ids(sentences_raw[i]) for i in idxs]
+            stage.items = sum(len(sentences_raw[i]) for i in idxs)
+        pred_ids, sequence_lengths = self.predict_batch(words)
+        for i, ids, length in zip(idxs, pred_ids, sequence_lengths):
+            preds[i] = [self.idx_to_tag[idx] for idx in list(ids)[:length]]
+
+        return preds
+
+    def sentence_to_ids(self, words_raw):
+        """Maps one sentence of raw words to the ids expected by predict_batch
+
+        Args:
+            words_raw: list of words (string), just one sentence (no batch)
+
+        Returns:
+            words: list of word ids, or a tuple (list of char ids, list of
+                word ids) if the model uses characters
+
+        """
+        words = [self.config.processing_word(w) for w in words_raw]
+        if type(words[0]) == tuple:
+            words = tuple(zip(*words))
+        return words
@@ -0,0 +1,80 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from lbnlp.ner.config import Configure
+from lbnlp.ner.data_utils import convert_trimmed_glove_vectors, compile_vocab
+from lbnlp.ner.vocab import CompactVocab, COMPACT_VOCAB_MIN_WORDS
+
+
+class ConfigPickleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.data_dir, "words.txt"), "w") as f:
+            f.write("\n".join(["$UNK$", "$NUM$", "the", "zno"]))
+        with open(os.path.join(self.data_dir, "chars.txt"), "w") as f:
+            f.write("\n".join("ehnotZO"))
+        with open(os.path.join(self.data_dir, "tags.txt"), "w") as f:
+            f.write("\n".join(["O", "B-MAT"]))
+        np.savez_compressed(os.path.join(self.data_dir, "glove.6B.200d.trimmed.npz"),
+                            embeddings=np.random.rand(4, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_round_trip_reloads_vocabs(self):
+        config = Configure(data_dir=self.data_dir)
+        config.dim_word = 250
+        config.lr = 0.001
+
+        copy = pickle.loads(pickle.dumps(config))
+        self.assertEqual(copy.dim_word, 250)
+        self.assertEqual(copy.lr, 0.001)
+        self.assertEqual(copy.dir_final_model, config.dir_final_model)
+        self.assertEqual(dict(copy.vocab_words), dict(config.vocab_words))
+        self.assertEqual(copy.processing_word("ZnO"), config.processing_word("ZnO"))
+        np.testing.assert_array_equal(copy.embeddings, config.embeddings)
+        self.assertIs(copy.logger, config.logger)
+
+    def test_round_trip_memmap_embeddings_and_compiled_vocab(self):
+        # a compiled word vocab large enough to stay a CompactVocab, and memory-mapped embeddings
+        words = ["$UNK$", "$NUM$", "the", "zno"] + ["word{}".format(i) for i in range(COMPACT_VOCAB_MIN_WORDS)]
+        with open(os.path.join(self.data_dir, "words.txt"), "w") as f:
+            f.write("\n".join(words))
+        compile_vocab(os.path.join(self.data_dir, "words.txt"))
+        np.savez_compressed(os.path.join(self.data_dir, "glove.6B.200d.trimmed.npz"),
+                            embeddings=np.random.rand(len(words), 3))
+        convert_trimmed_glove_vectors(os.path.join(self.data_dir, "glove.6B.200d.trimmed.npz"))
+
+        config = Configure(data_dir=self.data_dir)
+        self.assertIsInstance(config.vocab_words, CompactVocab)
+        self.assertIsInstance(config.embeddings, np.memmap)
+        state = config.__getstate__()
+        for name in ("logger", "vocab_words", "vocab_chars", "vocab_tags", "processing_word",
+                     "processing_tag", "embeddings"):
+            self.assertNotIn(name, state)
+
+        copy = pickle.loads(pickle.dumps(config))
+        self.assertIsInstance(copy.vocab_words, CompactVocab)
+        self.assertEqual(len(copy.vocab_words), len(words))
+        self.assertEqual(copy.vocab_words.get("word7"), 11)
+        self.assertEqual(dict(copy.vocab_chars), dict(config.vocab_chars))
+        self.assertEqual(dict(copy.vocab_tags), {"O": 0, "B-MAT": 1})
+        self.assertEqual((copy.nwords, copy.nchars, copy.ntags), (config.nwords, config.nchars, config.ntags))
+        for word in ["ZnO", "the", "word7", "unknown", "42"]:
+            self.assertEqual(copy.processing_word(word), config.processing_word(word))
+        self.assertEqual(copy.processing_tag("B-MAT"), 1)
+        with self.assertRaises(Exception):
+            copy.processing_tag("B-XYZ")
+        self.assertIsInstance(copy.embeddings, np.memmap)
+        self.assertEqual(copy.embeddings.dtype, np.float32)
+        np.testing.assert_array_equal(copy.embeddings, config.embeddings)
+
+
+if __name__ == "__main__":
+    unittest.main()
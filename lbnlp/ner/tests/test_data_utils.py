@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from lbnlp.ner.data_utils import get_trimmed_glove_vectors, convert_trimmed_glove_vectors, \
+    get_chunks, get_chunks_batch, get_processing_word, CoNLLDataset, ShardedDataset, \
+    write_conll_shards, minibatches, pad_batch, sample_sentences
+
+
+class TrimmedEmbeddingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.data_dir, "glove.trimmed.npz")
+        self.embeddings = np.random.RandomState(0).rand(6, 4)
+        np.savez_compressed(self.filename, embeddings=self.embeddings)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_memory_mapped_copy(self):
+        self.assertNotIsInstance(get_trimmed_glove_vectors(self.filename), np.memmap)
+
+        npy_filename = convert_trimmed_glove_vectors(self.filename)
+        self.assertEqual(npy_filename, os.path.join(self.data_dir, "glove.trimmed.npy"))
+
+        embeddings = get_trimmed_glove_vectors(self.filename)
+        self.assertIsInstance(embeddings, np.memmap)
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assertFalse(embeddings.flags.writeable)
+        np.testing.assert_allclose(embeddings, self.embeddings, rtol=1e-6)
+
+        in_memory = get_trimmed_glove_vectors(self.filename, mmap=False)
+        self.assertNotIsInstance(in_memory, np.memmap)
+
+
+class ChunksBatchTest(unittest.TestCase):
+
+    tags = {"O": 0, "B-MAT": 1, "I-MAT": 2, "B-PRO": 3, "I-PRO": 4, "PVL": 5}
+
+    def test_matches_get_chunks(self):
+        rng = np.random.RandomState(0)
+        seqs = [rng.randint(0, 6, size=rng.randint(0, 10)).tolist() for _ in range(500)]
+        self.assertEqual(get_chunks_batch(seqs, self.tags),
+                         [get_chunks(seq, self.tags) for seq in seqs])
+
+    def test_padded_matrix(self):
+        seqs = np.array([[1, 2, 0, 3], [3, 4, 4, 1], [2, 2, 5, 5]])
+        self.assertEqual(get_chunks_batch(seqs, self.tags),
+                         [[("MAT", 0, 2), ("PRO", 3, 4)],
+                          [("PRO", 0, 3), ("MAT", 3, 4)],
+                          [("MAT", 0, 2), ("PVL", 2, 4)]])
+        self.assertEqual(get_chunks_batch([], self.tags), [])
+        self.assertEqual(get_chunks_batch([[], []], self.tags), [[], []])
+
+
+CONLL = """-DOCSTART- O
+
+The O
+band B-PRO
+gap I-PRO
+of O
+ZnO B-MAT
+
+ZnO B-MAT
+is O
+3.3 O
+
+annealed B-SMT
+
+TiO2 B-MAT
+and O
+ZnO B-MAT
+films B-DSC
+
+"""
+
+
+class ShardedDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.data_dir, "test.txt")
+        with open(self.filename, "w") as f:
+            f.write(CONLL)
+        self.vocab_words = {w: i for i, w in enumerate(["$UNK$", "$NUM$", "the", "gap", "zno"])}
+        self.vocab_chars = {c: i for i, c in enumerate("abcdefghnOZ")}
+        self.vocab_tags = {t: i for i, t in enumerate(
+            ["O", "B-PRO", "I-PRO", "B-MAT", "B-SMT", "B-DSC"])}
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def _check(self, use_chars):
+        processing_word = get_processing_word(self.vocab_words, self.vocab_chars,
+                                              lowercase=True, chars=use_chars)
+        processing_tag = get_processing_word(self.vocab_tags, lowercase=False, allow_unk=False)
+        dataset = CoNLLDataset(self.filename, processing_word, processing_tag)
+        self.assertEqual(len(dataset), 4)
+
+        dir_shards = os.path.join(self.data_dir, "shards")
+        index = write_conll_shards(dataset, dir_shards, shard_size=3)
+        self.assertEqual(len(index["shards"]), 2)
+
+        sharded = ShardedDataset(dir_shards)
+        self.assertEqual(len(sharded), 4)
+        self.assertEqual(list(sharded), list(dataset))
+        self.assertEqual(len(ShardedDataset(dir_shards, max_iter=2)), 2)
+
+        expected = [pad_batch(words, labels, use_chars)
+                    for words, labels in minibatches(dataset, 2)]
+        batches = list(sharded.padded_minibatches(2))
+        self.assertEqual(len(batches), len(expected))
+        for batch, expected_batch in zip(batches, expected):
+            self.assertEqual(sorted(batch), sorted(expected_batch))
+            for name in batch:
+                np.testing.assert_array_equal(batch[name], np.asarray(expected_batch[name]))
+
+    def test_words(self):
+        self._check(use_chars=False)
+
+    def test_words_and_chars(self):
+        self._check(use_chars=True)
+
+
+class SampleSentencesTest(unittest.TestCase):
+
+    def test_fixed_sample_in_order(self):
+        data = [([i], [0]) for i in range(100)]
+        sample = sample_sentences(iter(data), 10)
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(sample, sorted(sample))
+        self.assertEqual(sample, sample_sentences(iter(data), 10))
+        self.assertEqual(sample_sentences(data, 200), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from lbnlp.ner.evaluate import chunk_scores, evaluate_model, check_thresholds
+
+VOCAB_TAGS = {"O": 0, "B-MAT": 1, "I-MAT": 2, "B-PRO": 3, "I-PRO": 4}
+
+
+class StubConfig(object):
+    vocab_tags = VOCAB_TAGS
+    batch_size = 2
+
+
+class StubModel(object):
+    """Predicts a fixed tag sequence per sentence, keyed by its first word id"""
+
+    config = StubConfig()
+
+    def __init__(self, predictions):
+        self.predictions = predictions
+        self.calls = 0
+
+    def predict_batch(self, words):
+        self.calls += 1
+        return [self.predictions[w[0]] for w in words], [len(w) for w in words]
+
+
+# (word ids, gold tags, predicted tags)
+SENTENCES = [
+    ([10, 11, 12, 13], [1, 2, 0, 3], [1, 2, 0, 3]),  # MAT and PRO right
+    ([20, 21, 22], [1, 0, 3], [1, 0, 0]),  # PRO missed
+    ([30, 31], [0, 0], [3, 4]),  # spurious PRO
+    ([40, 41, 42], [1, 1, 0], [1, 2, 0]),  # two MATs predicted as one
+]
+
+
+class EvaluateTest(unittest.TestCase):
+
+    def test_chunk_scores(self):
+        metrics = chunk_scores([s[1] for s in SENTENCES], [s[2] for s in SENTENCES],
+                               VOCAB_TAGS)
+        # gold: 4 MAT, 2 PRO; predicted: 3 MAT, 2 PRO; correct: 2 MAT, 1 PRO
+        self.assertAlmostEqual(metrics["precision"], 100 * 3 / 5)
+        self.assertAlmostEqual(metrics["recall"], 100 * 3 / 6)
+        self.assertAlmostEqual(metrics["f1"], 100 * 2 * 0.6 * 0.5 / 1.1)
+        self.assertAlmostEqual(metrics["acc"], 100 * 8 / 12)
+
+        mat, pro = metrics["per_tag"]["MAT"], metrics["per_tag"]["PRO"]
+        self.assertEqual(mat["support"], 4)
+        self.assertAlmostEqual(mat["f1"], 100 * 2 * (2 / 3) * (2 / 4) / (2 / 3 + 2 / 4))
+        self.assertAlmostEqual(pro["f1"], 50.)
+        self.assertAlmostEqual(metrics["macro_f1"], (mat["f1"] + pro["f1"]) / 2)
+
+    def test_evaluate_model_predicts_once(self):
+        model = StubModel({s[0][0]: s[2] for s in SENTENCES})
+        test = [(s[0], s[1]) for s in SENTENCES]
+        metrics = evaluate_model(model, test, warmup=False)
+
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(metrics["sentences"], 4)
+        self.assertEqual(metrics["tokens"], 12)
+        self.assertGreater(metrics["sentences_per_sec"], 0)
+        self.assertLessEqual(metrics["latency_ms"]["p50"], metrics["latency_ms"]["max"])
+        expected = chunk_scores([s[1] for s in SENTENCES], [s[2] for s in SENTENCES],
+                                VOCAB_TAGS)
+        self.assertEqual(metrics["per_tag"], expected["per_tag"])
+
+        self.assertEqual(check_thresholds(metrics, min_f1=50, max_p99_ms=1e6), [])
+        self.assertEqual(len(check_thresholds(metrics, min_f1=60, min_macro_f1=60)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
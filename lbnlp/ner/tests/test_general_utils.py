@@ -0,0 +1,31 @@
+import unittest
+
+import numpy as np
+
+from lbnlp.ner.general_utils import average_weights
+
+
+class AverageWeightsTest(unittest.TestCase):
+
+    def test_average_weights(self):
+        rng = np.random.RandomState(0)
+        snapshots = [{"words/_word_embeddings": rng.rand(5, 3).astype(np.float32),
+                      "proj/W": rng.rand(4, 2).astype(np.float32),
+                      "proj/b": rng.rand(2).astype(np.float32)} for _ in range(3)]
+        averaged = average_weights(snapshots)
+        self.assertEqual(set(averaged), set(snapshots[0]))
+        for name, weights in averaged.items():
+            self.assertEqual(weights.shape, snapshots[0][name].shape)
+            self.assertEqual(weights.dtype, np.float32)
+            np.testing.assert_allclose(weights, (snapshots[0][name] + snapshots[1][name] + snapshots[2][name]) / 3,
+                                       rtol=1e-6)
+
+        # the average of one snapshot is that snapshot
+        single = average_weights(snapshots[:1])
+        for name, weights in single.items():
+            np.testing.assert_array_equal(weights, snapshots[0][name])
+        np.testing.assert_array_equal(average_weights([{"b": np.zeros(2)}, {"b": np.ones(2)}])["b"], [.5, .5])
+
+
+if __name__ == "__main__":
+    unittest.main()
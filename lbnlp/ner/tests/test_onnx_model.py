@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+import numpy as np
+
+from lbnlp.ner.data_utils import viterbi_decode
+
+HAS_ONNXRUNTIME = all(importlib.util.find_spec(m) for m in ("onnx", "onnxruntime"))
+HAS_TENSORFLOW = importlib.util.find_spec("tensorflow") is not None
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def _tf_lstm(x, length, kernel, bias):
+    """numpy version of tf.contrib.rnn.LSTMCell run by dynamic_rnn"""
+    hidden = kernel.shape[1] // 4
+    h, c = np.zeros(hidden), np.zeros(hidden)
+    outputs = np.zeros((x.shape[0], hidden))
+    for t in range(length):
+        i, j, f, o = np.split(np.concatenate([x[t], h]) @ kernel + bias, 4)
+        c = _sigmoid(f + 1.0) * c + _sigmoid(i) * np.tanh(j)
+        h = _sigmoid(o) * np.tanh(c)
+        outputs[t] = h
+    return outputs, h
+
+
+def _tf_bilstm(x, length, w, prefix):
+    out_fw, h_fw = _tf_lstm(x, length, w[prefix + "_fw_kernel"], w[prefix + "_fw_bias"])
+    out_bw_rev, h_bw = _tf_lstm(x[:length][::-1], length, w[prefix + "_bw_kernel"],
+                                w[prefix + "_bw_bias"])
+    out_bw = np.zeros_like(out_fw)
+    out_bw[:length] = out_bw_rev[:length][::-1]
+    return np.concatenate([out_fw, out_bw], axis=-1), np.concatenate([h_fw, h_bw])
+
+
+def _reference_logits(w, word_ids, sequence_lengths, char_ids, word_lengths):
+    batch, time = word_ids.shape
+    ntags = w["proj_W"].shape[1]
+    logits = np.zeros((batch, time, ntags))
+    for b in range(batch):
+        tokens = []
+        for t in range(time):
+            _, h = _tf_bilstm(w["char_embeddings"][char_ids[b, t]], word_lengths[b, t], w, "char")
+            tokens.append(np.concatenate([w["word_embeddings"][word_ids[b, t]], h]))
+        out, _ = _tf_bilstm(np.stack(tokens), sequence_lengths[b], w, "word")
+        logits[b] = out @ w["proj_W"] + w["proj_b"]
+    return logits
+
+
+def _random_weights(nwords=20, nchars=15, ntags=5, dim_word=6, dim_char=4,
+                    hidden_char=3, hidden=5, seed=0):
+    rng = np.random.RandomState(seed)
+    w = {"word_embeddings": rng.randn(nwords, dim_word),
+         "char_embeddings": rng.randn(nchars, dim_char),
+         "proj_W": rng.randn(2 * hidden, ntags),
+         "proj_b": rng.randn(ntags),
+         "trans_params": rng.randn(ntags, ntags)}
+    for d in ("fw", "bw"):
+        w["char_{}_kernel".format(d)] = rng.randn(dim_char + hidden_char, 4 * hidden_char) * 0.5
+        w["char_{}_bias".format(d)] = rng.randn(4 * hidden_char) * 0.5
+        w["word_{}_kernel".format(d)] = rng.randn(dim_word + 2 * hidden_char + hidden, 4 * hidden) * 0.5
+        w["word_{}_bias".format(d)] = rng.randn(4 * hidden) * 0.5
+    return {k: v.astype(np.float32) for k, v in w.items()}
+
+
+def _random_batch(seed=1, nwords=20, nchars=15):
+    rng = np.random.RandomState(seed)
+    sequence_lengths = np.array([4, 1, 3], dtype=np.int32)
+    word_ids = rng.randint(1, nwords, size=(3, 4)).astype(np.int32)
+    word_lengths = rng.randint(1, 6, size=(3, 4)).astype(np.int32)
+    word_lengths[0, 2] = 0  # a word whose chars are all out of vocabulary
+    for b, length in enumerate(sequence_lengths):
+        word_ids[b, length:] = 0
+        word_lengths[b, length:] = 0
+    char_ids = rng.randint(1, nchars, size=(3, 4, 5)).astype(np.int32)
+    char_ids[np.arange(5)[None, None, :] >= word_lengths[:, :, None]] = 0
+    return word_ids, sequence_lengths, char_ids, word_lengths
+
+
+@unittest.skipUnless(HAS_ONNXRUNTIME, "onnx and onnxruntime are required")
+class ONNXGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        from lbnlp.ner.onnx_model import build_onnx_model
+        import onnxruntime
+
+        self.weights = _random_weights()
+        model = build_onnx_model(self.weights)
+        self.sess = onnxruntime.InferenceSession(model.SerializeToString(),
+                                                 providers=["CPUExecutionProvider"])
+
+    def test_logits_parity(self):
+        word_ids, sequence_lengths, char_ids, word_lengths = _random_batch()
+        logits, trans_params = self.sess.run(
+            ["logits", "trans_params"],
+            {"word_ids": word_ids, "sequence_lengths": sequence_lengths,
+             "char_ids": char_ids, "word_lengths": word_lengths})
+        expected = _reference_logits(self.weights, word_ids, sequence_lengths,
+                                     char_ids, word_lengths)
+        for b, length in enumerate(sequence_lengths):
+            np.testing.assert_allclose(logits[b, :length], expected[b, :length],
+                                       rtol=1e-4, atol=1e-5)
+        np.testing.assert_array_equal(trans_params, self.weights["trans_params"])
+
+
+class ViterbiDecodeTest(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = np.random.RandomState(3)
+        score, trans = rng.randn(4, 3), rng.randn(3, 3)
+        best, best_score = None, -np.inf
+        for seq in np.ndindex(3, 3, 3, 3):
+            s = score[np.arange(4), seq].sum() + sum(trans[a, b] for a, b in zip(seq, seq[1:]))
+            if s > best_score:
+                best, best_score = list(seq), s
+        viterbi, viterbi_score = viterbi_decode(score, trans)
+        self.assertListEqual([int(v) for v in viterbi], best)
+        self.assertAlmostEqual(viterbi_score, best_score)
+
+
+@unittest.skipUnless(HAS_ONNXRUNTIME and HAS_TENSORFLOW, "tensorflow, onnx and onnxruntime are required")
+class TFParityTest(unittest.TestCase):
+
+    def setUp(self):
+        from lbnlp.ner.config import Configure
+
+        self.data_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.data_dir, "words.txt"), "w") as f:
+            f.write("\n".join(["$UNK$", "$NUM$", "the", "band", "gap", "of", "zno", "is"]))
+        with open(os.path.join(self.data_dir, "chars.txt"), "w") as f:
+            f.write("\n".join("abcdefghijklmnopqrstuvwxyzZO"))
+        with open(os.path.join(self.data_dir, "tags.txt"), "w") as f:
+            f.write("\n".join(["O", "B-MAT", "I-MAT", "B-PRO", "I-PRO"]))
+
+        class TinyConfigure(Configure):
+            use_pretrained = False
+            dim_word = 6
+            dim_char = 4
+            hidden_size_char = 3
+            hidden_size_lstm = 5
+
+        self.config = TinyConfigure(data_dir=self.data_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_logits_parity(self):
+        from lbnlp.ner.serving import NERModel
+        from lbnlp.ner.onnx_model import NERONNXModel, export_onnx_model
+
+        model = NERModel(self.config)
+        model.build()
+        model.saver.save(model.sess, self.config.dir_final_model)
+        export_onnx_model(self.config.dir_final_model, self.config.filename_onnx)
+
+        sentences = [["The", "band", "gap", "of", "ZnO", "is", "3.3"], ["ZnO"], ["gap", "xyz"]]
+        words = [model.sentence_to_ids(s) for s in sentences]
+        fd, sequence_lengths = model.get_feed_dict(words, dropout=1.0)
+        tf_logits, tf_trans = model.sess.run([model.logits, model.trans_params], feed_dict=fd)
+
+        onnx_model = NERONNXModel(self.config)
+        onnx_model.build()
+        logits, trans, _ = onnx_model.predict_logits(words)
+
+        for b, length in enumerate(sequence_lengths):
+            np.testing.assert_allclose(logits[b, :length], tf_logits[b, :length], rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(trans, tf_trans)
+        self.assertEqual(onnx_model.predict_many(sentences), model.predict_many(sentences))
+        model.close_session()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from lbnlp.ner.data_utils import minibatches, pad_batch
+from lbnlp.ner.pipeline import BatchPipeline
+
+
+def _dataset(n=23, seed=0):
+    rng = np.random.RandomState(seed)
+    data = []
+    for _ in range(n):
+        length = rng.randint(1, 9)
+        words = [(rng.randint(1, 10, size=rng.randint(0, 5)).tolist(), int(rng.randint(1, 50)))
+                 for _ in range(length)]
+        data.append((words, rng.randint(0, 4, size=length).tolist()))
+    return data
+
+
+class BatchPipelineTest(unittest.TestCase):
+
+    def _assert_batches_equal(self, batches, expected):
+        self.assertEqual(len(batches), len(expected))
+        for batch, expected_batch in zip(batches, expected):
+            self.assertEqual(sorted(batch), sorted(expected_batch))
+            for name in batch:
+                np.testing.assert_array_equal(batch[name], expected_batch[name])
+
+    def test_same_batches_as_minibatches(self):
+        data = _dataset()
+        expected = [pad_batch(words, labels, True) for words, labels in minibatches(data, 5)]
+        for prefetch, workers in [(0, 0), (2, 0), (3, 4)]:
+            pipeline = BatchPipeline(data, 5, True, workers=workers, prefetch=prefetch)
+            self.assertEqual(len(pipeline), len(expected))
+            self._assert_batches_equal(list(pipeline), expected)
+
+    def test_worker_processes(self):
+        data = _dataset()
+        expected = [pad_batch(words, labels, True) for words, labels in minibatches(data, 5)]
+        pipeline = BatchPipeline(data, 5, True, workers=2, use_processes=True, prefetch=2)
+        self._assert_batches_equal(list(pipeline), expected)
+
+    def test_shuffle_and_bucket(self):
+        data = _dataset(n=200)
+        pipeline = BatchPipeline(data, 8, True, shuffle=True, bucket=True, seed=3)
+        pipeline.bucket_window = 5
+        epochs = [pipeline.batch_indices() for _ in range(2)]
+        for batches in epochs:
+            self.assertEqual(len(batches), 25)
+            self.assertListEqual(sorted(np.concatenate(batches).tolist()), list(range(200)))
+        self.assertNotEqual([b.tolist() for b in epochs[0]], [b.tolist() for b in epochs[1]])
+
+        # bucketing pads less than a random order
+        lengths = np.array([len(tags) for _, tags in data])
+        padded = sum(len(b) * lengths[b].max() for b in epochs[0])
+        shuffled = BatchPipeline(data, 8, True, shuffle=True, seed=3).batch_indices()
+        self.assertLess(padded, sum(len(b) * lengths[b].max() for b in shuffled))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import threading
+import unittest
+import urllib.request
+
+from lbnlp.ner.server import BatchingNERServer, _DocRequest, make_http_server
+
+
+class _StubModel(object):
+    """Tags every word with B-MAT if it is capitalized, else O"""
+
+    idx_to_tag = {0: "O", 1: "B-MAT"}
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def sentence_to_ids(self, words_raw):
+        return [1 if w[:1].isupper() else 0 for w in words_raw]
+
+    def predict_batch(self, words):
+        self.batch_sizes.append(len(words))
+        return [list(w) for w in words], [len(w) for w in words]
+
+
+class _StubClassifier(object):
+
+    def __init__(self):
+        self.model = _StubModel()
+
+    def _preprocess(self, doc):
+        sents = [s.split() for s in doc.split(".") if s.strip()]
+        return sents, sents
+
+    def _tag_processed(self, processed_sents, processed_sents_num, tags=None):
+        return [list(zip(sent, sent_tags)) for sent, sent_tags in zip(processed_sents, tags)]
+
+
+class BatchingNERServerTest(unittest.TestCase):
+
+    DOCS = ["ZnO is a semiconductor. The band gap is large.",
+            "We grew GaN films.",
+            ""]
+
+    def test_tag_doc(self):
+        with BatchingNERServer(_StubClassifier(), max_batch_size=8, max_delay=0.01) as server:
+            tagged = server.tag_doc(self.DOCS[0])
+        self.assertEqual(len(tagged), 2)
+        self.assertEqual(tagged[0][0], ("ZnO", "B-MAT"))
+        self.assertEqual(tagged[0][1], ("is", "O"))
+
+    def test_concurrent_requests_share_batches(self):
+        clf = _StubClassifier()
+        results = {}
+        with BatchingNERServer(clf, max_batch_size=64, max_delay=0.2) as server:
+            def worker(i):
+                results[i] = server.tag_doc(self.DOCS[i % 2])
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(server.tag_doc(self.DOCS[2]), [])
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results[1], [[("We", "B-MAT"), ("grew", "O"), ("GaN", "B-MAT"), ("films", "O")]])
+        self.assertLess(len(clf.model.batch_sizes), 12)
+        self.assertEqual(sum(clf.model.batch_sizes), 12)
+
+    def test_max_batch_size(self):
+        clf = _StubClassifier()
+        with BatchingNERServer(clf, max_batch_size=1, max_delay=0.05) as server:
+            server.tag_docs(self.DOCS)
+        self.assertEqual(clf.model.batch_sizes, [1, 1, 1])
+
+    def test_stop(self):
+        server = BatchingNERServer(_StubClassifier(), max_delay=0.01)
+        with self.assertRaises(RuntimeError):
+            server.submit(self.DOCS[0])
+        with server:
+            pass
+        with self.assertRaises(RuntimeError):
+            server.submit(self.DOCS[0])
+
+        # documents submitted while stopping are either tagged or refused, none hang
+        server.start()
+        futures, errors = [], []
+
+        def worker():
+            for _ in range(50):
+                try:
+                    futures.append(server.submit(self.DOCS[0]))
+                except RuntimeError:
+                    errors.append(1)
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        server.stop()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(futures) + len(errors), 200)
+        for future in futures:
+            self.assertEqual(len(future.result(timeout=5)), 2)
+
+        # requests left in the queue when the worker ends fail rather than hang
+        server.start()
+        server._stopped.set()
+        server._queue.put(None)
+        server._thread.join()
+        request = _DocRequest([["ZnO"]], [["ZnO"]])
+        server._queue.put((request, 0, [1]))
+        server.stop()
+        with self.assertRaises(RuntimeError):
+            request.future.result(timeout=5)
+
+    def test_http(self):
+        with BatchingNERServer(_StubClassifier()) as server:
+            httpd = make_http_server(server, port=0)
+            thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+            thread.start()
+            try:
+                url = "http://127.0.0.1:{}/tag".format(httpd.server_address[1])
+                request = urllib.request.Request(url, data=json.dumps({"text": self.DOCS[1]}).encode(),
+                                                 headers={"Content-Type": "application/json"})
+                with urllib.request.urlopen(request) as response:
+                    tags = json.loads(response.read())["tags"]
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+        self.assertEqual(tags[0][0], ["We", "B-MAT"])
+
+
+if __name__ == "__main__":
+    unittest.main()
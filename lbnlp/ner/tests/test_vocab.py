@@ -0,0 +1,81 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from lbnlp.ner.data_utils import load_vocab, compile_vocab, get_processing_word
+from lbnlp.ner.vocab import CompactVocab, COMPACT_VOCAB_MIN_WORDS
+
+
+class CompactVocabTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.data_dir, "words.txt")
+        words = ["$UNK$", "$NUM$", "the", "ZnO", "band", "gap", "ü", "δ-Fe2O3", "the", ""]
+        words += ["word{}".format(i) for i in range(COMPACT_VOCAB_MIN_WORDS)]
+        with open(self.filename, "w") as f:
+            f.write("\n".join(words) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_same_lookups_as_text_vocab(self):
+        expected = load_vocab(self.filename)
+        compiled_filename = compile_vocab(self.filename)
+        self.assertEqual(compiled_filename, os.path.join(self.data_dir, "words.vocab"))
+
+        vocab = load_vocab(self.filename)
+        self.assertIsInstance(vocab, CompactVocab)
+        self.assertEqual(len(vocab), len(expected))
+        self.assertEqual(dict(vocab.items()), expected)
+        self.assertEqual(list(vocab), list(expected))
+        for word, idx in expected.items():
+            self.assertIn(word, vocab)
+            self.assertEqual(vocab[word], idx)
+        for word in ["The", "zno", "word{}".format(COMPACT_VOCAB_MIN_WORDS), "δ", None, 3]:
+            self.assertNotIn(word, vocab)
+            self.assertIsNone(vocab.get(word))
+            self.assertEqual(vocab.get(word, -1), -1)
+        with self.assertRaises(KeyError):
+            vocab["missing"]
+        # looked up words are cached, so they are not probed again
+        vocab._find = None
+        for word, idx in expected.items():
+            self.assertEqual(vocab.get(word), idx)
+        self.assertIsNone(vocab.get("The"))
+        self.assertEqual(dict(pickle.loads(pickle.dumps(vocab))), expected)
+
+    def test_lookup_cache_is_bounded(self):
+        expected = load_vocab(self.filename)
+        vocab = CompactVocab(compile_vocab(self.filename), cache_size=10)
+        for word in list(expected) + ["missing{}".format(i) for i in range(20)]:
+            self.assertEqual(vocab.get(word), expected.get(word))
+        self.assertEqual((len(vocab._found), len(vocab._misses)), (10, 10))
+        self.assertEqual(pickle.loads(pickle.dumps(vocab)).cache_size, 10)
+
+    def test_small_vocab_is_a_dict(self):
+        filename = os.path.join(self.data_dir, "chars.txt")
+        with open(filename, "w") as f:
+            f.write("\n".join(["a", "b", "δ", "$UNK$"]))
+        compile_vocab(filename)
+        chars = load_vocab(filename)
+        self.assertEqual(chars, {"a": 0, "b": 1, "δ": 2, "$UNK$": 3})
+
+        words = load_vocab(compile_vocab(self.filename) and self.filename)
+        processing_word = get_processing_word(words, chars, chars=True)
+        self.assertEqual(processing_word("ZnO"), ([], 3))
+        self.assertEqual(processing_word("aδc"), ([0, 2], 0))
+        self.assertEqual(processing_word("42"), ([], 1))
+
+    def test_stale_compiled_vocab_is_ignored(self):
+        compiled_filename = compile_vocab(self.filename)
+        mtime = os.path.getmtime(compiled_filename)
+        os.utime(self.filename, (mtime + 10, mtime + 10))
+        self.assertIsInstance(load_vocab(self.filename), dict)
+        self.assertIsInstance(load_vocab(self.filename, compiled=False), dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+import numpy as np
+
+from lbnlp.ner.data_utils import export_trimmed_glove_vectors, get_trimmed_glove_vectors
+from lbnlp.ner.word_vectors import read_text_vectors, read_word2vec_binary, read_keyed_vectors
+
+HAS_GENSIM = importlib.util.find_spec("gensim") is not None
+
+
+class WordVectorsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        rng = np.random.RandomState(0)
+        self.words = ["the", "band", "gap", "zno", "unused", "ü"]
+        self.vectors = rng.randn(len(self.words), 4).astype(np.float32)
+        self.vocab = {"$UNK$": 0, "zno": 1, "the": 2, "ü": 3, "missing": 4}
+        self.expected = np.zeros((5, 4), dtype=np.float32)
+        for word, idx in self.vocab.items():
+            if word in self.words:
+                self.expected[idx] = self.vectors[self.words.index(word)]
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def test_text(self):
+        with open(self._path("w2v.txt"), "w") as f:
+            f.write("6 4\n")
+            f.write("zno 1 2\n")  # wrong dimension, ignored
+            for word, vector in zip(self.words, self.vectors):
+                f.write(word + "\t" + " ".join(repr(float(x)) for x in vector) + "\n")
+        np.testing.assert_allclose(read_text_vectors(self._path("w2v.txt"), self.vocab, 4),
+                                   self.expected)
+
+        export_trimmed_glove_vectors(self.vocab, self._path("w2v.txt"),
+                                     self._path("trimmed.npy"), 4)
+        embeddings = get_trimmed_glove_vectors(self._path("trimmed.npy"))
+        self.assertIsInstance(embeddings, np.memmap)
+        np.testing.assert_allclose(embeddings, self.expected)
+
+    def test_word2vec_binary(self):
+        with open(self._path("w2v.bin"), "wb") as f:
+            f.write("{} 4\n".format(len(self.words)).encode())
+            for word, vector in zip(self.words, self.vectors):
+                f.write(word.encode("utf-8") + b" " + vector.astype("<f4").tobytes() + b"\n")
+        np.testing.assert_array_equal(read_word2vec_binary(self._path("w2v.bin"), self.vocab, 4),
+                                      self.expected)
+
+    @unittest.skipUnless(HAS_GENSIM, "gensim is required")
+    def test_keyed_vectors(self):
+        from gensim.models import KeyedVectors
+
+        kv = KeyedVectors(4)
+        kv.add_vectors(self.words, self.vectors)
+        kv.save(self._path("w2v.kv"))
+        np.testing.assert_array_equal(read_keyed_vectors(self._path("w2v.kv"), self.vocab, 4),
+                                      self.expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
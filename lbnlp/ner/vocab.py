@@ -0,0 +1,179 @@
+import os
+import mmap
+import zlib
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# file layout: header, then int64 offsets[n + 1], int64 ids[n],
+# int64 slots[nslots] and the utf-8 blob of all words
+VOCAB_MAGIC = b"LBVOCAB1"
+_HEADER = struct.Struct("<8sqqq")  # magic, n, nslots, blob size
+COMPILED_VOCAB_EXT = ".vocab"
+# vocabs with fewer words (chars, tags) are loaded into a dict, where
+# memory-mapping them saves nothing
+COMPACT_VOCAB_MIN_WORDS = 10000
+# found and unknown words remembered by CompactVocab.get (each), later words
+# are probed on every lookup
+LOOKUP_CACHE_SIZE = 50000
+
+_MISSING = object()
+
+
+def _slot(word_bytes, mask):
+    return zlib.crc32(word_bytes) & mask
+
+
+def compiled_vocab_filename(filename):
+    """words.txt -> words.vocab"""
+    return os.path.splitext(filename)[0] + COMPILED_VOCAB_EXT
+
+
+def write_compiled_vocab(vocab, filename):
+    """Writes a word -> index mapping in the CompactVocab binary format
+
+    Args:
+        vocab: dict[word] = index
+        filename: path of the compiled file
+
+    """
+    words = [w.encode("utf-8") for w in vocab]
+    n = len(words)
+    nslots = 8
+    while nslots < 2 * n:
+        nslots *= 2
+    mask = nslots - 1
+
+    offsets = np.zeros(n + 1, dtype="<i8")
+    offsets[1:] = np.cumsum([len(w) for w in words])
+    ids = np.array(list(vocab.values()), dtype="<i8")
+
+    # open addressing with linear probing, 0 marks an empty slot
+    slots = np.zeros(nslots, dtype="<i8")
+    for i, w in enumerate(words):
+        h = _slot(w, mask)
+        while slots[h]:
+            h = (h + 1) & mask
+        slots[h] = i + 1
+
+    blob = b"".join(words)
+    with open(filename, "wb") as f:
+        f.write(_HEADER.pack(VOCAB_MAGIC, n, nslots, len(blob)))
+        f.write(offsets.tobytes())
+        f.write(ids.tobytes())
+        f.write(slots.tobytes())
+        f.write(blob)
+
+
+class CompactVocab(Mapping):
+    """Read-only word -> index mapping backed by a memory-mapped file
+
+    Drop-in replacement for the dict returned by load_vocab: supports
+    vocab[word], word in vocab, len, iteration, items, get... Opening the
+    file does no parsing, words are hashed (crc32) into an open-addressing
+    table and compared against the utf-8 bytes in the file, so no python
+    string per word is kept in memory.
+
+    The tradeoff is the lookup: probing the table costs 1.5-2.3 us per word
+    against 0.3-0.6 us for a dict (400k words, random lookups). The first
+    cache_size words found are therefore kept in a dict (and as many unknown
+    words in a set), so frequent words, which come first, are probed once
+    and then looked up at dict speed, while the memory stays bounded
+    whatever the vocab and however long the process runs. Use get rather
+    than `in` followed by [] to look a word up once.
+    """
+
+    def __init__(self, filename, cache_size=LOOKUP_CACHE_SIZE):
+        """
+        Args:
+            filename: path of a file written by write_compiled_vocab
+            cache_size: max number of found (and of unknown) words whose
+                lookups are cached, 0 to probe every lookup
+
+        """
+        self.filename = filename
+        self.cache_size = cache_size
+        with open(filename, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError("{} is not a compiled vocab".format(filename))
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, n, nslots, blob_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != VOCAB_MAGIC:
+            raise ValueError("{} is not a compiled vocab".format(filename))
+        self._n = n
+        self._mask = nslots - 1
+
+        view = memoryview(self._mm)
+        start = _HEADER.size
+        self._offsets = view[start:start + 8 * (n + 1)].cast("q")
+        start += 8 * (n + 1)
+        self._ids = view[start:start + 8 * n].cast("q")
+        start += 8 * n
+        self._slots = view[start:start + 8 * nslots].cast("q")
+        self._blob_start = start + 8 * nslots
+        if self._blob_start + blob_size != size:
+            raise ValueError("{} is truncated".format(filename))
+        self._found = {}
+        self._misses = set()
+
+    def __reduce__(self):
+        # memory maps do not pickle, reopen the file instead
+        return self.__class__, (self.filename, self.cache_size)
+
+    def _word_bytes(self, i):
+        return self._mm[self._blob_start + self._offsets[i]:
+                        self._blob_start + self._offsets[i + 1]]
+
+    def _find(self, word):
+        if not isinstance(word, str):
+            return -1
+        word_bytes = word.encode("utf-8")
+        h = _slot(word_bytes, self._mask)
+        while True:
+            i = self._slots[h]
+            if i == 0:
+                return -1
+            if self._word_bytes(i - 1) == word_bytes:
+                return i - 1
+            h = (h + 1) & self._mask
+
+    def get(self, word, default=None):
+        """Index of word, default if it is not in the vocab, with one probe"""
+        idx = self._found.get(word, _MISSING)
+        if idx is not _MISSING:
+            return idx
+        if word in self._misses:
+            return default
+        i = self._find(word)
+        if i < 0:
+            if len(self._misses) < self.cache_size:
+                self._misses.add(word)
+            return default
+        idx = self._ids[i]
+        if len(self._found) < self.cache_size:
+            self._found[word] = idx
+        return idx
+
+    def __getitem__(self, word):
+        idx = self.get(word, _MISSING)
+        if idx is _MISSING:
+            raise KeyError(word)
+        return idx
+
+    def __contains__(self, word):
+        return self.get(word, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._word_bytes(i).decode("utf-8")
+
+    def __repr__(self):
+        return "{}({!r}, {} words)".format(self.__class__.__name__,
+                                            self.filename, self._n)
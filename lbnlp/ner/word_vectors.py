@@ -0,0 +1,193 @@
+import os
+import mmap
+
+import numpy as np
+
+
+# lines of a text vector file parsed together in one numpy call
+TEXT_CHUNK_LINES = 100000
+
+
+def read_text_vectors(filename, vocab, dim):
+    """Reads the vectors of the vocab words from a GloVe/word2vec text file
+
+    Out-of-vocabulary lines are dropped after splitting off their first
+    token, before any float is parsed. The values of in-vocab lines are
+    converted in bulk by numpy. Lines that do not have dim values (e.g.
+    the "count dim" header of word2vec files) are ignored.
+
+    Args:
+        filename: path to the text file, one "word v1 v2 ..." per line
+        vocab: dict[word] = index
+        dim: (int) dimension of embeddings
+
+    Returns:
+        float32 array [len(vocab), dim], rows of missing words are zeros
+
+    """
+    embeddings = np.zeros([len(vocab), dim], dtype=np.float32)
+
+    def flush(idxs, values):
+        if idxs:
+            embeddings[idxs] = np.array(values, dtype=np.float32).reshape(-1, dim)
+
+    idxs, values = [], []
+    with open(filename) as f:
+        for line in f:
+            parts = line.split(None, 1)
+            if len(parts) != 2 or parts[0] not in vocab:
+                continue
+            vector = parts[1].split()
+            if len(vector) != dim:
+                continue
+            idxs.append(vocab[parts[0]])
+            values.extend(vector)
+            if len(idxs) == TEXT_CHUNK_LINES:
+                flush(idxs, values)
+                idxs, values = [], []
+    flush(idxs, values)
+
+    return embeddings
+
+
+def read_word2vec_binary(filename, vocab, dim):
+    """Reads the vectors of the vocab words from a word2vec binary file
+
+    The file is memory-mapped and scanned word by word; the vector bytes of
+    out-of-vocabulary words are skipped without being read.
+
+    Args:
+        filename: path to the .bin file (word2vec C format, float32)
+        vocab: dict[word] = index
+        dim: (int) dimension of embeddings
+
+    Returns:
+        float32 array [len(vocab), dim], rows of missing words are zeros
+
+    """
+    embeddings = np.zeros([len(vocab), dim], dtype=np.float32)
+    with open(filename, "rb") as f:
+        header = f.readline()
+        nwords, file_dim = (int(x) for x in header.split())
+        if file_dim != dim:
+            raise ValueError("{} has vectors of dimension {}, not {}".format(
+                filename, file_dim, dim))
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    nbytes = 4 * dim
+    pos = len(header)
+    try:
+        for _ in range(nwords):
+            end = data.find(b" ", pos)
+            if end < 0:
+                break
+            # some writers end each vector with a newline
+            word = data[pos:end].lstrip(b"\n").decode("utf-8", errors="ignore")
+            if word in vocab:
+                embeddings[vocab[word]] = np.frombuffer(data, dtype="<f4", count=dim,
+                                                        offset=end + 1)
+            pos = end + 1 + nbytes
+    finally:
+        data.close()
+
+    return embeddings
+
+
+def read_keyed_vectors(filename, vocab, dim):
+    """Reads the vectors of the vocab words from a saved gensim KeyedVectors
+
+    The vectors array is memory-mapped, so only the rows of vocab words are
+    read from disk. Works with gensim 3 and gensim 4 models.
+
+    Args:
+        filename: path of a file saved with KeyedVectors.save (or a Word2Vec
+            model, whose wv are used)
+        vocab: dict[word] = index
+        dim: (int) dimension of embeddings
+
+    Returns:
+        float32 array [len(vocab), dim], rows of missing words are zeros
+
+    """
+    from gensim.models import KeyedVectors
+    from gensim.utils import SaveLoad
+
+    kv = SaveLoad.load(filename, mmap="r")
+    kv = getattr(kv, "wv", kv)
+    if not isinstance(kv, KeyedVectors):
+        raise ValueError("{} does not hold KeyedVectors".format(filename))
+    if kv.vectors.shape[1] != dim:
+        raise ValueError("{} has vectors of dimension {}, not {}".format(
+            filename, kv.vectors.shape[1], dim))
+
+    if hasattr(kv, "key_to_index"):  # gensim >= 4
+        index = kv.key_to_index
+    else:
+        index = {word: v.index for word, v in kv.vocab.items()}
+
+    rows, idxs = [], []
+    for word, idx in vocab.items():
+        if word in index:
+            rows.append(index[word])
+            idxs.append(idx)
+
+    embeddings = np.zeros([len(vocab), dim], dtype=np.float32)
+    if rows:
+        order = np.argsort(rows)  # read the mapped file front to back
+        embeddings[np.asarray(idxs)[order]] = kv.vectors[np.asarray(rows)[order]]
+    return embeddings
+
+
+def read_magnitude(filename, vocab, dim):
+    """Reads the vectors of the vocab words from a .magnitude file
+
+    Needs pymagnitude. Vectors are read unnormalized and words missing from
+    the file are left as zeros (not generated out-of-vocabulary vectors).
+
+    Args:
+        filename: path to the .magnitude file
+        vocab: dict[word] = index
+        dim: (int) dimension of embeddings
+
+    Returns:
+        float32 array [len(vocab), dim], rows of missing words are zeros
+
+    """
+    from pymagnitude import Magnitude
+
+    vectors = Magnitude(filename, normalized=False, lazy_loading=-1)
+    if vectors.dim != dim:
+        raise ValueError("{} has vectors of dimension {}, not {}".format(
+            filename, vectors.dim, dim))
+
+    words = [word for word in vocab if word in vectors]
+    embeddings = np.zeros([len(vocab), dim], dtype=np.float32)
+    if words:
+        embeddings[[vocab[w] for w in words]] = vectors.query(words)
+    return embeddings
+
+
+# file extension -> reader, anything else is read as text
+READERS = {
+    ".bin": read_word2vec_binary,
+    ".kv": read_keyed_vectors,
+    ".model": read_keyed_vectors,
+    ".magnitude": read_magnitude,
+}
+
+
+def read_word_vectors(filename, vocab, dim):
+    """Reads the vectors of the vocab words, choosing the reader by extension
+
+    Args:
+        filename: path to the vectors (.bin word2vec binary, .kv / .model
+            gensim, .magnitude, anything else text)
+        vocab: dict[word] = index
+        dim: (int) dimension of embeddings
+
+    Returns:
+        float32 array [len(vocab), dim], rows of missing words are zeros
+
+    """
+    reader = READERS.get(os.path.splitext(filename)[1], read_text_vectors)
+    return reader(filename, vocab, dim)
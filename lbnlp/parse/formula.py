@@ -0,0 +1,181 @@
+"""
+Parses chemical formulas into element amounts as pymatgen's Composition does, without
+building Composition and Element objects or raising exceptions. The amounts are added up
+in the order pymatgen adds them, so they are the same floats. Inputs whose parse depends on
+the pymatgen version (elements after Lr, signed or exponent amounts, "@" and brackets) are
+left to pymatgen.
+"""
+import re
+import math
+import itertools
+
+from monty.fractions import gcd_float
+
+# elements up to Lr, the elements of every pymatgen version
+ELEMENTS = frozenset([
+    'H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne', 'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar', 'K', 'Ca',
+    'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn', 'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr', 'Rb', 'Sr', 'Y',
+    'Zr', 'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn', 'Sb', 'Te', 'I', 'Xe', 'Cs', 'Ba', 'La', 'Ce',
+    'Pr', 'Nd', 'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb', 'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir',
+    'Pt', 'Au', 'Hg', 'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn', 'Fr', 'Ra', 'Ac', 'Th', 'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm',
+    'Bk', 'Cf', 'Es', 'Fm', 'Md', 'No', 'Lr'])
+
+# symbols that are elements in some pymatgen versions only
+VERSION_ELEMENTS = frozenset([
+    'Rf', 'Db', 'Sg', 'Bh', 'Hs', 'Mt', 'Ds', 'Rg', 'Cn', 'Nh', 'Fl', 'Mc', 'Lv', 'Ts', 'Og', 'Uut', 'Uuq', 'Uup',
+    'Uuh', 'Uus', 'Uuo', 'Uue', 'D', 'T'])
+
+# elements of pymatgen's Composition.special_formulas (e.g. LiO -> Li2O2, O -> O2)
+SPECIAL_FORMULA_ELEMENTS = frozenset(['Li', 'Na', 'K', 'H', 'Cs', 'Rb', 'O', 'N', 'F', 'Cl'])
+
+# pymatgen's Composition.amount_tolerance, smaller amounts are dropped
+AMOUNT_TOLERANCE = 1e-8
+
+# the patterns of pymatgen's Composition._parse_formula
+SYMBOL_AMOUNT = re.compile(r"([A-Z][a-z]*)\s*([-*\.e\d]*)")
+GROUP_FACTOR = re.compile(r"\(([^\(\)]+)\)\s*([\.e\d]*)")
+
+UNSIGNED_NUMBER = re.compile(r"(?:\d+\.?\d*|\.\d+)$")
+SIGNED_NUMBER = re.compile(r"-(?:\d+\.?\d*|\.\d+)$")
+VERSION_DEPENDENT = re.compile(r"[@\[\]{}]")
+UPPER = re.compile(r"[A-Z]")
+
+# results of _amount and _symbol_amounts besides amounts: pymatgen raises, or the outcome
+# depends on its version
+_INVALID = "invalid"
+_UNSUPPORTED = "unsupported"
+
+
+def _amount(text):
+    """
+    :param text: string; an amount or a group factor, "" for 1
+    :return: float, _INVALID if float(text) raises, _UNSUPPORTED if it is signed, in exponent
+    notation or not finite
+    """
+    if not text:
+        return 1.
+    if "e" in text:  # exponents are only parsed by recent pymatgen versions
+        return _UNSUPPORTED
+    if UNSIGNED_NUMBER.match(text) is not None:
+        amount = float(text)
+        return amount if math.isfinite(amount) else _UNSUPPORTED
+    if SIGNED_NUMBER.match(text) is not None:  # negative or -0 amounts
+        return _UNSUPPORTED
+    return _INVALID
+
+
+def _symbol_amounts(form, factor):
+    """
+    pymatgen's get_sym_dict: the amounts of the symbols of a formula without parentheses.
+
+    :return: dict; {symbol: amount times factor}, in the order of the formula, or _INVALID
+    or _UNSUPPORTED
+    """
+    amounts = {}
+    position = 0
+    for match in SYMBOL_AMOUNT.finditer(form):
+        # pymatgen removes the matches and fails if more than whitespace is left
+        if match.start() > position and not form[position:match.start()].isspace():
+            return _INVALID
+        position = match.end()
+        amount = _amount(match.group(2).strip())
+        if amount is _INVALID or amount is _UNSUPPORTED:
+            return amount
+        symbol = match.group(1)
+        amounts[symbol] = amounts.get(symbol, 0.) + amount * factor
+    if position < len(form) and not form[position:].isspace():
+        return _INVALID
+    return amounts
+
+
+def _pymatgen_el_amt_dict(formula):
+    """The fallback: parse_formula with pymatgen"""
+    from pymatgen.core.periodic_table import Element
+    from pymatgen.core.composition import Composition, CompositionError
+
+    try:
+        composition = Composition(formula)
+    except (CompositionError, ValueError):
+        return None
+    if not all(isinstance(key, Element) for key in composition.keys()):
+        return None
+    return composition.get_el_amt_dict()
+
+
+def parse_formula(formula):
+    """
+    Element amounts of a formula, the same as Composition(formula).get_el_amt_dict() in
+    pymatgen. Formulas of symbols up to Lr, amounts and parentheses, e.g. Sr(Zr0.5Ti0.5)O3,
+    are parsed here, the others by pymatgen.
+
+    :param formula: string
+    :return: dict; {element symbol: amount}, None if pymatgen would not parse the formula or
+    would find symbols other than elements in it
+    """
+    if UPPER.search(formula) is None:
+        # without a symbol, pymatgen fails on anything but whitespace and parentheses
+        if "(" not in formula and VERSION_DEPENDENT.search(formula) is None:
+            return None if formula.strip() else _pymatgen_el_amt_dict(formula)
+        return _pymatgen_el_amt_dict(formula)
+    if VERSION_DEPENDENT.search(formula) is not None:
+        return _pymatgen_el_amt_dict(formula)
+
+    # the innermost groups are expanded first, e.g. (Zr0.5Ti0.5)2 -> Zr1.0Ti1.0
+    expanded = formula
+    match = GROUP_FACTOR.search(expanded)
+    while match is not None:
+        factor = _amount(match.group(2))
+        amounts = _symbol_amounts(match.group(1), factor) if isinstance(factor, float) else factor
+        if amounts is _UNSUPPORTED:
+            return _pymatgen_el_amt_dict(formula)
+        if amounts is _INVALID:
+            return None
+        texts = [str(amount) for amount in amounts.values()]
+        if any("e" in text or "n" in text for text in texts):  # exponents, inf or nan
+            return _pymatgen_el_amt_dict(formula)
+        expanded = expanded.replace(match.group(), "".join(map("".join, zip(amounts, texts))), 1)
+        match = GROUP_FACTOR.search(expanded)
+
+    amounts = _symbol_amounts(expanded, 1.)
+    if amounts is _UNSUPPORTED:
+        return _pymatgen_el_amt_dict(formula)
+    if amounts is _INVALID:
+        return None
+    el_amt = {}
+    for symbol, amount in amounts.items():
+        if abs(amount) < AMOUNT_TOLERANCE:  # dropped by Composition
+            continue
+        if symbol not in ELEMENTS:
+            return _pymatgen_el_amt_dict(formula) if symbol in VERSION_ELEMENTS else None
+        el_amt[symbol] = amount
+    return el_amt
+
+
+def reduced_formula(el_amt, max_denominator=10000):
+    """
+    The formula SimpleParser normalizes to: pymatgen's integer formula of the element amounts
+    (get_integer_formula_and_factor), reduced and alphabetized, e.g. {"Fe": 1, "O": 1.5} -> Fe2O3.
+    pymatgen writes the two most electronegative elements as a group when their counts have a
+    common factor, e.g. Li3(PO4)2, and keeps some formulas from being reduced, e.g. Li2O2, so
+    only counts that are pairwise coprime, of other elements than those formulas, are handled.
+
+    :param el_amt: dict; {element symbol: amount}, e.g. from parse_formula
+    :param max_denominator: int; as in get_integer_formula_and_factor
+    :return: string, None if the formula is to be normalized by pymatgen
+    """
+    if not el_amt:
+        return None
+    gcd = gcd_float(list(el_amt.values()), 1 / max_denominator)
+    counts = {symbol: round(amount / gcd) for symbol, amount in el_amt.items()}
+    if min(counts.values()) < 1:
+        return None
+    if len(counts) <= 2:
+        if SPECIAL_FORMULA_ELEMENTS.issuperset(counts):
+            return None
+        factor = math.gcd(*counts.values()) if len(counts) == 2 else next(iter(counts.values()))
+    elif any(math.gcd(a, b) != 1 for a, b in itertools.combinations(counts.values(), 2)):
+        return None
+    else:
+        factor = 1
+    return "".join(sorted(symbol + (str(count // factor) if count != factor else "")
+                          for symbol, count in counts.items()))
@@ -2,6 +2,8 @@ import re
 from pymatgen.core.periodic_table import Element
 from pymatgen.core.composition import Composition
 
+from lbnlp.parse.formula import parse_formula, reduced_formula
+
 
 class SimpleParser:
     '''
@@ -47,9 +49,16 @@ class SimpleParser:
         '''
         Converts formula string to canonical (normalized, alphabetized) form.
         Returns defaultdict() object containing formula if successful. Returns false
-        if an exception is raised.
+        if an exception is raised. Most formulas are parsed and reduced without pymatgen,
+        see lbnlp.parse.formula.
         '''
         try:
+            el_amt = parse_formula(formula)
+            if el_amt is None:
+                return False
+            reduced = reduced_formula(el_amt)
+            if reduced is not None:
+                return reduced
             integer_formula, factor = Composition(formula).get_integer_formula_and_factor()
             composition = Composition(integer_formula)
             if any([not self.is_element(key) for key in composition.keys()]):
@@ -67,12 +76,8 @@ class SimpleParser:
         Parses and returns formula.
         '''
         parsers = [self.matgen_parser]
-        parsed = False
         for parser in parsers:
-            if parser(cem):
-                parsed = parser(cem)
-                break
-        if parsed:
-            return parser(cem)
-        else:
-            return False
\ No newline at end of file
+            parsed = parser(cem)
+            if parsed:
+                return parsed
+        return False
\ No newline at end of file
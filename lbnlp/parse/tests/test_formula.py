@@ -0,0 +1,79 @@
+import random
+import unittest
+import warnings
+
+from lbnlp.benchmarks.corpus import generate_documents, generate_formulas, generate_material_mentions
+from lbnlp.benchmarks.formulas import reference_el_amt_dict, reference_matgen_parser
+from lbnlp.benchmarks.tokens import text_tokens
+from lbnlp.parse import formula
+from lbnlp.parse.formula import parse_formula, reduced_formula
+from lbnlp.parse.simple import SimpleParser
+
+EDGE_CASES = ["Fe0", "Fe0.0", "(Zr0.5Ti0.5)2", "Sr(Zr0.5Ti0.5)O3", "Li3(PO4)2", "Li2(FePO4)2", "LiO", "Li2O2",
+              "O2", "O", "H2O2", "NaCl", "NaCl2", "Fe-doped", "The", "", " ", "()", "(Fe)0", "((Fe)2O)3", "Fe 2 O3",
+              "Fe2 O3", "Fe2O3 ", "(Fe2)O3)", "Fe..2", "Fe.5", "Fe5.", "Fe1e2", "Fe-2", "Fe*2", "Fe2+", "FeO@C",
+              "Fe[CN]6", "DyD2", "Uuo", "Rf2O", "Xx2", "Fex", "FeOx", "Ti3C2Tx", "He0.000000001Fe", "Fe1000000",
+              "Fe0.3333333", "CO", "Co", "BN", "IV", "Pb(Zr0.52Ti0.48)O3", "Ca3(Al0.1Si0.9)2O12", "AlNiCoFeCr"]
+
+
+def fuzz_formulas(n, seed=0):
+    """Random strings of symbols, amounts and the characters pymatgen treats specially"""
+    rng = random.Random(seed)
+    parts = ["Fe", "O", "Li", "P", "Zr", "Ti", "Sr", "Na", "Cl", "H", "N", "Ca", "Si", "He", "Rf", "D", "Xx",
+             "a", "e", "x", "0", "1", "2", "3", "0.5", ".", "(", ")", "-", "*", " ", "@", "["]
+    return ["".join(rng.choice(parts) for _ in range(rng.randint(1, 8))) for _ in range(n)]
+
+
+class FormulaTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        tokens = text_tokens(doc["text"] for doc in generate_documents(100, seed=11))
+        cls.formulas = list(dict.fromkeys(generate_formulas(3000, seed=11) + generate_material_mentions(1000, seed=11)
+                                          + tokens + fuzz_formulas(20000, seed=11) + EDGE_CASES))
+
+    def setUp(self):
+        warnings.simplefilter("ignore")  # pymatgen warns about the elements without electronegativity
+        self.addCleanup(warnings.resetwarnings)
+
+    def test_matches_pymatgen(self):
+        for text in self.formulas:
+            self.assertEqual(parse_formula(text), reference_el_amt_dict(text), text)
+
+    def test_matgen_parser_matches_pymatgen(self):
+        parser = SimpleParser()
+        for text in self.formulas:
+            self.assertEqual(parser.matgen_parser(text), reference_matgen_parser(text), text)
+            self.assertEqual(parser.parse(text), reference_matgen_parser(text), text)
+
+    def test_fast_path(self):
+        fallbacks = []
+        fallback = formula._pymatgen_el_amt_dict
+        formula._pymatgen_el_amt_dict = lambda text: fallbacks.append(text) or fallback(text)
+        self.addCleanup(setattr, formula, "_pymatgen_el_amt_dict", fallback)
+
+        formulas = generate_formulas(3000, seed=11) + EDGE_CASES[:15]
+        parsed = [parse_formula(text) for text in formulas]
+        self.assertEqual(fallbacks, [])
+        reduced = [reduced_formula(el_amt) for el_amt in parsed if el_amt]
+        self.assertGreater(sum(r is not None for r in reduced), len(reduced) // 2)
+
+        for text in ["Fe1e2", "FeO@C", "Fe[CN]6", "Fe-2", "DyD2", "Rf2O", "  "]:
+            parse_formula(text)
+        self.assertEqual(fallbacks[-7:], ["Fe1e2", "FeO@C", "Fe[CN]6", "Fe-2", "DyD2", "Rf2O", "  "])
+
+    def test_reduced_formula(self):
+        self.assertEqual(reduced_formula({"Fe": 1, "O": 1.5}), "Fe2O3")
+        self.assertEqual(reduced_formula({"Sr": 1, "Zr": 0.5, "Ti": 0.5, "O": 1.5}), "O3Sr2TiZr")
+        self.assertEqual(reduced_formula({"Fe": 4}), "Fe")
+        # left to pymatgen: special formulas, and common factors of a polyanion, e.g. Sr2TiZrO6, Li3(PO4)2
+        for el_amt in ({}, {"O": 2}, {"Li": 2, "O": 2}, {"Sr": 1, "Zr": 0.5, "Ti": 0.5, "O": 3},
+                       {"Li": 3, "P": 2, "O": 8}):
+            self.assertIsNone(reduced_formula(el_amt))
+        for el_amt in ({"Li": 1, "P": 1, "O": 4, "Fe": 1}, {"Ba": 1, "Ti": 1, "O": 3}):
+            text = "".join(symbol + str(amount) for symbol, amount in el_amt.items())
+            self.assertEqual(SimpleParser().matgen_parser(text), reference_matgen_parser(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
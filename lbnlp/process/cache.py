@@ -0,0 +1,154 @@
+import threading
+import collections
+
+from lbnlp.timing import NULL_TIMER
+
+# sentences kept by a SentenceCache by default
+SENTENCE_CACHE_SIZE = 100000
+
+
+class SentenceCache(object):
+    """
+    Least recently used cache of tokenized and processed sentences, keyed by the sentence
+    text with its whitespace normalized and by what the sentence was processed for.
+
+    Abstract corpora repeat many sentences (copyright lines, "In this work, we...",
+    duplicated records), which are then tokenized and processed once. Pass one to
+    NERClassifier or RelevanceClassifier (sentence_cache=...); it can be shared by several
+    classifiers and threads, as long as they use the same processor.
+
+    Example:
+        ```python
+        cache = SentenceCache(maxsize=100000)
+        clf = RelevanceClassifier(clf_path, tfidf_path, sentence_cache=cache)
+        clf.classify_many(abstracts)
+        print(cache.stats())
+        ```
+
+    """
+
+    def __init__(self, maxsize=SENTENCE_CACHE_SIZE):
+        """
+        :param maxsize: int; sentences kept, the least recently used are dropped first
+        """
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(sentence):
+        """
+        :param sentence: string
+        :return: string; the sentence with each run of whitespace replaced by a space
+        """
+        return " ".join(sentence.split())
+
+    def lookup(self, keys):
+        """
+        Looks up keys, e.g. the sentences of a document. A key repeated in keys counts as a
+        hit after its first occurrence, as it is computed once.
+
+        :param keys: list; hashable keys
+        :return: dict; {key: cached value} for the keys found
+        """
+        found, seen = {}, set()
+        with self._lock:
+            for key in keys:
+                if key in seen:
+                    self.hits += 1
+                    continue
+                seen.add(key)
+                value = self._items.get(key, self)
+                if value is self:
+                    self.misses += 1
+                else:
+                    self._items.move_to_end(key)
+                    found[key] = value
+                    self.hits += 1
+        return found
+
+    def update(self, items):
+        """
+        :param items: dict; {key: value} to cache
+        """
+        with self._lock:
+            self._items.update(items)
+            for key in items:
+                self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Drops the cached sentences and resets the stats"""
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        :return: dict; {"hits", "misses", "hit_rate", "size", "maxsize"}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.,
+                    "size": len(self._items), "maxsize": self.maxsize}
+
+
+def preprocess_sentences(processor, text, process_sentences, cache=None, name="", timer=NULL_TIMER):
+    """
+    Tokenizes each sentence of a text and processes them with process_sentences, taking the
+    sentences seen before from the cache. Without a cache, the text is tokenized at once
+    with processor.tokenize.
+
+    :param processor: MatScholarProcess; its tokenizer needs split_sentences and
+    tokenize_sentence to be used with a cache, see lbnlp.process.tokenizers
+    :param text: string; document as raw text
+    :param process_sentences: callable; returns the processed forms of a list of tokenized
+    sentences, e.g. with MatScholarProcess.process_many
+    :param cache: SentenceCache
+    :param name: string; identifies process_sentences in the cache keys, so that a cache can
+    be shared by different preprocessings
+    :param timer: lbnlp.timing.StageTimer; records tokenize and process, and split_sentences
+    with a cache, for the sentences that are not cached
+    :return: list; a tuple (tokens, processed) per sentence, not to be modified as it may be
+    cached
+    """
+    if cache is None:
+        with timer.stage("tokenize") as stage:
+            sents = processor.tokenize(text)
+            stage.items = len(sents)
+        with timer.stage("process") as stage:
+            results = list(zip(sents, process_sentences(sents)))
+            stage.items = sum(len(sent) for sent in sents)
+        return results
+
+    with timer.stage("split_sentences") as stage:
+        keys = [(name, cache.normalize(sentence)) for sentence in processor.split_sentences(text)]
+        stage.items = len(keys)
+    found = cache.lookup(keys)
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    if missing:
+        with timer.stage("tokenize") as stage:
+            sents = [processor.tokenize_sentence(sentence) for _, sentence in missing]
+            stage.items = len(sents)
+        with timer.stage("process") as stage:
+            computed = dict(zip(missing, zip(sents, process_sentences(sents))))
+            stage.items = sum(len(sent) for sent in sents)
+        cache.update(computed)
+        found.update(computed)
+    return [found[key] for key in keys]
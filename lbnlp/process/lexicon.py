@@ -0,0 +1,160 @@
+"""
+Precomputed classes of the tokens of a corpus, so that MatScholarProcess.process looks a token up
+instead of running the number regexes and parsing it as a formula. A lexicon is built offline
+from a corpus (see main) and shipped next to the phraser of a model package; tokens it does not
+contain are classified as before.
+"""
+import sys
+import json
+import warnings
+import argparse
+import collections
+
+# layout of the lexicon files
+LEXICON_FORMAT = 1
+# version of the classification rules (MatScholarProcess.classify_token), to be increased when
+# they change, so that lexicons built with other rules are refused
+LEXICON_RULES = 1
+
+# token classes, see MatScholarProcess.classify_token
+NUMBER = "number"
+ELEMENT_NAME = "element_name"
+FORMULA = "formula"
+LOWER = "lower"
+OTHER = "other"
+
+# classes with a normalized form: the element symbol or the normalized formula
+NORMALIZED_CLASSES = (ELEMENT_NAME, FORMULA)
+CLASSES = (NUMBER, ELEMENT_NAME, FORMULA, LOWER, OTHER)
+
+
+def pymatgen_version():
+    """:return: string; version of the installed pymatgen, None if unknown"""
+    import pymatgen
+    import pymatgen.core
+
+    # the version moved from pymatgen to pymatgen.core in 2022
+    return getattr(pymatgen.core, "__version__", getattr(pymatgen, "__version__", None))
+
+
+class TokenLexicon(object):
+    """
+    Maps tokens to their class and normalized form, (class, normalized form or None).
+
+    Example:
+        ```python
+        lexicon = TokenLexicon.build(MatScholarProcess(), tokens, min_count=2)
+        lexicon.save("embeddings/lexicon.json")
+        mp = MatScholarProcess(lexicon_path="embeddings/lexicon.json")
+        ```
+
+    """
+
+    def __init__(self, entries, rules=LEXICON_RULES, pymatgen_version=None):
+        """
+        :param entries: dict; {token: (class, normalized form or None)}
+        :param rules: int; version of the rules the entries were classified with
+        :param pymatgen_version: string; pymatgen version the formulas were normalized with
+        """
+        self.entries = entries
+        self.rules = rules
+        self.pymatgen_version = pymatgen_version
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, token):
+        return token in self.entries
+
+    def get(self, token):
+        """
+        :param token: string
+        :return: tuple; (class, normalized form or None), None if the token is not in the lexicon
+        """
+        return self.entries.get(token)
+
+    @classmethod
+    def build(cls, processor, tokens, min_count=1):
+        """
+        :param processor: MatScholarProcess; classifies the tokens
+        :param tokens: iterable; the tokens of a corpus, e.g. from MatScholarProcess.tokenize
+        :param min_count: int; tokens seen fewer times are left out
+        :return: TokenLexicon
+        """
+        counts = collections.Counter(tokens)
+        return cls({token: processor.classify_token(token) for token, count in counts.items() if count >= min_count},
+                   pymatgen_version=pymatgen_version())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Lexicons built with other classification rules are refused. One built with another pymatgen
+        version is used with a warning, since the formulas it did not see may be normalized differently.
+
+        :param filename: string; .json written by save
+        :return: TokenLexicon
+        """
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != LEXICON_FORMAT:
+            raise ValueError("Unsupported token lexicon format {}".format(data.get("format")))
+        if data.get("rules") != LEXICON_RULES:
+            raise ValueError("The token lexicon {} was built with the rules {}, not {}, rebuild it with "
+                             "python -m lbnlp.process.lexicon".format(filename, data.get("rules"), LEXICON_RULES))
+        entries = {}
+        for token_class, tokens in data["classes"].items():
+            if token_class in NORMALIZED_CLASSES:
+                entries.update((token, (token_class, normalized)) for token, normalized in tokens.items())
+            else:
+                entries.update((token, (token_class, None)) for token in tokens)
+        lexicon = cls(entries, data["rules"], data.get("pymatgen"))
+        current = pymatgen_version()
+        if lexicon.pymatgen_version is not None and current is not None and lexicon.pymatgen_version != current:
+            warnings.warn("The token lexicon {} was built with pymatgen {}, not {}, its formulas may be "
+                          "normalized differently from the tokens it does not contain, rebuild it with "
+                          "python -m lbnlp.process.lexicon".format(filename, lexicon.pymatgen_version, current),
+                          stacklevel=2)
+        return lexicon
+
+    def save(self, filename):
+        """
+        :param filename: string; output .json, the tokens grouped by class
+        """
+        classes = {token_class: {} if token_class in NORMALIZED_CLASSES else [] for token_class in CLASSES}
+        for token, (token_class, normalized) in sorted(self.entries.items()):
+            if token_class in NORMALIZED_CLASSES:
+                classes[token_class][token] = normalized
+            else:
+                classes[token_class].append(token)
+        data = {"format": LEXICON_FORMAT, "rules": self.rules, "pymatgen": self.pymatgen_version,
+                "classes": classes}
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def main(argv=None):
+    from lbnlp.process.matscholar import MatScholarProcess
+
+    parser = argparse.ArgumentParser(
+        description="Build the token lexicon MatScholarProcess looks tokens up in from a corpus")
+    parser.add_argument("corpus", help="text file, one document per line")
+    parser.add_argument("output", help="output .json, e.g. embeddings/lexicon.json")
+    parser.add_argument("--min-count", type=int, default=2, help="leave out rarer tokens")
+    parser.add_argument("--tokenizer", default="cde", help="tokenizer of the processor, cde or rule")
+    parser.add_argument("--phraser", help="phraser of the processor, e.g. embeddings/phraser.pkl")
+    args = parser.parse_args(argv)
+
+    kwargs = {"phraser_path": args.phraser} if args.phraser else {}
+    processor = MatScholarProcess(tokenizer=args.tokenizer, lexicon_path=None, **kwargs)
+    with open(args.corpus, encoding="utf-8") as f:
+        tokens = (token for line in f if line.strip()
+                  for token in processor.tokenize(line, keep_sentences=False))
+        lexicon = TokenLexicon.build(processor, tokens, args.min_count)
+    lexicon.save(args.output)
+    counts = collections.Counter(token_class for token_class, _ in lexicon.entries.values())
+    print("{} tokens: {}".format(len(lexicon), ", ".join("{} {}".format(counts[c], c) for c in CLASSES)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,24 @@
 import regex
 import string
+import functools
 import unidecode
 from os import path
 from monty.fractions import gcd_float
 
-from chemdataextractor.doc import Paragraph
-from gensim.models.phrases import Phraser
 from pymatgen.core.periodic_table import Element
 from pymatgen.core.composition import Composition, CompositionError
 
+from lbnlp.parse.formula import ELEMENTS, parse_formula
+from lbnlp.process import lexicon
+from lbnlp.process.phrases import CompiledPhraser
+from lbnlp.process.tokenizers import get_tokenizer
+
 PHRASER_PATH = path.join(path.dirname(__file__), 'phraser.pkl')
+# token lexicon loaded by default if present, see lbnlp.process.lexicon
+LEXICON_PATH = path.join(path.dirname(__file__), 'lexicon.json')
+
+# distinct tokens whose processing is remembered by each MatScholarProcess
+TOKEN_CACHE_SIZE = 2 ** 18
 
 __author__ = "Vahe Tshitoyan"
 __credits__ = "John Dagdelen, Leigh Weston, Anubhav Jain"
@@ -88,14 +97,66 @@ class MatScholarProcess:
 
     PUNCT = list(string.punctuation) + ['"', '“', '”', '≥', '≤', '×']
 
-    def __init__(self, phraser_path=PHRASER_PATH):
+    # for membership tests
+    ELEMENTS_SET = frozenset(ELEMENTS)
+    ELEMENTS_NAMES_UL_SET = frozenset(ELEMENTS_NAMES_UL)
+    ELEMENTS_AND_NAMES_SET = frozenset(ELEMENTS_AND_NAMES)
+    SPLIT_UNITS_SET = frozenset(SPLIT_UNITS)
+    PUNCT_SET = frozenset(PUNCT)
+
+    # characters other than digits a number can start with, see NR_BASIC and NR_AND_UNIT
+    NR_START = frozenset("+-.")
+
+    # diatomic at room temperature and atm pressure, parsed as formulas despite a single element
+    DIATOMIC = ["O2", "N2", "Cl2", "F2", "H2"]
+
+    # unidecode of the accented letters, Greek letters and symbols common in abstracts (Latin-1 and
+    # Latin Extended, Greek, punctuation, letterlike symbols, arrows and math operators), see remove_accent
+    ACCENT_TABLE = {i: unidecode.unidecode(chr(i))
+                    for block in (range(0x80, 0x250), range(0x370, 0x400), range(0x2000, 0x2070),
+                                  range(0x2100, 0x2150), range(0x2190, 0x2300))
+                    for i in block}
+
+    def __init__(self, phraser_path=PHRASER_PATH, token_cache_size=TOKEN_CACHE_SIZE, tokenizer="cde",
+                 lexicon_path=LEXICON_PATH):
+        """
+        :param phraser_path: path of the gensim phraser used by make_phrases, or of the .json it
+        was compiled to (see lbnlp.process.phrases), which loads without gensim
+        :param token_cache_size: number of distinct tokens whose processing (formula
+        normalization, lower casing, accent removal) is cached by process, 0 disables the cache
+        :param tokenizer: splits text into sentences of tokens in tokenize, "cde" (chemdataextractor,
+        which the pretrained models were trained with), "rule" (faster, see tokenizers.RuleTokenizer)
+        or an object with a tokenize(text) method
+        :param lexicon_path: path of a token lexicon (see lbnlp.process.lexicon) in which process looks
+        tokens up before classifying them, used if the file exists, None to classify all tokens
+        """
         self.elem_name_dict = {en: es for en, es in zip(self.ELEMENT_NAMES, self.ELEMENTS)}
-        self.phraser = Phraser.load(phraser_path)
+        self.phraser = CompiledPhraser.load(phraser_path)
+        self.tokenizer = get_tokenizer(tokenizer)
+        self.lexicon = None
+        if lexicon_path is not None and path.exists(lexicon_path):
+            self.lexicon = lexicon.TokenLexicon.load(lexicon_path)
+        self.token_cache_size = token_cache_size
+        self._init_token_cache()
+
+    def _init_token_cache(self):
+        self._process_token = functools.lru_cache(maxsize=self.token_cache_size)(self._process_token_uncached)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_process_token"]  # the cache is rebuilt empty, e.g. in worker processes
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("tokenizer", get_tokenizer("cde"))
+        state.setdefault("lexicon", None)
+        self.__dict__.update(state)
+        self._init_token_cache()
 
     def tokenize(self, text, split_oxidation=True, keep_sentences=True):
         """
-        Converts string to a list tokens (words) using chemdataextractor tokenizer, with a couple of fixes
-        for inorganic materials science.
+        Converts string to a list tokens (words) using the tokenizer (chemdataextractor by default), with
+        a couple of fixes for inorganic materials science.
         Keeps the structure of sentences.
         :param text: input text as a string
         :param split_oxidation: if True, will split the oxidation state from the element, e.g. iron(II)
@@ -103,35 +164,88 @@ class MatScholarProcess:
         :param keep_sentences: if False, will disregard the sentence structure and return tokens as a
         single list of strings. Otherwise returns a list of lists, each sentence separately.
         """
-        def split_token(token, so=split_oxidation):
-            """
-            Process a single token, in case it needs to be split up. There are 2 cases:
-            It's a number with a unit, or an element with a valence state.
-            """
-            elem_with_valence = self.ELEMENT_VALENCE_IN_PAR.match(token) if so else None
-            nr_unit = self.NR_AND_UNIT.match(token)
-            if nr_unit is not None and nr_unit.group(2) in self.SPLIT_UNITS:
-                # splitting the unit from number, e.g. "5V" -> ["5", "V"]
-                return [nr_unit.group(1), nr_unit.group(2)]
-            elif elem_with_valence is not None:
-                # splitting element from it's valence state, e.g. "Fe(II)" -> ["Fe", "(II)"]
-                return [elem_with_valence.group(1), elem_with_valence.group(2)]
-            else:
-                return [token]
-
-        cde_p = Paragraph(text)
-        tokens = cde_p.tokens
         toks = []
-        for sentence in tokens:
+        for sentence in self.tokenizer.tokenize(text):
             if keep_sentences:
                 toks.append([])
                 for tok in sentence:
-                    toks[-1] += split_token(tok.text, so=split_oxidation)
+                    toks[-1] += self._split_token(tok, split_oxidation)
             else:
                 for tok in sentence:
-                    toks += split_token(tok.text, so=split_oxidation)
+                    toks += self._split_token(tok, split_oxidation)
         return toks
 
+    def split_sentences(self, text):
+        """
+        Splits text into sentences with the tokenizer, see tokenize_sentence.
+        :param text: input text as a string
+        :return: list of sentences as strings
+        """
+        return self.tokenizer.split_sentences(text)
+
+    def tokenize_sentence(self, sentence, split_oxidation=True):
+        """
+        Converts a single sentence to a list of tokens, as tokenize does for each sentence of a text.
+        :param sentence: a sentence as a string, e.g. from split_sentences
+        :param split_oxidation: see tokenize
+        :return: list of strings
+        """
+        toks = []
+        for tok in self.tokenizer.tokenize_sentence(sentence):
+            toks += self._split_token(tok, split_oxidation)
+        return toks
+
+    def tokenize_many(self, texts, split_oxidation=True, keep_sentences=True):
+        """
+        Tokenizes many texts as tokenize does each. A text repeated in texts is tokenized
+        once, and each distinct token from the tokenizer is checked for splitting once.
+        :param texts: list of input texts as strings
+        :param split_oxidation: see tokenize
+        :param keep_sentences: see tokenize
+        :return: list of the tokenize outputs, one per text
+        """
+        tokenized = {}
+        for text in texts:
+            if text not in tokenized:
+                tokenized[text] = self.tokenizer.tokenize(text)
+
+        splits = {}
+        results = []
+        for text in texts:
+            toks = []
+            for sentence in tokenized[text]:
+                sentence_toks = []
+                for tok in sentence:
+                    split = splits.get(tok)
+                    if split is None:
+                        split = splits[tok] = self._split_token(tok, split_oxidation)
+                    sentence_toks += split
+                if keep_sentences:
+                    toks.append(sentence_toks)
+                else:
+                    toks += sentence_toks
+            results.append(toks)
+        return results
+
+    def _split_token(self, token, split_oxidation=True):
+        """
+        Process a single token, in case it needs to be split up. There are 2 cases:
+        It's a number with a unit, or an element with a valence state.
+        The regexes only run on tokens that can match them: starting like a number, or an
+        element (name) followed by a parenthesis.
+        """
+        if token[:1].isdigit() or token[:1] in self.NR_START:
+            nr_unit = self.NR_AND_UNIT.match(token)
+            if nr_unit is not None and nr_unit.group(2) in self.SPLIT_UNITS_SET:
+                # splitting the unit from number, e.g. "5V" -> ["5", "V"]
+                return [nr_unit.group(1), nr_unit.group(2)]
+        if split_oxidation and "(" in token and token.partition("(")[0] in self.ELEMENTS_AND_NAMES_SET:
+            elem_with_valence = self.ELEMENT_VALENCE_IN_PAR.match(token)
+            if elem_with_valence is not None:
+                # splitting element from it's valence state, e.g. "Fe(II)" -> ["Fe", "(II)"]
+                return [elem_with_valence.group(1), elem_with_valence.group(2)]
+        return [token]
+
     def process(self, tokens, exclude_punct=False, convert_num=True, normalize_materials=True, remove_accents=True,
                 make_phrases=False, split_oxidation=True):
         """
@@ -148,21 +262,75 @@ class MatScholarProcess:
         """
 
         if not isinstance(tokens, list):  # if it's a string
-            return self.process(self.tokenize(
-                tokens, split_oxidation=split_oxidation, keep_sentences=False),
-                exclude_punct=exclude_punct,
-                convert_num=convert_num,
-                normalize_materials=normalize_materials,
-                remove_accents=remove_accents,
-                make_phrases=make_phrases,
-            )
+            return self.process_many([tokens],
+                                     exclude_punct=exclude_punct,
+                                     convert_num=convert_num,
+                                     normalize_materials=normalize_materials,
+                                     remove_accents=remove_accents,
+                                     make_phrases=make_phrases,
+                                     split_oxidation=split_oxidation)[0]
 
+        processed, mat_list = self._process_sentence(
+            tokens, exclude_punct, self._is_number_token if convert_num else None,
+            lambda tok: self._process_token(tok, normalize_materials, remove_accents), remove_accents)
+        if make_phrases:
+            processed = self.make_phrases(processed, reps=2)
+        return processed, mat_list
+
+    def process_many(self, sentences, exclude_punct=False, convert_num=True, normalize_materials=True,
+                     remove_accents=True, make_phrases=False, split_oxidation=True):
+        """
+        Processes many sentences (or documents) as process does each, checking each distinct
+        token of the batch once (number detection, formula normalization, lower casing and
+        accent removal), so batches with a common vocabulary, e.g. the sentences of many
+        abstracts, repeat little work.
+        :param sentences: a list of pre-tokenized lists of strings or strings, strings are
+        tokenized with tokenize_many(keep_sentences=False) as process does
+        :param exclude_punct: see process
+        :param convert_num: see process
+        :param normalize_materials: see process
+        :param remove_accents: see process
+        :param make_phrases: see process
+        :param split_oxidation: see process
+        :return: list of (processed_tokens, material_list), one per sentence
+        """
+        texts = [sentence for sentence in sentences if not isinstance(sentence, list)]
+        if texts:
+            tokenized = iter(self.tokenize_many(texts, split_oxidation=split_oxidation, keep_sentences=False))
+            sentences = [sentence if isinstance(sentence, list) else next(tokenized) for sentence in sentences]
+
+        unique = set()
+        for tokens in sentences:
+            unique.update(tokens)
+        if exclude_punct:
+            unique -= self.PUNCT_SET
+        numbers = {tok for tok in unique if self._is_number_token(tok)} if convert_num else set()
+        processed_tokens = {tok: self._process_token(tok, normalize_materials, remove_accents)
+                            for tok in unique if tok not in numbers}
+
+        results = []
+        for tokens in sentences:
+            processed, mat_list = self._process_sentence(
+                tokens, exclude_punct, numbers.__contains__ if convert_num else None, processed_tokens.__getitem__,
+                remove_accents)
+            if make_phrases:
+                processed = self.make_phrases(processed, reps=2)
+            results.append((processed, mat_list))
+        return results
+
+    def _process_sentence(self, tokens, exclude_punct, is_number, process_token, remove_accents):
+        """
+        The loop of process over the tokens of a sentence.
+        :param is_number: callable; True if a token is a number, None if numbers are not converted
+        :param process_token: callable; (processed token, material mention or None) of any other token
+        :return: (processed_tokens, material_list)
+        """
         processed, mat_list = [], []
 
         for i, tok in enumerate(tokens):
-            if exclude_punct and tok in self.PUNCT:  # punctuation
+            if exclude_punct and tok in self.PUNCT_SET:  # punctuation
                 continue
-            elif convert_num and self.is_number(tok):  # number
+            elif is_number is not None and is_number(tok):  # number
                 # replace all numbers with <nUm>, except if it is a crystal direction (e.g. "(111)")
                 try:
                     if tokens[i - 1] == "(" and tokens[i + 1] == ")" \
@@ -172,31 +340,104 @@ class MatScholarProcess:
                         tok = "<nUm>"
                 except IndexError:
                     tok = "<nUm>"
-            elif tok in self.ELEMENTS_NAMES_UL:  # chemical element name
-                # add as a material mention
-                mat_list.append((tok, self.elem_name_dict[tok.lower()]))
-                tok = tok.lower()
-            elif self.is_simple_formula(tok):  # simple chemical formula
-                normalized_formula = self.normalized_formula(tok)
-                mat_list.append((tok, normalized_formula))
-                if normalize_materials:
-                    tok = normalized_formula
-            elif (len(tok) == 1 or (len(tok) > 1 and tok[0].isupper() and tok[1:].islower())) \
-                    and tok not in self.ELEMENTS and tok not in self.SPLIT_UNITS \
-                    and self.ELEMENT_DIRECTION_IN_PAR.match(tok) is None:
-                # to lowercase if only first letter is uppercase (chemical elements already covered above)
-                tok = tok.lower()
-
-            if remove_accents:
-                tok = self.remove_accent(tok)
+                if remove_accents:
+                    tok = self.remove_accent(tok)
+            else:
+                tok, mat = process_token(tok)
+                if mat is not None:
+                    mat_list.append(mat)
 
             processed.append(tok)
 
-        if make_phrases:
-            processed = self.make_phrases(processed, reps=2)
-
         return processed, mat_list
 
+    def _is_number_token(self, tok):
+        """
+        is_number, looked up in the lexicon first
+        """
+        if self.lexicon is not None:
+            entry = self.lexicon.get(tok)
+            if entry is not None:
+                return entry[0] == lexicon.NUMBER
+        return self.is_number(tok)
+
+    def _process_token_uncached(self, tok, normalize_materials, remove_accents):
+        """
+        Processes a token that is not converted to <nUm>, see process. It only depends on
+        the token and the flags, so the result is cached (see token_cache_size). The class of
+        the token is looked up in the lexicon, else computed by classify_word.
+        :return: (processed token, material mention or None)
+        """
+        entry = self.lexicon.get(tok) if self.lexicon is not None else None
+        token_class, normalized = entry if entry is not None else self.classify_word(tok)
+
+        mat = None
+        if token_class == lexicon.ELEMENT_NAME:  # chemical element name
+            # add as a material mention
+            mat = (tok, normalized)
+            tok = tok.lower()
+        elif token_class == lexicon.FORMULA:  # simple chemical formula
+            mat = (tok, normalized)
+            if normalize_materials:
+                tok = normalized
+        elif token_class == lexicon.LOWER:
+            tok = tok.lower()
+
+        if remove_accents:
+            tok = self.remove_accent(tok)
+        return tok, mat
+
+    def classify_token(self, tok):
+        """
+        Classifies a token for process, the class being lexicon.NUMBER if is_number, else see
+        classify_word. Numbers are left as they are when they are not converted to <nUm>.
+        :param tok: the token
+        :return: (class, element symbol or normalized formula, else None)
+        """
+        if self.is_number(tok):
+            return lexicon.NUMBER, None
+        return self.classify_word(tok)
+
+    def classify_word(self, tok):
+        """
+        Classifies a token that is not converted to <nUm>, see classify_token.
+        :param tok: the token
+        :return: (class, normalized form or None); the class is lexicon.ELEMENT_NAME with the element
+        symbol, lexicon.FORMULA with the normalized formula, lexicon.LOWER if it is to be lower cased,
+        else lexicon.OTHER
+        """
+        if tok in self.ELEMENTS_NAMES_UL_SET:  # chemical element name
+            return lexicon.ELEMENT_NAME, self.elem_name_dict[tok.lower()]
+        normalized_formula = self.simple_formula(tok)
+        if normalized_formula is not None:  # simple chemical formula
+            return lexicon.FORMULA, normalized_formula
+        if (len(tok) == 1 or (len(tok) > 1 and tok[0].isupper() and tok[1:].islower())) \
+                and tok not in self.ELEMENTS_SET and tok not in self.SPLIT_UNITS_SET \
+                and self.ELEMENT_DIRECTION_IN_PAR.match(tok) is None:
+            # to lowercase if only first letter is uppercase (chemical elements already covered above)
+            return lexicon.LOWER, None
+        return lexicon.OTHER, None
+
+    def simple_formula(self, text, max_denominator=1000):
+        """
+        Same as normalized_formula(text) if is_simple_formula(text), else None, parsing the
+        formula once.
+        :param text: the string
+        :param max_denominator: highest precision for the denominator (1000 by default)
+        :return: a normalized formula string or None
+        """
+        if self.VALENCE_INFO.search(text) is not None:
+            return None
+        if not any(char.isdigit() or char.islower() for char in text):
+            return None
+        el_amt = parse_formula(text)
+        if el_amt is None or text not in self.DIATOMIC and len(el_amt) < 2:
+            return None
+        try:
+            return self.get_ordered_integer_formula(el_amt, max_denominator)
+        except (CompositionError, ValueError):
+            return text
+
     def make_phrases(self, sentence, reps=2):
         """
         generates phrases from a sentence of words
@@ -204,10 +445,7 @@ class MatScholarProcess:
         :param reps: how many times to combine the words
         :return:
         """
-        while reps > 0:
-            sentence = self.phraser[sentence]
-            reps -= 1
-        return sentence
+        return self.phraser.phrase(sentence, reps)
 
     def is_number(self, s):
         """
@@ -215,7 +453,10 @@ class MatScholarProcess:
         :param s: the string
         :return: True or False
         """
-        return self.NR_BASIC.match(s.replace(',', '')) is not None
+        s = s.replace(',', '')
+        if not (s[:1].isdigit() or s[:1] in self.NR_START):
+            return False
+        return self.NR_BASIC.match(s) is not None
 
     @staticmethod
     def is_element(txt):
@@ -224,6 +465,8 @@ class MatScholarProcess:
         :param txt: input string
         :return: True or False
         """
+        if txt in ELEMENTS:
+            return True
         try:
             Element(txt)
             return True
@@ -244,18 +487,13 @@ class MatScholarProcess:
             # has to contain at least one lowercase letter or at least one number (to ignore abbreviations)
             # also ignores some materials like BN, but these are few and usually written in the same way,
             # so normalization won't be crucial
-            try:
-                if text in ["O2", "N2", "Cl2", "F2", "H2"]:
-                    # including chemical elements that are diatomic at room temperature and atm pressure,
-                    # despite them having only a single element
-                    return True
-                composition = Composition(text)
-                # has to contain more than one element, single elements are handled differently
-                if len(composition.keys()) < 2 or any([not self.is_element(key) for key in composition.keys()]):
-                    return False
+            if text in self.DIATOMIC:
+                # including chemical elements that are diatomic at room temperature and atm pressure,
+                # despite them having only a single element
                 return True
-            except (CompositionError, ValueError):
-                return False
+            el_amt = parse_formula(text)
+            # has to contain more than one element, single elements are handled differently
+            return el_amt is not None and len(el_amt) >= 2
         else:
             return False
 
@@ -289,7 +527,9 @@ class MatScholarProcess:
         :return: a normalized formula string, e.g. Ni0.5Fe0.5 -> FeNi
         """
         try:
-            formula_dict = Composition(text).get_el_amt_dict()
+            formula_dict = parse_formula(text)
+            if formula_dict is None:  # not a formula of elements, e.g. with an oxidation state
+                formula_dict = Composition(text).get_el_amt_dict()
             return self.get_ordered_integer_formula(formula_dict, max_denominator)
         except (CompositionError, ValueError):
             return text
@@ -302,4 +542,10 @@ class MatScholarProcess:
         :return: de-accented text
         """
         # there is a problem with angstrom sometimes, so ignoring length 1 strings
-        return unidecode.unidecode(txt) if len(txt) > 1 else txt
+        if len(txt) <= 1 or txt.isascii():  # as most tokens are
+            return txt
+        # unidecode maps each character on its own, so the table gives the same text
+        translated = txt.translate(MatScholarProcess.ACCENT_TABLE)
+        if translated.isascii():
+            return translated
+        return unidecode.unidecode(txt)  # characters missing from the table
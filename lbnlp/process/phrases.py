@@ -0,0 +1,182 @@
+"""
+Applies the phrases of a trained gensim phraser without gensim. The phrases scoring above
+the threshold are compiled into a set once, so applying them only takes set lookups, most
+word pairs being rejected by their first or last word without joining them.
+"""
+import sys
+import json
+import argparse
+
+COMPILED_PHRASER_FORMAT = 1
+
+
+class CompiledPhraser(object):
+    """
+    The phrases of a gensim Phraser (FrozenPhrases), applied as gensim does: a phrase is
+    a word, the connector words after it and the next word, joined by the delimiter.
+    """
+
+    def __init__(self, phrases, connector_words=(), delimiter="_", components=False):
+        """
+        :param phrases: iterable; the phrases scoring above the threshold, joined strings, or
+        tuples of words if components is True
+        :param connector_words: iterable; words that can be inside phrases, e.g. "of"
+        :param delimiter: string; joins the words of a phrase
+        :param components: bool; phrases are looked up by their words (gensim 3) rather than
+        by the joined string (gensim 4), which differ when words contain the delimiter
+        """
+        self.phrases = frozenset(tuple(phrase) if components else phrase for phrase in phrases)
+        self.connector_words = frozenset(connector_words)
+        self.delimiter = delimiter
+        self.components = components
+
+        # first and last words of the phrases, so most word pairs are rejected without joining them
+        if components:
+            self._starts = frozenset(phrase[0] for phrase in self.phrases)
+            self._ends = frozenset(phrase[-1] for phrase in self.phrases)
+        else:
+            # a phrase can start (end) before (after) any of its delimiters
+            starts, ends = set(), set()
+            for phrase in self.phrases:
+                i = phrase.find(delimiter)
+                while i >= 0:
+                    starts.add(phrase[:i])
+                    ends.add(phrase[i + len(delimiter):])
+                    i = phrase.find(delimiter, i + 1)
+            self._starts, self._ends = frozenset(starts), frozenset(ends)
+
+    @classmethod
+    def from_gensim(cls, phraser):
+        """
+        :param phraser: gensim.models.phrases.Phraser, of gensim 3 or 4
+        :return: CompiledPhraser
+        """
+        threshold = phraser.threshold
+        if hasattr(phraser, "connector_words"):  # gensim >= 4
+            return cls([phrase for phrase, score in phraser.phrasegrams.items() if score > threshold],
+                       phraser.connector_words, phraser.delimiter)
+
+        # gensim 3: bytes words, {tuple of words: (count, score) or score}, missing phrases score -1
+        if -1 > threshold:
+            raise ValueError("A gensim 3 phraser with a threshold below -1 makes phrases of all "
+                             "unknown word pairs, it is not supported")
+
+        def score(value):
+            return value[1] if isinstance(value, tuple) else value
+
+        def decode(word):
+            return word.decode("utf8") if isinstance(word, bytes) else word
+
+        return cls([tuple(decode(word) for word in phrase)
+                    for phrase, value in phraser.phrasegrams.items() if score(value) > threshold],
+                   [decode(word) for word in phraser.common_terms], decode(phraser.delimiter),
+                   components=True)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a compiled phraser saved by save, or a pickled gensim phraser (which needs gensim).
+
+        :param filename: string; .json written by save, else a gensim phraser
+        :return: CompiledPhraser
+        """
+        if not filename.endswith(".json"):
+            from gensim.models.phrases import Phraser
+
+            return cls.from_gensim(Phraser.load(filename))
+        with open(filename, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != COMPILED_PHRASER_FORMAT:
+            raise ValueError("Unsupported compiled phraser format {}".format(data.get("format")))
+        return cls(data["phrases"], data["connector_words"], data["delimiter"], data["components"])
+
+    def save(self, filename):
+        """
+        :param filename: string; output .json
+        """
+        data = {"format": COMPILED_PHRASER_FORMAT, "delimiter": self.delimiter, "components": self.components,
+                "connector_words": sorted(self.connector_words),
+                "phrases": sorted(list(phrase) if self.components else phrase for phrase in self.phrases)}
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    def _analyze(self, sentence):
+        """
+        gensim's analyze_sentence: the words of the sentence with the phrases joined.
+
+        :return: list; words
+        """
+        connector_words, starts, ends = self.connector_words, self._starts, self._ends
+        phrases, delimiter, components = self.phrases, self.delimiter, self.components
+        out = []
+        start, in_between = None, []
+        for word in sentence:
+            if word in connector_words:
+                if start:
+                    in_between.append(word)
+                else:
+                    out.append(word)
+                continue
+            if start:
+                if start in starts and word in ends:
+                    words = [start] + in_between + [word]
+                    phrase = delimiter.join(words)
+                    if (tuple(words) if components else phrase) in phrases:
+                        out.append(phrase)
+                        start, in_between = None, []
+                        continue
+                out.append(start)
+                if in_between:
+                    out += in_between
+                    in_between = []
+            start = word
+        if start:
+            out.append(start)
+            out += in_between
+        return out
+
+    def __getitem__(self, sentence):
+        """
+        :param sentence: list; tokens
+        :return: list; tokens, the phrases joined, as phraser[sentence] in gensim
+        """
+        return self._analyze(sentence)
+
+    def phrase(self, sentence, reps=2):
+        """
+        Applies the phrases reps times. A round only joins words (and drops empty strings, as
+        gensim does), so once one leaves the length unchanged the next rounds are skipped.
+
+        :param sentence: list; tokens
+        :param reps: int; how many times to combine the words
+        :return: list; tokens
+        """
+        sentence = list(sentence)
+        for _ in range(reps):
+            phrased = self._analyze(sentence)
+            if len(phrased) == len(sentence):
+                break
+            sentence = phrased
+        return sentence
+
+    def phrase_many(self, sentences, reps=2):
+        """
+        :param sentences: iterable; sentences as lists of tokens
+        :param reps: int; see phrase
+        :return: list; the sentences with their phrases joined
+        """
+        return [self.phrase(sentence, reps) for sentence in sentences]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile a gensim phraser to a .json that MatScholarProcess loads without gensim")
+    parser.add_argument("phraser", help="pickled gensim phraser, e.g. phraser.pkl")
+    parser.add_argument("output", help="output .json, e.g. phraser.json")
+    args = parser.parse_args(argv)
+    CompiledPhraser.load(args.phraser).save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from lbnlp.benchmarks.corpus import generate_documents
+from lbnlp.benchmarks.standins import write_phraser
+from lbnlp.process.cache import SentenceCache, preprocess_sentences
+from lbnlp.process.matscholar import MatScholarProcess
+from lbnlp.timing import StageTimer
+
+
+class SentenceCacheTest(unittest.TestCase):
+
+    def test_lru(self):
+        cache = SentenceCache(maxsize=2)
+        cache.update({"a": 1, "b": 2})
+        self.assertEqual(cache.lookup(["a"]), {"a": 1})
+        cache.update({"c": 3})  # b is the least recently used
+        self.assertEqual(cache.lookup(["a", "b", "c", "c"]), {"a": 1, "c": 3})
+        self.assertEqual(cache.stats(), {"hits": 4, "misses": 1, "hit_rate": 0.8, "size": 2, "maxsize": 2})
+
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(copy.lookup(["a"]), {"a": 1})
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_normalize(self):
+        self.assertEqual(SentenceCache.normalize(" The  gap\n of ZnO. "), "The gap of ZnO.")
+
+
+class PreprocessSentencesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.mp = MatScholarProcess(phraser_path=write_phraser(cls.tmpdir, [["the", "band", "gap"]] * 3),
+                                   tokenizer="rule")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def process_sentences(self, sents):
+        return [processed for processed, _ in self.mp.process_many(sents)]
+
+    def test_matches_uncached(self):
+        texts = [doc["text"] for doc in generate_documents(30, seed=4)]
+        boilerplate = " © 2020 Elsevier Ltd. All rights reserved."
+        texts = texts + [text + boilerplate for text in texts[:10]]
+        cache, timer = SentenceCache(), StageTimer()
+        for text in texts + texts:
+            expected = preprocess_sentences(self.mp, text, self.process_sentences)
+            self.assertEqual(preprocess_sentences(self.mp, text, self.process_sentences, cache, "test", timer),
+                             expected)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], timer.stats()["split_sentences"]["items"])
+        self.assertEqual(stats["misses"], timer.stats()["tokenize"]["items"])
+        self.assertGreater(stats["hit_rate"], 0.5)
+
+    def test_names_are_separate(self):
+        cache = SentenceCache()
+        text = "The gap of ZnO. The gap of ZnO."
+        first = preprocess_sentences(self.mp, text, self.process_sentences, cache, "a")
+        second = preprocess_sentences(self.mp, text, lambda sents: list(map(len, sents)), cache, "b")
+        self.assertEqual([processed for _, processed in first], [["the", "gap", "of", "OZn", "."]] * 2)
+        self.assertEqual([processed for _, processed in second], [5, 5])
+        self.assertEqual(cache.stats()["misses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
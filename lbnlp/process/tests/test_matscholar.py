@@ -0,0 +1,186 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import itertools
+import collections
+
+from pymatgen.core.periodic_table import Element
+
+from lbnlp.benchmarks.corpus import generate_documents
+from lbnlp.benchmarks.formulas import reference_is_simple_formula, reference_normalized_formula, \
+    reference_simple_formula
+from lbnlp.benchmarks.standins import write_phraser
+from lbnlp.benchmarks.tokens import reference_split_token, reference_is_number, reference_remove_accent, \
+    text_tokens
+from lbnlp.process import lexicon
+from lbnlp.process.lexicon import TokenLexicon
+from lbnlp.process.matscholar import MatScholarProcess
+
+
+def reference_process(mp, tokens, exclude_punct=False, convert_num=True, normalize_materials=True,
+                      remove_accents=True):
+    """MatScholarProcess.process on a token list before per-token caching, kept as the reference"""
+    processed, mat_list = [], []
+
+    for i, tok in enumerate(tokens):
+        if exclude_punct and tok in mp.PUNCT:
+            continue
+        elif convert_num and mp.is_number(tok):
+            try:
+                if tokens[i - 1] == "(" and tokens[i + 1] == ")" \
+                        or tokens[i - 1] == "〈" and tokens[i + 1] == "〉":
+                    pass
+                else:
+                    tok = "<nUm>"
+            except IndexError:
+                tok = "<nUm>"
+        elif tok in mp.ELEMENTS_NAMES_UL:
+            mat_list.append((tok, mp.elem_name_dict[tok.lower()]))
+            tok = tok.lower()
+        elif reference_is_simple_formula(tok):
+            normalized_formula = reference_normalized_formula(tok)
+            mat_list.append((tok, normalized_formula))
+            if normalize_materials:
+                tok = normalized_formula
+        elif (len(tok) == 1 or (len(tok) > 1 and tok[0].isupper() and tok[1:].islower())) \
+                and tok not in mp.ELEMENTS and tok not in mp.SPLIT_UNITS \
+                and mp.ELEMENT_DIRECTION_IN_PAR.match(tok) is None:
+            tok = tok.lower()
+
+        if remove_accents:
+            tok = mp.remove_accent(tok)
+
+        processed.append(tok)
+
+    return processed, mat_list
+
+
+EXTRA = [["Fe(III)", "(", "111", ")", "O2", "H2", "Néel", "Å", "IV", "II", "VI", "BN", "NaCl", "Ni0.5Fe0.5",
+          "LiFePO4", "iron", "Iron", "K", "Kelvin", "eV", "Fe(100)", "1,000", "〈", "110", "〉", "3.3", "x", "Xx",
+          "CO", "Co", "SiO2", "Pb(Zr0.5Ti0.5)O3", "Ti3C2Tx", "GaAs", "café", ".", ",", "“", "×", "123"]]
+
+
+class ProcessTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.sentences = [[token for token, _ in sent] for doc in generate_documents(100, seed=5)
+                         for sent in doc["tagged"]] + EXTRA
+        cls.mp = MatScholarProcess(phraser_path=write_phraser(cls.tmpdir, cls.sentences))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_matches_reference(self):
+        for flags in itertools.product([False, True], repeat=4):
+            kwargs = dict(zip(["exclude_punct", "convert_num", "normalize_materials", "remove_accents"], flags))
+            for sent in self.sentences:
+                self.assertEqual(self.mp.process(sent, **kwargs), reference_process(self.mp, sent, **kwargs))
+
+    def test_process_many(self):
+        sentences = self.sentences + [["111", ")"], ["(", "111"], [], ["3.3"]]
+        for flags in itertools.product([False, True], repeat=5):
+            kwargs = dict(zip(["exclude_punct", "convert_num", "normalize_materials", "remove_accents",
+                               "make_phrases"], flags))
+            self.assertEqual(self.mp.process_many(sentences, **kwargs),
+                             [self.mp.process(sent, **kwargs) for sent in sentences])
+
+        mp = MatScholarProcess(phraser_path=os.path.join(self.tmpdir, "phraser.pkl"), tokenizer="rule")
+        texts = ["The band gap of ZnO is 3.3 eV. Fe(III) oxide.", "Néel temperature of (111) LiFePO4.",
+                 "The band gap of ZnO is 3.3 eV. Fe(III) oxide."]
+        for kwargs in ({}, {"split_oxidation": False, "keep_sentences": False}):
+            self.assertEqual(mp.tokenize_many(texts, **kwargs), [mp.tokenize(text, **kwargs) for text in texts])
+        self.assertEqual(mp.process_many(texts + [["Fe", "2"]], split_oxidation=False),
+                         [mp.process(doc, split_oxidation=False) for doc in texts + [["Fe", "2"]]])
+
+    def test_lexicon(self):
+        tokens = list(itertools.chain(*self.sentences))
+        filename = os.path.join(self.tmpdir, "lexicon.json")
+        corpus = tokens[:len(tokens) // 2] + tokens
+        TokenLexicon.build(self.mp, corpus, min_count=2).save(filename)
+        mp = MatScholarProcess(phraser_path=os.path.join(self.tmpdir, "phraser.pkl"), token_cache_size=0,
+                               lexicon_path=filename)
+        self.assertEqual(set(mp.lexicon.entries),
+                         {token for token, count in collections.Counter(corpus).items() if count >= 2})
+        self.assertLess(len(mp.lexicon), len(set(tokens)))
+        for token in set(tokens):
+            self.assertEqual(mp.classify_token(token), self.mp.classify_token(token))
+            if self.mp.is_number(token):  # numbers are left as they are when not converted
+                self.assertEqual(self.mp.classify_word(token), (lexicon.OTHER, None))
+        for flags in itertools.product([False, True], repeat=4):
+            kwargs = dict(zip(["exclude_punct", "convert_num", "normalize_materials", "remove_accents"], flags))
+            for sent in self.sentences:
+                self.assertEqual(mp.process(sent, **kwargs), reference_process(self.mp, sent, **kwargs))
+
+        # the tokens in the lexicon are not parsed
+        parsed = []
+        mp.simple_formula = lambda text: parsed.append(text)
+        mp.is_number = lambda text: parsed.append(text)
+        mp.process_many([sent for sent in self.sentences if all(token in mp.lexicon for token in sent)])
+        self.assertEqual(parsed, [])
+        mp.lexicon = TokenLexicon({"Foo": (lexicon.FORMULA, "Bar"), "12": (lexicon.OTHER, None)})
+        self.assertEqual(mp.process(["Foo", "12"]), (["Bar", "12"], [("Foo", "Bar")]))
+
+        # a lexicon of another pymatgen version is used with a warning, one of other rules is refused
+        self.assertEqual(TokenLexicon.load(filename).pymatgen_version, lexicon.pymatgen_version())
+        mp.lexicon.pymatgen_version = "2019.9.8"
+        mp.lexicon.save(filename)
+        with self.assertWarns(UserWarning):
+            self.assertEqual(TokenLexicon.load(filename).get("Foo"), (lexicon.FORMULA, "Bar"))
+        mp.lexicon.rules = lexicon.LEXICON_RULES + 1
+        mp.lexicon.save(filename)
+        with self.assertRaises(ValueError):
+            TokenLexicon.load(filename)
+
+    def test_remove_accent(self):
+        tokens = list(itertools.chain(*self.sentences)) + text_tokens(
+            doc["text"] for doc in generate_documents(100, seed=7))
+        tokens += ["Néel", "Å", "ÅÅ", "α-Fe2O3", "μm", "Ωcm", "10−3", "“doped”", "Schrödinger", "Al₂O₃",
+                   "Mn⁴⁺", "β‐SiC", "化学", "Fe–Ni", "≈5", "∼", "a\u0301b", "ⅣⅥ", "😀x", "ﬁlm", "—"]
+        tokens += ["x" + chr(i) for i in range(0x80, 0x3000)]
+        for tok in tokens:
+            self.assertEqual(self.mp.remove_accent(tok), reference_remove_accent(tok))
+
+    def test_simple_formula(self):
+        tokens = list(itertools.chain(*self.sentences)) + ["Fe2+", "Fe(II)", "DyD2", "FeO@C", "Li2O2", "N2", "Xx2O"]
+        for tok in tokens:
+            self.assertEqual(self.mp.simple_formula(tok), reference_simple_formula(tok))
+            self.assertEqual(self.mp.is_simple_formula(tok), reference_is_simple_formula(tok))
+            self.assertEqual(self.mp.normalized_formula(tok), reference_normalized_formula(tok))
+
+    def test_is_element(self):
+        for tok in list(itertools.chain(*self.sentences)) + self.mp.ELEMENTS + ["D", "T", "Og", "Uuo", "Xx", ""]:
+            try:
+                Element(tok)
+                expected = True
+            except ValueError:
+                expected = False
+            self.assertEqual(self.mp.is_element(tok), expected)
+
+    def test_split_token(self):
+        tokens = list(itertools.chain(*self.sentences)) + [
+            "5V", "300K", "1.5eV", "-3.2GPa", "+5mAh", ".5h", "10(2)K", "5VV", "5", "1,000", "Fe(II)", "iron(III)",
+            "Iron(iv)", "Fe(IIII)", "Fe(II", "Fe(100)", "Xx(II)", "(II)", "2(II)", "", "(", "Fe(II)\n", "٣K"]
+        for tok in tokens:
+            for split_oxidation in (False, True):
+                self.assertEqual(self.mp._split_token(tok, split_oxidation),
+                                 reference_split_token(tok, split_oxidation))
+            self.assertEqual(self.mp.is_number(tok), reference_is_number(tok))
+
+    def test_cache(self):
+        mp = MatScholarProcess(phraser_path=os.path.join(self.tmpdir, "phraser.pkl"), token_cache_size=4)
+        for sent in self.sentences[:20]:
+            self.assertEqual(mp.process(sent), reference_process(mp, sent))
+        self.assertEqual(mp._process_token.cache_info().currsize, 4)
+
+        copy = pickle.loads(pickle.dumps(mp))
+        self.assertEqual(copy._process_token.cache_info().currsize, 0)
+        self.assertEqual(copy.process(EXTRA[0]), mp.process(EXTRA[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
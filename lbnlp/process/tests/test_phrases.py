@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+import itertools
+
+from gensim.models.phrases import Phrases, Phraser, ENGLISH_CONNECTOR_WORDS
+
+from lbnlp.benchmarks.corpus import generate_documents
+from lbnlp.process.matscholar import MatScholarProcess
+from lbnlp.process.phrases import CompiledPhraser
+
+
+class Gensim3Phraser(object):
+    """The attributes of a gensim 3 Phraser, with its __getitem__ (gensim 3.8) as the reference"""
+
+    def __init__(self, phraser):
+        self.threshold = phraser.threshold
+        self.delimiter = phraser.delimiter.encode("utf8")
+        self.common_terms = frozenset(word.encode("utf8") for word in phraser.connector_words)
+        # gensim 3 scores the components; "a_b" + "c" and "a" + "b_c" are different phrases
+        self.phrasegrams = {}
+        for phrase, score in phraser.phrasegrams.items():
+            words = phrase.split(phraser.delimiter)
+            self.phrasegrams[tuple(word.encode("utf8") for word in words)] = (2, score)
+
+    def __getitem__(self, sentence):
+        s = [word.encode("utf8") for word in sentence]
+        new_s, last_uncommon, in_between = [], None, []
+        for word in s:
+            is_common = word in self.common_terms
+            if not is_common and last_uncommon:
+                chain = [last_uncommon] + in_between + [word]
+                score = self.phrasegrams.get(tuple(chain), (0, -1))[1]
+                if score > self.threshold:
+                    new_s.append(self.delimiter.join(chain))
+                    last_uncommon, in_between = None, []
+                else:
+                    new_s += [last_uncommon] + in_between
+                    in_between, last_uncommon = [], word
+            elif not is_common:
+                last_uncommon = word
+            elif last_uncommon:
+                in_between.append(word)
+            else:
+                new_s.append(word)
+        if last_uncommon:
+            new_s += [last_uncommon] + in_between
+        return [word.decode("utf8") for word in new_s]
+
+
+class CompiledPhraserTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.sentences = [[token.lower() for token, _ in sent] for doc in generate_documents(200, seed=6)
+                         for sent in doc["tagged"]]
+        cls.sentences += [["band", "gap", "of", "zno"], ["band_gap", "of", "zno"], ["the", "band", "", "gap"],
+                          ["of", "the", "band", "of", "the", "gap"], [], ["gap"]]
+        cls.phrasers = [Phraser(Phrases(cls.sentences, min_count=2, threshold=1)),
+                        Phraser(Phrases(cls.sentences, min_count=2, threshold=1,
+                                        connector_words=ENGLISH_CONNECTOR_WORDS))]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def check(self, compiled, reference):
+        for sentence in self.sentences:
+            expected = sentence
+            for reps in range(4):
+                self.assertEqual(compiled.phrase(sentence, reps), expected)
+                expected = reference[expected]
+        self.assertEqual(compiled.phrase_many(self.sentences[:5]),
+                         [reference[reference[sentence]] for sentence in self.sentences[:5]])
+
+    def test_matches_gensim(self):
+        for phraser in self.phrasers:
+            self.assertGreater(len(phraser.phrasegrams), 10)
+            compiled = CompiledPhraser.from_gensim(phraser)
+            self.check(compiled, phraser)
+            self.assertEqual(compiled[self.sentences[0]], phraser[self.sentences[0]])
+
+    def test_matches_gensim3(self):
+        for phraser in self.phrasers:
+            gensim3 = Gensim3Phraser(phraser)
+            self.check(CompiledPhraser.from_gensim(gensim3), gensim3)
+
+    def test_save_load(self):
+        for phraser, components in itertools.product(self.phrasers, (False, True)):
+            compiled = CompiledPhraser.from_gensim(Gensim3Phraser(phraser) if components else phraser)
+            filename = os.path.join(self.tmpdir, "phraser.json")
+            compiled.save(filename)
+            loaded = CompiledPhraser.load(filename)
+            self.assertEqual((loaded.phrases, loaded.connector_words, loaded.components),
+                             (compiled.phrases, compiled.connector_words, components))
+            self.check(loaded, phraser if not components else Gensim3Phraser(phraser))
+
+    def test_processor(self):
+        pkl = os.path.join(self.tmpdir, "phraser.pkl")
+        self.phrasers[1].save(pkl)
+        compiled = os.path.join(self.tmpdir, "compiled.json")
+        CompiledPhraser.load(pkl).save(compiled)
+        for path in (pkl, compiled):
+            mp = MatScholarProcess(phraser_path=path)
+            for sentence in self.sentences:
+                self.assertEqual(mp.make_phrases(sentence), self.phrasers[1][self.phrasers[1][sentence]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+from lbnlp.benchmarks.corpus import generate_documents
+from lbnlp.benchmarks.standins import write_phraser
+from lbnlp.process.matscholar import MatScholarProcess
+from lbnlp.process.tokenizers import RuleTokenizer, CDETokenizer, get_tokenizer, compare_tokenizers
+
+HAS_CDE = importlib.util.find_spec("chemdataextractor") is not None
+
+
+class WhitespaceTokenizer(object):
+    """One sentence per line, tokens split on whitespace"""
+
+    def tokenize(self, text):
+        return [line.split() for line in text.split("\n") if line.strip()]
+
+
+class RuleTokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tokenizer = RuleTokenizer()
+
+    def test_tokenize(self):
+        text = ("The band gap of ZnO (3.3 eV) was measured by XRD. Films of Pb(Zr0.5Ti0.5)O3 and (Ba,Sr)TiO3, "
+                "e.g. at 500°C, lost 5% [12]. Fe(II) in the (111) plane, x=0.5; Vegard's law (Fig. 2). "
+                "it is “good”.")
+        self.assertEqual(self.tokenizer.tokenize(text), [
+            ["The", "band", "gap", "of", "ZnO", "(", "3.3", "eV", ")", "was", "measured", "by", "XRD", "."],
+            ["Films", "of", "Pb(Zr0.5Ti0.5)O3", "and", "(Ba,Sr)TiO3", ",", "e.g.", "at", "500", "°C", ",",
+             "lost", "5", "%", "[", "12", "]", "."],
+            ["Fe(II)", "in", "the", "(", "111", ")", "plane", ",", "x", "=", "0.5", ";", "Vegard", "'s", "law",
+             "(", "Fig.", "2", ")", "."],
+            ["it", "is", "“", "good", "”", "."]])
+
+    def test_tokens_cover_text(self):
+        for doc in generate_documents(20, seed=1):
+            sentences = self.tokenizer.tokenize(doc["text"])
+            self.assertEqual("".join(tok for sent in sentences for tok in sent), "".join(doc["text"].split()))
+            self.assertEqual(len(sentences), len(doc["tagged"]))
+
+    def test_empty(self):
+        self.assertEqual(self.tokenizer.tokenize(""), [])
+        self.assertEqual(self.tokenizer.tokenize(" . "), [["."]])
+
+    def test_final_abbreviations(self):
+        self.assertEqual(self.tokenizer.tokenize("Doped to 5 at. The gap"), [["Doped", "to", "5", "at", "."],
+                                                                            ["The", "gap"]])
+        self.assertEqual(self.tokenizer.tokenize("5 at. % of Fe"), [["5", "at.", "%", "of", "Fe"]])
+
+
+class TokenizerBackendTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.phraser_path = write_phraser(cls.tmpdir, [["the", "band", "gap"]] * 3)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_get_tokenizer(self):
+        self.assertIsInstance(get_tokenizer("rule"), RuleTokenizer)
+        self.assertIsInstance(get_tokenizer("cde"), CDETokenizer)
+        tokenizer = WhitespaceTokenizer()
+        self.assertIs(get_tokenizer(tokenizer), tokenizer)
+        with self.assertRaises(ValueError):
+            get_tokenizer("nope")
+
+    def test_processor(self):
+        mp = MatScholarProcess(phraser_path=self.phraser_path, tokenizer="rule")
+        self.assertEqual(mp.tokenize("Fe(II) at 5V. The gap."), [["Fe", "(II)", "at", "5", "V", "."],
+                                                                 ["The", "gap", "."]])
+        self.assertEqual(mp.process("The gap of Ni0.5Fe0.5 is 5 eV."),
+                         (["the", "gap", "of", "FeNi", "is", "<nUm>", "eV", "."], [("Ni0.5Fe0.5", "FeNi")]))
+        copy = pickle.loads(pickle.dumps(mp))
+        self.assertIsInstance(copy.tokenizer, RuleTokenizer)
+
+        mp = MatScholarProcess(phraser_path=self.phraser_path, tokenizer=WhitespaceTokenizer())
+        self.assertEqual(mp.tokenize("5V a\nb", keep_sentences=False), ["5", "V", "a", "b"])
+
+
+class CompareTokenizersTest(unittest.TestCase):
+
+    def test_report(self):
+        texts = ["Films of ZnO (x=0.5). The gap.", "A b", "ZnO thin films"]
+        report = compare_tokenizers(texts, RuleTokenizer(), WhitespaceTokenizer())
+        self.assertEqual((report["documents"], report["identical_documents"]), (3, 2))
+        self.assertEqual((report["reference_tokens"], report["candidate_tokens"]), (17, 11))
+        self.assertEqual(report["matching_tokens"], 9)
+        self.assertAlmostEqual(report["token_recall"], 9 / 17)
+        self.assertAlmostEqual(report["token_precision"], 9 / 11)
+        self.assertAlmostEqual(report["sentence_precision"], 1.)
+        self.assertAlmostEqual(report["sentence_recall"], 3 / 4)
+        self.assertEqual(report["diffs"][0]["examples"], [0])
+        self.assertEqual({(d["reference"], d["candidate"]) for d in report["diffs"]},
+                         {("( x = 0.5 ) .", "(x=0.5)."), ("gap .", "gap.")})
+
+        report = compare_tokenizers(texts, RuleTokenizer(), RuleTokenizer())
+        self.assertEqual((report["identical_documents"], report["token_f1"], report["diffs"]), (3, 1., []))
+
+    @unittest.skipUnless(HAS_CDE, "chemdataextractor is required")
+    def test_rule_agrees_with_cde(self):
+        texts = [doc["text"] for doc in generate_documents(50, seed=2)]
+        report = compare_tokenizers(texts, CDETokenizer(), RuleTokenizer())
+        self.assertGreater(report["token_f1"], 0.9)
+        self.assertGreater(report["sentence_recall"], 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
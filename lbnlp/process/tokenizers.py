@@ -0,0 +1,312 @@
+"""
+Tokenizers for MatScholarProcess. A tokenizer has a tokenize(text) method returning a list
+of sentences, each a list of token strings. Tokenizers used with a sentence cache (see
+lbnlp.process.cache) also have split_sentences(text), returning the sentences as strings,
+and tokenize_sentence(sentence), returning the tokens of one sentence.
+"""
+import re
+import sys
+import json
+import time
+import difflib
+import argparse
+import collections
+
+import regex
+
+
+class CDETokenizer(object):
+    """
+    The chemdataextractor sentence splitter and chemistry word tokenizer, the reference
+    the pretrained models were trained with.
+    """
+
+    def tokenize(self, text):
+        """
+        :param text: string
+        :return: list; sentences as lists of token strings
+        """
+        from chemdataextractor.doc import Paragraph
+
+        return [[tok.text for tok in sentence] for sentence in Paragraph(text).tokens]
+
+    def split_sentences(self, text):
+        """
+        :param text: string
+        :return: list; sentences as strings
+        """
+        from chemdataextractor.doc import Paragraph
+
+        return [sentence.text for sentence in Paragraph(text).sentences]
+
+    def tokenize_sentence(self, sentence):
+        """
+        :param sentence: string
+        :return: list; token strings
+        """
+        from chemdataextractor.doc import Sentence
+
+        return [tok.text for tok in Sentence(sentence).tokens]
+
+
+class RuleTokenizer(object):
+    """
+    A fast, rule based tokenizer close to the chemdataextractor one: words are split on
+    whitespace, then brackets, quotes and punctuation are split off their ends unless they
+    belong to the word, e.g. "(111)" -> "(", "111", ")" but Pb(Zr0.5Ti0.5)O3, (Ba,Sr)TiO3,
+    Fe(II), 3.3 and e.g. are kept. Sentences end after each word a ".", "!" or "?" is split
+    off, as in the punkt splitter of chemdataextractor. Use compare_tokenizers to measure the agreement
+    with CDETokenizer on a corpus.
+    """
+    BRACKETS = {"(": ")", "[": "]", "{": "}"}
+    CLOSING = {close: open_ for open_, close in BRACKETS.items()}
+    OPENING_QUOTES = frozenset('"“‘')
+    CLOSING_QUOTES = frozenset('"”’')
+    TRAILING_PUNCT = frozenset(",;:!?")
+    SENTENCE_END = frozenset(".!?")
+    # characters a word ending a sentence can end with
+    SENTENCE_END_CHARS = frozenset(".!?)]}\"”’")
+
+    # words whose final period is part of the word
+    ABBREVIATIONS = frozenset(["e.g.", "i.e.", "al.", "etc.", "vs.", "cf.", "ca.", "approx.", "fig.",
+                               "figs.", "eq.", "eqs.", "ref.", "refs.", "no.", "nos.", "vol.", "wt.", "at.",
+                               "mol.", "resp.", "dr.", "prof.", "inc.", "ltd.", "min.", "max.", "sec.",
+                               "temp.", "exp.", "calc.", "expt.", "tab.", "sect.", "ed.", "eds."])
+    # abbreviations that also end sentences, their period is split off before a capitalized word
+    FINAL_ABBREVIATIONS = frozenset(["etc.", "wt.", "at.", "vol.", "mol."])
+    INITIALS = regex.compile(r"^(?:\p{L}\.){2,}$")
+
+    # split from the word around them, e.g. x=0.5 -> x = 0.5
+    OPERATORS = regex.compile(r"([=~≈≤≥<>±×])")
+    # percent and degree units after a number, e.g. 5% -> 5 %, 500°C -> 500 °C
+    NR_AND_SYMBOL = regex.compile(r"^([+-]?\d[\d.,]*)(%|°[CFK]?|℃)$")
+    POSSESSIVE = regex.compile(r"^(.+?)(['’]s)$")
+
+    WORD = re.compile(r"\S+")
+
+    def tokenize(self, text):
+        """
+        :param text: string
+        :return: list; sentences as lists of token strings
+        """
+        return [tokens for _, _, tokens in self._sentences(text.split())]
+
+    def split_sentences(self, text):
+        """
+        :param text: string
+        :return: list; sentences as strings
+        """
+        spans = [match.span() for match in self.WORD.finditer(text)]
+        return [text[spans[first][0]:spans[last][1]]
+                for first, last, _ in self._sentences([text[start:end] for start, end in spans])]
+
+    def tokenize_sentence(self, sentence):
+        """
+        :param sentence: string
+        :return: list; token strings
+        """
+        return [tok for _, _, tokens in self._sentences(sentence.split()) for tok in tokens]
+
+    def _sentences(self, words):
+        """
+        :param words: list; the words of a text, split on whitespace
+        :return: generator; a tuple (index of the first word, index of the last word, tokens)
+        per sentence
+        """
+        tokens, first = [], 0
+        for i, word in enumerate(words):
+            ends_sentence = i + 1 == len(words) or words[i + 1][:1].isupper()
+            word_tokens = self._split_word(word, ends_sentence)
+            tokens += word_tokens
+            if word[-1] in self.SENTENCE_END_CHARS and self.SENTENCE_END.intersection(word_tokens):
+                yield first, i, tokens
+                tokens, first = [], i + 1
+        if tokens:
+            yield first, len(words) - 1, tokens
+
+    def _is_abbreviation(self, word, ends_sentence=False):
+        # units may follow the number without a space, e.g. 5wt.
+        unit = word.lstrip("+-0123456789.,").lower()
+        if ends_sentence and unit in self.FINAL_ABBREVIATIONS:
+            return False
+        return word.lower() in self.ABBREVIATIONS or unit in self.FINAL_ABBREVIATIONS \
+            or self.INITIALS.match(word) is not None
+
+    def _split_word(self, word, ends_sentence=False):
+        """
+        :param word: string without whitespace
+        :param ends_sentence: True if the next word is capitalized or there is none, then the
+        period of a final abbreviation ends the sentence unless another one already does
+        :return: list; tokens
+        """
+        prefix, suffix = [], []
+        while len(word) > 1:
+            first, last = word[0], word[-1]
+            if first in self.OPENING_QUOTES:
+                prefix.append(first)
+                word = word[1:]
+            elif first in self.BRACKETS and self._split_opening(word):
+                prefix.append(first)
+                word = word[1:]
+            elif last in self.CLOSING_QUOTES or last in self.TRAILING_PUNCT:
+                suffix.append(last)
+                word = word[:-1]
+            elif last == "." and not self._is_abbreviation(
+                    word, ends_sentence and not self.SENTENCE_END.intersection(suffix)):
+                suffix.append(last)
+                word = word[:-1]
+            elif last in self.CLOSING and word.count(last) > word.count(self.CLOSING[last]):
+                suffix.append(last)
+                word = word[:-1]
+            else:
+                break
+        return prefix + self._split_core(word) + suffix[::-1]
+
+    def _split_opening(self, word):
+        """True if the opening bracket word[0] is not closed, or closed only at the end"""
+        open_, close, depth = word[0], self.BRACKETS[word[0]], 0
+        for i, char in enumerate(word):
+            if char == open_:
+                depth += 1
+            elif char == close:
+                depth -= 1
+                if depth == 0:
+                    return i == len(word) - 1
+        return True
+
+    def _split_core(self, word):
+        if len(word) < 2:
+            return [word]
+        nr_symbol = self.NR_AND_SYMBOL.match(word)
+        if nr_symbol is not None:
+            return [nr_symbol.group(1), nr_symbol.group(2)]
+        possessive = self.POSSESSIVE.match(word)
+        if possessive is not None:
+            return [possessive.group(1), possessive.group(2)]
+        if self.OPERATORS.search(word) is not None:
+            return [part for part in self.OPERATORS.split(word) if part]
+        return [word]
+
+
+# name -> tokenizer class, see MatScholarProcess(tokenizer=...)
+TOKENIZERS = {
+    "cde": CDETokenizer,
+    "rule": RuleTokenizer,
+}
+
+
+def get_tokenizer(tokenizer):
+    """
+    :param tokenizer: string (a name in TOKENIZERS) or an object with a tokenize(text) method
+    :return: the tokenizer object
+    """
+    if isinstance(tokenizer, str):
+        if tokenizer not in TOKENIZERS:
+            raise ValueError("Unknown tokenizer {}, choose from {}".format(tokenizer, sorted(TOKENIZERS)))
+        return TOKENIZERS[tokenizer]()
+    return tokenizer
+
+
+def _sentence_ends(sentences):
+    """Character offsets, ignoring whitespace, where the sentences end"""
+    ends, offset = set(), 0
+    for sentence in sentences:
+        offset += sum(len(tok) for tok in sentence)
+        ends.add(offset)
+    return ends
+
+
+def compare_tokenizers(texts, reference, candidate, max_examples=3):
+    """
+    Agreement of a candidate tokenizer with a reference one, token by token (difflib
+    alignment of the tokens of each text) and on sentence boundaries.
+
+    :param texts: iterable; strings
+    :param reference: tokenizer, e.g. CDETokenizer()
+    :param candidate: tokenizer, e.g. RuleTokenizer()
+    :param max_examples: int; texts kept as examples per kind of diff
+    :return: dict; {"documents", "identical_documents", "reference_tokens", "candidate_tokens",
+    "matching_tokens", "token_precision", "token_recall", "token_f1", "sentence_precision",
+    "sentence_recall", "reference_seconds", "candidate_seconds", "diffs"}, diffs is a list of
+    {"reference", "candidate", "count", "examples"}, most frequent first
+    """
+    diffs = collections.Counter()
+    examples = collections.defaultdict(list)
+    n_docs = identical = n_ref = n_cand = matching = 0
+    ref_ends = cand_ends = matching_ends = 0
+    ref_seconds = cand_seconds = 0.
+
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        ref_sents = reference.tokenize(text)
+        ref_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        cand_sents = candidate.tokenize(text)
+        cand_seconds += time.perf_counter() - start
+
+        ref = [tok for sent in ref_sents for tok in sent]
+        cand = [tok for sent in cand_sents for tok in sent]
+        n_docs += 1
+        identical += ref_sents == cand_sents
+        n_ref += len(ref)
+        n_cand += len(cand)
+        for op, i1, i2, j1, j2 in difflib.SequenceMatcher(None, ref, cand, autojunk=False).get_opcodes():
+            if op == "equal":
+                matching += i2 - i1
+            else:
+                diff = (" ".join(ref[i1:i2]), " ".join(cand[j1:j2]))
+                diffs[diff] += 1
+                if len(examples[diff]) < max_examples:
+                    examples[diff].append(i)
+
+        ref_boundaries, cand_boundaries = _sentence_ends(ref_sents), _sentence_ends(cand_sents)
+        ref_ends += len(ref_boundaries)
+        cand_ends += len(cand_boundaries)
+        matching_ends += len(ref_boundaries & cand_boundaries)
+
+    precision = matching / n_cand if n_cand else 1.
+    recall = matching / n_ref if n_ref else 1.
+    return {
+        "documents": n_docs, "identical_documents": identical,
+        "reference_tokens": n_ref, "candidate_tokens": n_cand, "matching_tokens": matching,
+        "token_precision": precision, "token_recall": recall,
+        "token_f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.,
+        "sentence_precision": matching_ends / cand_ends if cand_ends else 1.,
+        "sentence_recall": matching_ends / ref_ends if ref_ends else 1.,
+        "reference_seconds": ref_seconds, "candidate_seconds": cand_seconds,
+        "diffs": [{"reference": ref, "candidate": cand, "count": count, "examples": examples[(ref, cand)]}
+                  for (ref, cand), count in diffs.most_common()],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Token level agreement of a tokenizer with the reference one on a corpus")
+    parser.add_argument("corpus", help="text file, one abstract per line")
+    parser.add_argument("--reference", default="cde", choices=sorted(TOKENIZERS))
+    parser.add_argument("--candidate", default="rule", choices=sorted(TOKENIZERS))
+    parser.add_argument("--top", type=int, default=20, help="most frequent diffs printed")
+    parser.add_argument("--output", default=None, help="write the full report as json")
+    args = parser.parse_args(argv)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    report = compare_tokenizers(texts, get_tokenizer(args.reference), get_tokenizer(args.candidate))
+
+    print("{} documents, {} identical".format(report["documents"], report["identical_documents"]))
+    print("tokens:    precision {:.4f}  recall {:.4f}  f1 {:.4f}".format(
+        report["token_precision"], report["token_recall"], report["token_f1"]))
+    print("sentences: precision {:.4f}  recall {:.4f}".format(
+        report["sentence_precision"], report["sentence_recall"]))
+    print("time:      {} {:.2f}s  {} {:.2f}s".format(args.reference, report["reference_seconds"],
+                                                    args.candidate, report["candidate_seconds"]))
+    for diff in report["diffs"][:args.top]:
+        print("{:>6}  {!r} -> {!r}".format(diff["count"], diff["reference"], diff["candidate"]))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+from lbnlp.relevance.classifier import RelevanceClassifier, preprocess, iter_preprocessed
+from lbnlp.relevance.linear import LinearRelevanceModel, export_relevance_model
@@ -0,0 +1,12 @@
+import argparse
+
+from lbnlp.relevance.linear import export_relevance_model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the dill pickled relevance classifier and tfidf to a numpy .npz")
+    parser.add_argument("clf_path", help="dill pickled classifier, e.g. relevance_model.p")
+    parser.add_argument("tfidf_path", help="dill pickled TfidfVectorizer, e.g. tfidf.p")
+    parser.add_argument("filename", help="output .npz, e.g. relevance_model.npz")
+    args = parser.parse_args()
+    export_relevance_model(args.clf_path, args.tfidf_path, args.filename)
@@ -0,0 +1,217 @@
+import itertools
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import dill
+import numpy as np
+
+from lbnlp.process.cache import preprocess_sentences
+from lbnlp.relevance.linear import LinearRelevanceModel
+from lbnlp.timing import NULL_TIMER
+
+
+def preprocess(processor, text, timer=NULL_TIMER, cache=None):
+    """
+    Performs pre-processing (tokenization, lowering, etc).
+
+    :param processor: MatScholarProcess; tokenizes and processes the text
+    :param text: string; document to be processed
+    :param timer: lbnlp.timing.StageTimer; records the tokenize and process stages
+    :param cache: lbnlp.process.cache.SentenceCache; if given, sentences seen before are
+    not tokenized and processed again
+    :return: list; the processed tokens of the whole document
+    """
+
+    sents = preprocess_sentences(processor, text, lambda sents: [p for p, _ in processor.process_many(sents)],
+                                 cache, "relevance", timer)
+    flattened = [token for _, processed in sents for token in processed]
+    return flattened
+
+
+# processor and sentence cache of a preprocessing worker process, set by _init_worker
+_worker_processor = None
+_worker_cache = None
+
+
+def _init_worker(processor, cache=None):
+    global _worker_processor, _worker_cache
+    _worker_processor = processor
+    _worker_cache = cache
+
+
+def _preprocess_in_worker(text):
+    return preprocess(_worker_processor, text, cache=_worker_cache)
+
+
+def _unique_chunks(docs, chunk_size):
+    """
+    Cuts the documents in chunks of unique texts.
+
+    :return: generator; a tuple (unique texts, index of each document in the unique texts)
+    """
+
+    docs = iter(docs)
+    while True:
+        chunk = list(itertools.islice(docs, chunk_size))
+        if not chunk:
+            return
+        index = {}
+        inverse = np.array([index.setdefault(doc, len(index)) for doc in chunk], dtype=int)
+        yield list(index), inverse
+
+
+def iter_preprocessed(processor, docs, chunk_size=10000, workers=0, timer=NULL_TIMER, cache=None):
+    """
+    Preprocesses a stream of documents chunk by chunk, each distinct text of a chunk once.
+
+    :param processor: MatScholarProcess; tokenizes and processes the texts
+    :param docs: iterable; documents as strings
+    :param chunk_size: int; documents per chunk
+    :param workers: int; if > 0, documents are preprocessed by that many worker processes,
+    the next chunk being preprocessed while the current one is consumed
+    :param timer: lbnlp.timing.StageTimer; records tokenize and process, or preprocess
+    with workers
+    :param cache: lbnlp.process.cache.SentenceCache; see preprocess, each worker process
+    starts with a copy of it and fills its own
+    :return: generator; a tuple (unique texts, index of each document in the unique texts,
+    processed unique texts) per chunk
+    """
+
+    chunks = _unique_chunks(docs, chunk_size)
+    if workers <= 0:
+        for texts, inverse in chunks:
+            yield texts, inverse, [preprocess(processor, text, timer, cache) for text in texts]
+        return
+
+    def collect(texts, inverse, results):
+        with timer.stage("preprocess", items=len(texts)):
+            return texts, inverse, list(results)
+
+    # spawn, so workers do not inherit the memory of the parent
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(processor, cache))
+    pending = collections.deque()
+    try:
+        for texts, inverse in chunks:
+            results = executor.map(_preprocess_in_worker, texts,
+                                   chunksize=max(1, len(texts) // (4 * workers)))
+            pending.append((texts, inverse, results))
+            if len(pending) > 1:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+    finally:
+        executor.shutdown(wait=False)
+
+
+class RelevanceClassifier:
+    """
+    A class to classify documents as relevant/not-relevant to inorganic materials science
+    """
+
+    def __init__(self, clf_path=None, tfidf_path=None, processor=None, timer=None, model_path=None,
+                 sentence_cache=None):
+        """
+        Constructor method for RelevanceClassifier. Loads the classifier and tfidf transformer,
+        either dill pickled sklearn objects or a LinearRelevanceModel .npz exported from them.
+
+        :param clf_path: string; dill pickled classifier
+        :param tfidf_path: string; dill pickled TfidfVectorizer
+        :param model_path: string; .npz written by LinearRelevanceModel.save, used instead of
+        clf_path and tfidf_path
+
+        :param timer: lbnlp.timing.StageTimer; if given, records the time spent in each stage
+        (tokenize, process, tfidf, predict, or preprocess instead of tokenize and process when
+        documents are preprocessed by worker processes)
+        :param sentence_cache: lbnlp.process.cache.SentenceCache; if given, sentences seen
+        before (in any document) are not tokenized and processed again
+        """
+
+        if not processor:
+            from lbnlp.process.matscholar import MatScholarProcess
+            processor = MatScholarProcess()
+        self.processor = processor
+        self.timer = timer if timer else NULL_TIMER
+        self.sentence_cache = sentence_cache
+        if model_path:
+            # the model transforms documents and scores the matrix, like the sklearn pair
+            self.clf = self.tfidf = LinearRelevanceModel.load(model_path)
+        else:
+            with open(clf_path, "rb") as f:
+                self.clf = dill.load(f)
+            with open(tfidf_path, "rb") as f:
+                self.tfidf = dill.load(f)
+
+    def _preprocess(self, text):
+        """
+        Performs pre-processing (tokenization, lowering, etc).
+
+        :param text: string; document to be processed
+        :return: array; the processed tokens
+        """
+
+        return preprocess(self.processor, text, self.timer, self.sentence_cache)
+
+    def classify(self, doc, decision_boundary=0.5):
+        """
+        Classify a document as relevant or not relevant
+
+        :param doc: string; a document to be classified
+        :param decision_boundary: float; probability required for a positive classification
+        :return: int; either 1 or 0 (relevant or not relevant)
+        """
+
+        processed = self._preprocess(doc)
+        with self.timer.stage("tfidf", items=1):
+            X = self.tfidf.transform([processed])
+        with self.timer.stage("predict", items=1):
+            prob = self.clf.predict_proba(X)[0][1]
+        pred = 1 if prob >= decision_boundary else 0
+        return pred
+
+    def classify_many(self, docs, decision_boundary=0.5, chunk_size=10000, workers=0,
+                      return_proba=False):
+        """
+        Classify multiple documents as relevant or not relevant
+
+        :param docs: list; a list of documents (as a string) to be classified
+        :param decision_boundary: float; probability required for a positive classification
+        :param chunk_size: int; see iter_classify
+        :param workers: int; see iter_classify
+        :param return_proba: bool; if True, also return the probabilities
+        :return: array; predicted labels (1 or 0), or a tuple (labels, probabilities)
+        """
+
+        preds, probs = [], []
+        for pred, prob in self.iter_classify(docs, decision_boundary, chunk_size, workers):
+            preds.append(pred)
+            probs.append(prob)
+        preds = np.array(preds, dtype=int)
+        if return_proba:
+            return preds, np.array(probs, dtype=float)
+        return preds
+
+    def iter_classify(self, docs, decision_boundary=0.5, chunk_size=10000, workers=0):
+        """
+        Classify a stream of documents chunk by chunk, so memory does not grow with the
+        number of documents. Identical documents in a chunk are preprocessed and scored once.
+
+        :param docs: iterable; documents (as a string) to be classified
+        :param decision_boundary: float; probability required for a positive classification
+        :param chunk_size: int; documents transformed and scored together
+        :param workers: int; if > 0, documents are preprocessed by that many worker processes,
+        the next chunk being preprocessed while the current one is scored
+        :return: generator; a tuple (label, probability) per document, in order
+        """
+
+        for texts, inverse, processed in iter_preprocessed(self.processor, docs, chunk_size, workers,
+                                                           self.timer, self.sentence_cache):
+            with self.timer.stage("tfidf", items=len(texts)):
+                X = self.tfidf.transform(processed)
+            with self.timer.stage("predict", items=len(texts)):
+                prob = self.clf.predict_proba(X)[:, 1][inverse]
+            preds = np.where(prob > decision_boundary, 1, 0)
+            for pred, p in zip(preds.tolist(), prob.tolist()):
+                yield pred, p
@@ -0,0 +1,186 @@
+
+import dill
+import numpy as np
+import scipy.sparse
+
+# version of the .npz layout written by LinearRelevanceModel.save
+LINEAR_MODEL_FORMAT = 1
+
+
+class LinearRelevanceModel:
+    """
+    A tfidf transform and a linear classifier stored as numpy arrays, scoring documents
+    with numpy and scipy only. Reproduces TfidfVectorizer.transform followed by
+    predict_proba of a binary linear classifier (e.g. LogisticRegression), without sklearn
+    or unpickling.
+    """
+
+    def __init__(self, vocabulary, idf, coef, intercept, norm="l2", sublinear_tf=False,
+                 binary=False, proba_scale=1.):
+        """
+        :param vocabulary: list; the terms, in the order of the matrix columns
+        :param idf: array; idf weight of each term, or None if idf is not used
+        :param coef: array; weight of each term in the decision function
+        :param intercept: float; intercept of the decision function
+        :param norm: string; "l2", "l1" or None, normalization of the tfidf rows
+        :param sublinear_tf: bool; if True, term counts are replaced by 1 + log(count)
+        :param binary: bool; if True, term counts are clipped to 1
+        :param proba_scale: float; the probability of relevance is
+        1 / (1 + exp(-proba_scale * decision))
+        """
+        self.vocabulary = list(vocabulary)
+        self.term_index = dict(zip(self.vocabulary, range(len(self.vocabulary))))
+        self.idf = None if idf is None else np.asarray(idf, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self.proba_scale = proba_scale
+        if norm not in ("l1", "l2", None):
+            raise ValueError("Unknown norm {}".format(norm))
+        if len(self.coef) != len(self.vocabulary):
+            raise ValueError("{} weights for {} terms".format(len(self.coef), len(self.vocabulary)))
+
+    @classmethod
+    def from_sklearn(cls, tfidf, clf):
+        """
+        Converts a fitted TfidfVectorizer over pre-tokenized documents (unigrams) and a
+        fitted binary linear classifier with predict_proba.
+
+        :param tfidf: TfidfVectorizer; its analyzer must return the tokens of a document,
+        minus its stop words
+        :param clf: e.g. LogisticRegression or SGDClassifier(loss="log_loss")
+        :return: LinearRelevanceModel
+        """
+        if getattr(tfidf, "ngram_range", (1, 1)) != (1, 1):
+            raise ValueError("Only unigram tfidf vectorizers can be exported")
+        probe = ["ZnO", "the", "band gap", "ZnO", "x"]
+        stop_words = tfidf.get_stop_words() or ()
+        try:
+            analyzed = tfidf.build_analyzer()(probe)
+        except (AttributeError, TypeError):  # the analyzer expects a string
+            analyzed = None
+        if analyzed != [t for t in probe if t not in stop_words]:
+            raise ValueError("Only tfidf vectorizers over pre-tokenized documents can be exported")
+        coef = np.asarray(clf.coef_, dtype=np.float64)
+        if coef.shape[0] != 1 or not hasattr(clf, "predict_proba"):
+            raise ValueError("Only binary linear classifiers with predict_proba can be exported")
+
+        vocabulary = [None] * len(tfidf.vocabulary_)
+        for term, i in tfidf.vocabulary_.items():
+            vocabulary[i] = term
+        model = cls(vocabulary, tfidf.idf_ if tfidf.use_idf else None, coef,
+                    np.ravel(clf.intercept_)[0], tfidf.norm, tfidf.sublinear_tf, tfidf.binary)
+
+        # binary logistic regression is expit(decision), or expit(2 * decision) when fit
+        # multinomial with older sklearn
+        rng = np.random.RandomState(0)
+        X = scipy.sparse.random(20, len(vocabulary), density=min(1., 20. / max(1, len(vocabulary))),
+                                format="csr", random_state=rng)
+        expected = clf.predict_proba(X)[:, 1]
+        decision = model.decision_function(X)
+        for scale in (1., 2.):
+            model.proba_scale = scale
+            if np.allclose(model._expit(decision), expected, rtol=1e-10, atol=1e-12):
+                return model
+        raise ValueError("predict_proba of {} is not a logistic function of its decision "
+                         "function".format(type(clf).__name__))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        :param filename: string; .npz written by save
+        :return: LinearRelevanceModel
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            if int(data["format"]) != LINEAR_MODEL_FORMAT:
+                raise ValueError("{} has format {}, expected {}".format(
+                    filename, int(data["format"]), LINEAR_MODEL_FORMAT))
+            norm = str(data["norm"])
+            vocabulary = data["vocabulary"].tobytes().decode("utf-8").split("\n")
+            if not len(data["coef"]):
+                vocabulary = []
+            return cls(vocabulary, data["idf"] if data["use_idf"] else None,
+                       data["coef"], data["intercept"], norm if norm else None,
+                       bool(data["sublinear_tf"]), bool(data["binary"]), float(data["proba_scale"]))
+
+    def save(self, filename):
+        """
+        :param filename: string; output .npz
+        """
+        if any("\n" in term for term in self.vocabulary):
+            raise ValueError("Terms with a newline can not be saved")
+        # one utf-8 string of newline separated terms, much faster to load than a str array
+        vocabulary = np.frombuffer("\n".join(self.vocabulary).encode("utf-8"), dtype=np.uint8)
+        np.savez(filename, format=LINEAR_MODEL_FORMAT, vocabulary=vocabulary,
+                 idf=self.idf if self.idf is not None else np.zeros(0),
+                 use_idf=self.idf is not None, coef=self.coef, intercept=self.intercept,
+                 norm=self.norm or "", sublinear_tf=self.sublinear_tf, binary=self.binary,
+                 proba_scale=self.proba_scale)
+
+    def transform(self, docs):
+        """
+        :param docs: list; documents as lists of tokens
+        :return: scipy.sparse.csr_matrix; the tfidf matrix, one row per document
+        """
+        term_index = self.term_index
+        indptr, indices = [0], []
+        for doc in docs:
+            indices.extend(term_index[token] for token in doc if token in term_index)
+            indptr.append(len(indices))
+        X = scipy.sparse.csr_matrix((np.ones(len(indices)), indices, indptr),
+                                    shape=(len(indptr) - 1, len(self.vocabulary)))
+        X.sum_duplicates()
+
+        if self.binary:
+            X.data[:] = 1
+        elif self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        if self.norm:
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            values = np.abs(X.data) if self.norm == "l1" else X.data ** 2
+            norms = np.bincount(rows, weights=values, minlength=X.shape[0])
+            if self.norm == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1
+            X.data /= norms[rows]
+        return X
+
+    def decision_function(self, X):
+        """
+        :param X: sparse matrix; see transform
+        :return: array; the decision function of each row
+        """
+        return X @ self.coef + self.intercept
+
+    def _expit(self, decision):
+        return 1. / (1. + np.exp(-self.proba_scale * decision))
+
+    def predict_proba(self, X):
+        """
+        :param X: sparse matrix; see transform
+        :return: array [n_documents, 2]; probabilities of not relevant and relevant
+        """
+        prob = self._expit(self.decision_function(X))
+        return np.stack([1. - prob, prob], axis=1)
+
+
+def export_relevance_model(clf_path, tfidf_path, filename):
+    """
+    Converts the dill pickled classifier and tfidf of RelevanceClassifier to a
+    LinearRelevanceModel .npz
+
+    :param clf_path: string; dill pickled classifier
+    :param tfidf_path: string; dill pickled TfidfVectorizer
+    :param filename: string; output .npz
+    """
+    with open(clf_path, "rb") as f:
+        clf = dill.load(f)
+    with open(tfidf_path, "rb") as f:
+        tfidf = dill.load(f)
+    LinearRelevanceModel.from_sklearn(tfidf, clf).save(filename)
+
@@ -0,0 +1,336 @@
+import os
+import csv
+import json
+import sqlite3
+import argparse
+import itertools
+import collections
+
+import numpy as np
+
+from lbnlp.relevance.classifier import iter_preprocessed
+from lbnlp.relevance.linear import LinearRelevanceModel
+from lbnlp.timing import NULL_TIMER
+
+TRUE_LABELS = ("1", "true", "yes", "relevant")
+
+
+def _label(value):
+    if isinstance(value, str):
+        return int(value.strip().lower() in TRUE_LABELS)
+    return int(bool(value))
+
+
+def read_jsonl(filename, text_field="abstract", label_field="relevant"):
+    """
+    :param filename: string; one json object per line
+    :return: generator; a tuple (text, label) per labeled line
+    """
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row.get(label_field) is not None:
+                    yield row[text_field], _label(row[label_field])
+
+
+def read_csv(filename, text_field="abstract", label_field="relevant"):
+    """
+    :param filename: string; csv (or .tsv, tab separated) file with a header line
+    :return: generator; a tuple (text, label) per labeled row
+    """
+    delimiter = "\t" if filename.endswith(".tsv") else ","
+    with open(filename, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            if row.get(label_field) not in (None, ""):
+                yield row[text_field], _label(row[label_field])
+
+
+def read_sqlite(filename, text_field="abstract", label_field="relevant", table="abstracts"):
+    """
+    :param filename: string; sqlite database
+    :param table: string; table with the text and label columns
+    :return: generator; a tuple (text, label) per labeled row, fetched in batches
+    """
+    connection = sqlite3.connect(filename)
+    try:
+        cursor = connection.execute('SELECT "{}", "{}" FROM "{}" WHERE "{}" IS NOT NULL'.format(
+            text_field, label_field, table, label_field))
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for text, label in rows:
+                yield text, _label(label)
+    finally:
+        connection.close()
+
+
+# file extension -> reader
+READERS = {
+    ".jsonl": read_jsonl,
+    ".json": read_jsonl,
+    ".csv": read_csv,
+    ".tsv": read_csv,
+    ".db": read_sqlite,
+    ".sqlite": read_sqlite,
+    ".sqlite3": read_sqlite,
+}
+
+
+def read_labeled_documents(filename, **kwargs):
+    """
+    Streams labeled abstracts, choosing the reader by extension (see READERS).
+
+    :param filename: string; .jsonl, .csv, .tsv or sqlite database
+    :param kwargs: passed to the reader, e.g. text_field, label_field, table
+    :return: generator; a tuple (text, label 0 or 1) per document
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in READERS:
+        raise ValueError("Unknown labeled data format {}, choose from {}".format(ext, sorted(READERS)))
+    return READERS[ext](filename, **kwargs)
+
+
+def write_processed_documents(labeled_docs, filename, processor, chunk_size=10000, workers=0,
+                              timer=NULL_TIMER):
+    """
+    Preprocesses labeled documents once, as RelevanceClassifier does, and writes their
+    tokens to a jsonl file read by the training passes.
+
+    :param labeled_docs: iterable; tuples (text, label)
+    :param filename: string; output jsonl, one [label, tokens] per line
+    :param processor: MatScholarProcess
+    :param chunk_size: int; documents preprocessed together
+    :param workers: int; worker processes, see iter_preprocessed
+    :return: int; number of documents
+    """
+    labeled_docs = iter(labeled_docs)
+    labels = collections.deque()
+
+    def texts():
+        for text, label in labeled_docs:
+            labels.append(label)
+            yield text
+
+    n_docs = 0
+    with open(filename, "w", encoding="utf-8") as f:
+        for _, inverse, processed in iter_preprocessed(processor, texts(), chunk_size, workers, timer):
+            for i in inverse.tolist():
+                f.write(json.dumps([labels.popleft(), processed[i]], ensure_ascii=False) + "\n")
+            n_docs += len(inverse)
+    return n_docs
+
+
+def read_processed_documents(filename, chunk_size=10000):
+    """
+    :param filename: string; written by write_processed_documents
+    :return: generator; a tuple (list of token lists, array of labels) per chunk
+    """
+    with open(filename, encoding="utf-8") as f:
+        while True:
+            rows = [json.loads(line) for line in itertools.islice(f, chunk_size)]
+            if not rows:
+                return
+            yield [tokens for _, tokens in rows], np.array([label for label, _ in rows], dtype=int)
+
+
+def _stop_words(stop_words):
+    """:return: frozenset; the words of the stop_words argument of build_vocabulary"""
+    if stop_words is None:
+        return frozenset()
+    if isinstance(stop_words, str):
+        if stop_words != "english":
+            raise ValueError("Unknown stop words {}".format(stop_words))
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+        return frozenset(ENGLISH_STOP_WORDS)
+    return frozenset(stop_words)
+
+
+def build_vocabulary(processed_filename, min_df=2, max_features=None, vocabulary=None, smooth_idf=True,
+                     holdout=0, stop_words="english"):
+    """
+    Counts document frequencies in one streaming pass and computes the idf weights as
+    sklearn's TfidfVectorizer does.
+
+    :param processed_filename: string; written by write_processed_documents
+    :param min_df: int; terms in fewer documents are dropped
+    :param max_features: int; if given, only the most frequent terms are kept
+    :param vocabulary: list; a frozen vocabulary (e.g. of the current model), only the
+    document frequencies of these terms are counted and none are dropped
+    :param smooth_idf: bool; idf = ln((1 + n) / (1 + df)) + 1 if True, else ln(n / max(df, 1)) + 1,
+    so that terms of a frozen vocabulary in no document get a finite weight
+    :param holdout: int; if > 1, every holdout-th document is left out, see train_relevance_model
+    :param stop_words: "english" for sklearn's ENGLISH_STOP_WORDS, as the pretrained model, None to
+    keep all terms, or an iterable of words; they are left out before counting, unless the
+    vocabulary is frozen
+    :return: tuple; (vocabulary, idf)
+    """
+    frozen = vocabulary is not None
+    vocabulary_set = frozenset(vocabulary) if frozen else None
+    stop_words = frozenset() if frozen else _stop_words(stop_words)
+    counts = collections.Counter()
+    n_docs, start = 0, 0
+    for docs, _ in read_processed_documents(processed_filename):
+        held = _held_out(start, len(docs), holdout)
+        start += len(docs)
+        for doc, is_held in zip(docs, held.tolist()):
+            if is_held:
+                continue
+            terms = set(doc)
+            if frozen:
+                terms.intersection_update(vocabulary_set)
+            else:
+                terms.difference_update(stop_words)
+            counts.update(terms)
+            n_docs += 1
+
+    if frozen:
+        vocabulary = list(vocabulary)
+    else:
+        terms = [(term, df) for term, df in counts.items() if df >= min_df]
+        if max_features is not None:
+            terms = sorted(terms, key=lambda x: (-x[1], x[0]))[:max_features]
+        vocabulary = sorted(term for term, _ in terms)
+
+    df = np.array([counts[term] for term in vocabulary], dtype=np.float64)
+    if smooth_idf:
+        idf = np.log((1. + n_docs) / (1. + df)) + 1.
+    else:
+        idf = np.log(n_docs / np.maximum(df, 1.)) + 1.
+    return vocabulary, idf
+
+
+def _held_out(start, n, holdout):
+    """:return: bool array; True for the documents start, ..., start + n - 1 left out of training"""
+    if holdout > 1:
+        return np.arange(start, start + n) % holdout == 0
+    return np.zeros(n, dtype=bool)
+
+
+def _new_classifier(alpha, random_state):
+    from sklearn.linear_model import SGDClassifier
+
+    # "log" was renamed "log_loss" in sklearn 1.1
+    loss = "log_loss" if "log_loss" in SGDClassifier.loss_functions else "log"
+    return SGDClassifier(loss=loss, alpha=alpha, random_state=random_state)
+
+
+def train_relevance_model(processed_filename, output, min_df=2, max_features=None, vocabulary=None,
+                          epochs=5, alpha=1e-5, chunk_size=10000, holdout=0, seed=0, stop_words="english"):
+    """
+    Trains a logistic regression on tfidf features with SGD, chunk by chunk, so memory is
+    bounded by the vocabulary and one chunk of documents whatever the number of labels.
+    The result is a LinearRelevanceModel .npz (see RelevanceClassifier(model_path=...)).
+
+    :param processed_filename: string; written by write_processed_documents
+    :param output: string; the .npz to write
+    :param min_df: int; see build_vocabulary
+    :param max_features: int; see build_vocabulary
+    :param vocabulary: list; see build_vocabulary
+    :param epochs: int; passes over the documents
+    :param alpha: float; l2 regularization of the SGD classifier
+    :param chunk_size: int; documents per partial_fit call
+    :param holdout: int; if > 1, every holdout-th document is not trained on but scored
+    :param seed: int; seed of the SGD classifier and of the shuffling inside chunks
+    :param stop_words: see build_vocabulary
+    :return: dict; {"documents", "terms", "holdout_documents", "holdout_accuracy",
+    "holdout_log_loss"}, the holdout scores are None without holdout
+    """
+    vocabulary, idf = build_vocabulary(processed_filename, min_df, max_features, vocabulary,
+                                       holdout=holdout, stop_words=stop_words)
+    model = LinearRelevanceModel(vocabulary, idf, np.zeros(len(vocabulary)), 0.)
+    clf = _new_classifier(alpha, seed)
+    rng = np.random.RandomState(seed)
+
+    n_docs = 0
+    for _ in range(epochs):
+        start = 0
+        for docs, labels in read_processed_documents(processed_filename, chunk_size):
+            held = _held_out(start, len(docs), holdout)
+            start += len(docs)
+            train = np.flatnonzero(~held)
+            if not len(train):
+                continue
+            rng.shuffle(train)
+            X = model.transform([docs[i] for i in train])
+            clf.partial_fit(X, labels[train], classes=np.array([0, 1]))
+        n_docs = start
+
+    model.coef = np.asarray(clf.coef_, dtype=np.float64).ravel()
+    model.intercept = float(clf.intercept_[0])
+    model.save(output)
+
+    metrics = {"documents": n_docs, "terms": len(vocabulary), "holdout_documents": 0,
+               "holdout_accuracy": None, "holdout_log_loss": None}
+    if holdout > 1:
+        start, correct, log_loss, n_held = 0, 0, 0., 0
+        for docs, labels in read_processed_documents(processed_filename, chunk_size):
+            held = np.flatnonzero(_held_out(start, len(docs), holdout))
+            start += len(docs)
+            if not len(held):
+                continue
+            prob = model.predict_proba(model.transform([docs[i] for i in held]))[:, 1]
+            prob = np.clip(prob, 1e-15, 1 - 1e-15)
+            correct += int(((prob > 0.5) == labels[held]).sum())
+            log_loss -= float(np.sum(np.where(labels[held] == 1, np.log(prob), np.log(1 - prob))))
+            n_held += len(held)
+        if n_held:
+            metrics.update({"holdout_documents": n_held, "holdout_accuracy": correct / n_held,
+                            "holdout_log_loss": log_loss / n_held})
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train the relevance model on streamed labeled abstracts, in bounded memory")
+    parser.add_argument("labeled", help="labeled abstracts: .jsonl, .csv, .tsv or a sqlite database")
+    parser.add_argument("output", help="model .npz, e.g. relevance_model.npz next to the phraser")
+    parser.add_argument("--text-field", default="abstract")
+    parser.add_argument("--label-field", default="relevant")
+    parser.add_argument("--table", default="abstracts", help="sqlite table")
+    parser.add_argument("--phraser", default=None, help="phraser of the MatScholarProcess")
+    parser.add_argument("--processed", default=None,
+                        help="jsonl of processed documents, reused if it exists")
+    parser.add_argument("--vocabulary-from", default=None,
+                        help="freeze the vocabulary of this model .npz")
+    parser.add_argument("--stop-words", default="english",
+                        help="english (sklearn's list, as the pretrained model), none, or a file with "
+                             "one word per line; ignored with --vocabulary-from")
+    parser.add_argument("--min-df", type=int, default=2)
+    parser.add_argument("--max-features", type=int, default=None)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--alpha", type=float, default=1e-5)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=0, help="preprocessing processes")
+    parser.add_argument("--holdout", type=int, default=10,
+                        help="score every n-th document instead of training on it, 0 to train on all")
+    args = parser.parse_args(argv)
+
+    processed = args.processed or os.path.splitext(args.output)[0] + ".processed.jsonl"
+    if not os.path.exists(processed):
+        from lbnlp.process.matscholar import MatScholarProcess
+
+        processor = MatScholarProcess(phraser_path=args.phraser) if args.phraser else MatScholarProcess()
+        kwargs = {"text_field": args.text_field, "label_field": args.label_field}
+        if os.path.splitext(args.labeled)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+            kwargs["table"] = args.table
+        write_processed_documents(read_labeled_documents(args.labeled, **kwargs), processed,
+                                  processor, args.chunk_size, args.workers)
+
+    stop_words = args.stop_words
+    if stop_words == "none":
+        stop_words = None
+    elif stop_words != "english":
+        with open(stop_words, encoding="utf-8") as f:
+            stop_words = [line.strip() for line in f if line.strip()]
+    vocabulary = LinearRelevanceModel.load(args.vocabulary_from).vocabulary if args.vocabulary_from else None
+    metrics = train_relevance_model(processed, args.output, args.min_df, args.max_features, vocabulary,
+                                    args.epochs, args.alpha, args.chunk_size, args.holdout,
+                                    stop_words=stop_words)
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import os
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+import numpy as np
+
+from lbnlp.timing import StageTimer
+
+HAS_SKLEARN = importlib.util.find_spec("sklearn") is not None
+
+
+class StubProcessor(object):
+    """Splits sentences on periods and words on spaces, lowercases words"""
+
+    def tokenize(self, text):
+        return [sent.split() for sent in text.split(".") if sent.strip()]
+
+    def split_sentences(self, text):
+        return [sent for sent in text.split(".") if sent.strip()]
+
+    def tokenize_sentence(self, sentence):
+        return sentence.split()
+
+    def process(self, tokens):
+        return [token.lower() for token in tokens], []
+
+    def process_many(self, sentences):
+        return [self.process(tokens) for tokens in sentences]
+
+
+DOCS = ["The band gap of ZnO is 3.3 eV. It is a semiconductor.",
+        "The polymer was used for an OLED.",
+        "ZnO thin films for solar cells.",
+        "Protein folding in cells.",
+        "The band gap of GaN. A wide gap semiconductor.",
+        "Polymer blends for biosensors."]
+LABELS = [1, 0, 1, 0, 1, 0]
+
+
+def dummy_fun(doc):
+    return doc
+
+
+@unittest.skipUnless(HAS_SKLEARN, "scikit-learn is required")
+class RelevanceClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        from lbnlp.relevance import RelevanceClassifier, preprocess
+        from lbnlp.benchmarks.standins import write_relevance_model
+
+        self.tmpdir = tempfile.mkdtemp()
+        processor = StubProcessor()
+        clf_path, tfidf_path = write_relevance_model(
+            self.tmpdir, [preprocess(processor, doc) for doc in DOCS], LABELS)
+        self.timer = StageTimer()
+        self.clf = RelevanceClassifier(clf_path, tfidf_path, processor=processor, timer=self.timer)
+        self.docs = DOCS * 3 + ["Oxide cells."]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def expected(self):
+        X = self.clf.tfidf.transform([self.clf._preprocess(doc) for doc in self.docs])
+        return self.clf.clf.predict_proba(X)[:, 1]
+
+    def test_chunks_match_single_pass(self):
+        probs = self.expected()
+        for chunk_size in (1, 4, 100):
+            preds, p = self.clf.classify_many(self.docs, chunk_size=chunk_size, return_proba=True)
+            np.testing.assert_allclose(p, probs)
+            np.testing.assert_array_equal(preds, np.where(probs > 0.5, 1, 0))
+        self.assertEqual([self.clf.classify(doc) for doc in DOCS], list(self.clf.classify_many(DOCS)))
+
+    def test_duplicates_scored_once(self):
+        self.timer.reset()
+        list(self.clf.iter_classify(iter(self.docs), chunk_size=100))
+        self.assertEqual(self.timer.stats()["predict"]["items"], len(DOCS) + 1)
+        self.assertEqual(self.timer.stats()["tokenize"]["calls"], len(DOCS) + 1)
+
+    def test_worker_processes(self):
+        preds, probs = self.clf.classify_many(self.docs, chunk_size=5, workers=2, return_proba=True)
+        np.testing.assert_allclose(probs, self.expected())
+        self.assertEqual(len(preds), len(self.docs))
+
+    def test_sentence_cache(self):
+        from lbnlp.relevance import RelevanceClassifier
+        from lbnlp.process.cache import SentenceCache
+
+        cache = SentenceCache()
+        clf = RelevanceClassifier(processor=StubProcessor(), sentence_cache=cache,
+                                  clf_path=os.path.join(self.tmpdir, "relevance_model.p"),
+                                  tfidf_path=os.path.join(self.tmpdir, "tfidf.p"))
+        _, probs = clf.classify_many(self.docs, chunk_size=4, return_proba=True)
+        np.testing.assert_allclose(probs, self.expected())
+        self.assertEqual([clf.classify(doc) for doc in DOCS], list(self.clf.classify_many(DOCS)))
+        # "It is a semiconductor" and "A wide gap semiconductor" are distinct sentences
+        self.assertEqual(cache.stats()["size"], 10)
+        self.assertGreater(cache.stats()["hit_rate"], 0.5)
+
+    def test_empty(self):
+        preds, probs = self.clf.classify_many([], return_proba=True)
+        self.assertEqual((len(preds), len(probs)), (0, 0))
+
+    def test_linear_model(self):
+        from lbnlp.relevance import RelevanceClassifier, LinearRelevanceModel
+
+        model_path = os.path.join(self.tmpdir, "relevance_model.npz")
+        LinearRelevanceModel.from_sklearn(self.clf.tfidf, self.clf.clf).save(model_path)
+        clf = RelevanceClassifier(processor=StubProcessor(), model_path=model_path)
+        _, probs = clf.classify_many(self.docs, return_proba=True)
+        np.testing.assert_allclose(probs, self.expected(), rtol=1e-12)
+
+
+@unittest.skipUnless(HAS_SKLEARN, "scikit-learn is required")
+class LinearRelevanceModelTest(unittest.TestCase):
+
+    def setUp(self):
+        processor = StubProcessor()
+        self.docs = [[t for sent in processor.tokenize(doc) for t in processor.process(sent)[0]]
+                     for doc in DOCS]
+        self.test_docs = self.docs + [["the", "zno"], [], ["unknown"], ["gap", "gap", "cells"]]
+
+    def check(self, tfidf, clf):
+        from lbnlp.relevance import LinearRelevanceModel
+
+        X = tfidf.fit_transform(self.docs)
+        clf.fit(X, LABELS)
+        model = LinearRelevanceModel.from_sklearn(tfidf, clf)
+        filename = os.path.join(tempfile.mkdtemp(), "model.npz")
+        model.save(filename)
+        model = LinearRelevanceModel.load(filename)
+        shutil.rmtree(os.path.dirname(filename))
+
+        expected = tfidf.transform(self.test_docs)
+        X = model.transform(self.test_docs)
+        np.testing.assert_allclose(X.toarray(), expected.toarray(), rtol=1e-12)
+        np.testing.assert_allclose(model.predict_proba(X), clf.predict_proba(expected), rtol=1e-12)
+
+    def test_matches_sklearn(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+        # the vectorizer settings of old-nlp/create-pickle-tfidf-clf.py
+        self.check(TfidfVectorizer(analyzer="word", preprocessor=dummy_fun, tokenizer=dummy_fun,
+                                   token_pattern=None, stop_words="english"),
+                   LogisticRegression(C=10))
+        for kwargs in ({"sublinear_tf": True, "norm": "l1"}, {"binary": True, "use_idf": False},
+                       {"norm": None, "smooth_idf": False}):
+            self.check(TfidfVectorizer(analyzer=dummy_fun, **kwargs),
+                       SGDClassifier(loss="log_loss", random_state=0))
+
+    def test_unsupported(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import RidgeClassifier, LogisticRegression
+        from lbnlp.relevance import LinearRelevanceModel
+
+        tfidf = TfidfVectorizer(analyzer=dummy_fun)
+        X = tfidf.fit_transform(self.docs)
+        with self.assertRaises(ValueError):
+            LinearRelevanceModel.from_sklearn(tfidf, RidgeClassifier().fit(X, LABELS))
+        text_tfidf = TfidfVectorizer()
+        X = text_tfidf.fit_transform(DOCS)
+        with self.assertRaises(ValueError):
+            LinearRelevanceModel.from_sklearn(text_tfidf, LogisticRegression().fit(X, LABELS))
+
+
+@unittest.skipUnless(HAS_SKLEARN, "scikit-learn is required")
+class TrainRelevanceModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.docs = DOCS * 4
+        self.labels = LABELS * 4
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_readers(self):
+        import csv
+        import json
+        import sqlite3
+        from lbnlp.relevance.train import read_labeled_documents
+
+        expected = list(zip(DOCS, LABELS))
+        with open(self.path("labeled.jsonl"), "w") as f:
+            for doc, label in expected:
+                f.write(json.dumps({"abstract": doc, "relevant": bool(label)}) + "\n")
+            f.write(json.dumps({"abstract": "Not labeled."}) + "\n")
+        with open(self.path("labeled.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["relevant", "abstract"])
+            writer.writerows([("yes" if label else "no", doc) for doc, label in expected] + [("", "x")])
+        connection = sqlite3.connect(self.path("labeled.db"))
+        connection.execute("CREATE TABLE abstracts (abstract TEXT, relevant INTEGER)")
+        connection.executemany("INSERT INTO abstracts VALUES (?, ?)", expected + [("x", None)])
+        connection.commit()
+        connection.close()
+
+        for name in ("labeled.jsonl", "labeled.csv", "labeled.db"):
+            self.assertEqual(list(read_labeled_documents(self.path(name))), expected)
+        with self.assertRaises(ValueError):
+            read_labeled_documents(self.path("labeled.xml"))
+
+    def test_train(self):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from lbnlp.relevance import RelevanceClassifier, LinearRelevanceModel, preprocess
+        from lbnlp.relevance.train import write_processed_documents, build_vocabulary, train_relevance_model
+
+        processor = StubProcessor()
+        processed = self.path("processed.jsonl")
+        n = write_processed_documents(zip(self.docs, self.labels), processed, processor, chunk_size=5)
+        self.assertEqual(n, len(self.docs))
+
+        # the english stop words are left out, as by the vectorizer of the pretrained model
+        preprocessed = [preprocess(processor, doc) for doc in self.docs]
+        vocabulary, idf = build_vocabulary(processed, min_df=2)
+        tfidf = TfidfVectorizer(preprocessor=dummy_fun, tokenizer=dummy_fun, token_pattern=None,
+                                stop_words="english", min_df=2).fit(preprocessed)
+        self.assertEqual(vocabulary, list(tfidf.get_feature_names_out()))
+        np.testing.assert_allclose(idf, tfidf.idf_)
+        self.assertNotIn("the", vocabulary)
+
+        vocabulary_all, idf = build_vocabulary(processed, min_df=2, stop_words=None)
+        tfidf = TfidfVectorizer(analyzer=dummy_fun, min_df=2).fit(preprocessed)
+        self.assertEqual(vocabulary_all, list(tfidf.get_feature_names_out()))
+        np.testing.assert_allclose(idf, tfidf.idf_)
+        self.assertIn("the", vocabulary_all)
+        self.assertNotIn("zno", build_vocabulary(processed, min_df=2, stop_words=["zno"])[0])
+
+        # terms of a frozen vocabulary in no document get a finite weight
+        _, idf = build_vocabulary(processed, vocabulary=["zno", "unknown"], smooth_idf=False)
+        self.assertTrue(np.all(np.isfinite(idf)))
+
+        model_path = self.path("relevance_model.npz")
+        metrics = train_relevance_model(processed, model_path, epochs=20, alpha=1e-3, chunk_size=5, holdout=4)
+        self.assertEqual((metrics["documents"], metrics["holdout_documents"]), (len(self.docs), 6))
+        self.assertEqual(metrics["holdout_accuracy"], 1.)
+        clf = RelevanceClassifier(processor=processor, model_path=model_path)
+        self.assertEqual(list(clf.classify_many(DOCS)), LABELS)
+
+        # retraining on a frozen vocabulary keeps the terms, and their order, of the model
+        frozen = ["zno", "unknown"] + vocabulary[:3]
+        train_relevance_model(processed, model_path, vocabulary=frozen, epochs=1)
+        self.assertEqual(LinearRelevanceModel.load(model_path).vocabulary, frozen)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import unittest
+import threading
+
+from lbnlp.timing import StageTimer, NULL_TIMER
+from lbnlp.ner.tagger import Tagger
+
+
+class StubConfig(object):
+
+    @staticmethod
+    def processing_word(word):
+        return len(word)
+
+
+class StubTagger(Tagger):
+
+    config = StubConfig()
+    idx_to_tag = {0: "O"}
+
+    def predict_batch(self, words):
+        with self.timer.stage("session_run", items=len(words)):
+            return [[0] * len(w) for w in words], [len(w) for w in words]
+
+
+class StageTimerTest(unittest.TestCase):
+
+    def test_records_calls_items_and_time(self):
+        timer = StageTimer()
+        with timer.stage("tokenize") as stage:
+            stage.items = 3
+        with timer.stage("tokenize", items=2):
+            pass
+        timer.record("viterbi", 0.5, items=4)
+
+        stats = timer.stats()
+        self.assertEqual(stats["tokenize"]["calls"], 2)
+        self.assertEqual(stats["tokenize"]["items"], 5)
+        self.assertGreaterEqual(stats["tokenize"]["seconds"], 0)
+        self.assertEqual(stats["viterbi"], {"calls": 1, "seconds": 0.5, "items": 4})
+        self.assertEqual(json.loads(timer.to_json()), stats)
+
+        text = timer.to_prometheus()
+        self.assertIn("# TYPE lbnlp_stage_seconds_total counter", text)
+        self.assertIn('lbnlp_stage_items_total{stage="viterbi"} 4', text)
+        self.assertIn('lbnlp_stage_calls_total{stage="tokenize"} 2', text)
+
+        timer.reset()
+        self.assertEqual(timer.stats(), {})
+
+    def test_thread_safe(self):
+        timer = StageTimer()
+
+        def work():
+            for _ in range(1000):
+                timer.record("stage", 0.001, items=1)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(timer.stats()["stage"]["calls"], 4000)
+
+    def test_tagger_stages(self):
+        tagger = StubTagger()
+        tagger.predict_many([["a", "b"], [], ["c"]])
+        self.assertEqual(NULL_TIMER.stats(), {})
+
+        tagger.timer = StageTimer()
+        tagger.predict_many([["a", "b"], [], ["c"]])
+        stats = tagger.timer.stats()
+        self.assertEqual(stats["word_ids"]["items"], 3)
+        self.assertEqual(stats["session_run"]["items"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import json
+import time
+import threading
+
+
+class _Stage(object):
+    """Context manager timing one call of a stage; set .items inside it"""
+
+    __slots__ = ("timer", "name", "items", "start")
+
+    def __init__(self, timer, name, items):
+        self.timer = timer
+        self.name = name
+        self.items = items
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.record(self.name, time.perf_counter() - self.start, self.items)
+
+
+class StageTimer(object):
+    """Records wall time, call counts and item counts per named stage
+
+    Pass one to NERClassifier or RelevanceClassifier (timer=...) to see how
+    their time splits between tokenization, processing, padding, the model
+    and decoding. It can be shared by several objects and threads.
+
+    Example:
+        ```python
+        timer = StageTimer()
+        clf = NERClassifier(ner_path, timer=timer)
+        clf.tag_docs(docs)
+        print(timer.to_json(indent=2))
+        ```
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def stage(self, name, items=0):
+        """Times a block of code as one call of the stage name
+
+        :param name: string; stage name, e.g. "tokenize"
+        :param items: int; number of items (sentences, tokens...) handled,
+        can also be set on the returned object inside the block
+        :return: context manager
+        """
+        return _Stage(self, name, items)
+
+    def record(self, name, seconds, items=0):
+        """Adds one call of a stage that was timed elsewhere"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {"calls": 0, "seconds": 0., "items": 0}
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["items"] += items
+
+    def stats(self):
+        """
+        :return: dict; {stage: {"calls": int, "seconds": float, "items": int}}
+        """
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_json(self, **kwargs):
+        """
+        :param kwargs: passed to json.dumps
+        :return: string; the stats as JSON
+        """
+        return json.dumps(self.stats(), sort_keys=True, **kwargs)
+
+    def to_prometheus(self, prefix="lbnlp"):
+        """
+        Formats the stats as Prometheus text exposition: counters
+        <prefix>_stage_seconds_total, <prefix>_stage_calls_total and
+        <prefix>_stage_items_total, labelled by stage.
+
+        :param prefix: string; metric name prefix
+        :return: string
+        """
+        stats = self.stats()
+        lines = []
+        for key, help_text in (("seconds", "Wall time spent in each stage"),
+                               ("calls", "Number of calls of each stage"),
+                               ("items", "Number of items handled by each stage")):
+            metric = "{}_stage_{}_total".format(prefix, key)
+            lines.append("# HELP {} {}".format(metric, help_text))
+            lines.append("# TYPE {} counter".format(metric))
+            for name in sorted(stats):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append('{}{{stage="{}"}} {}'.format(metric, label, stats[name][key]))
+        return "\n".join(lines) + "\n"
+
+
+class _NullStage(object):
+
+    __slots__ = ("items",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class NullTimer(object):
+    """The default timer: same interface as StageTimer, records nothing"""
+
+    def stage(self, name, items=0):
+        return _NullStage()
+
+    def record(self, name, seconds, items=0):
+        pass
+
+    def stats(self):
+        return {}
+
+    def reset(self):
+        pass
+
+    def to_json(self, **kwargs):
+        return json.dumps({})
+
+    def to_prometheus(self, prefix="lbnlp"):
+        return ""
+
+
+NULL_TIMER = NullTimer()